@@ -1,4 +1,4 @@
 from .utils import meta_caption
-from .base import FileIn, Microphone, SaveDisk, Screenshare, Camera, Livestream
+from .base import FileIn, Microphone, SaveDisk, Screenshare, Camera, PictureInPicture, Livestream
 
 __version__ = "2.1.1"
@@ -10,12 +10,20 @@ pls.microphone('twitch')
 """
 
 from pathlib import Path
+import itertools
 
 from .base import FileIn, Microphone, SaveDisk, Camera
+from .ffmpeg import get_exe
+from .stream import load_config
+from . import loudness
+from . import resume as checkpoint
+from .library import Library
+from .prefetch import Prefetcher
 from .screen import stream_screen
 
 __all__ = [
     "stream_file",
+    "stream_files",
     "stream_microphone",
     "stream_camera",
     "stream_screen",
@@ -30,10 +38,143 @@ def stream_file(
     loop: bool | None = None,
     assume_yes: bool = False,
     timeout: float | None = None,
+    complexity: bool = False,
+    resume: bool = False,
 ):
-    S = FileIn(ini_file, websites, infn=video_file, loop=loop, yes=assume_yes, timeout=timeout)
+    """
+    livestream one file, e.g. looped.
 
-    print(" ".join(S.stream.cmd))
+    complexity: scale video bitrate by content complexity of video_file
+    resume: start from the position saved when this file last stopped early
+    """
+
+    S = FileIn(
+        ini_file,
+        websites,
+        infn=video_file,
+        loop=loop,
+        yes=assume_yes,
+        timeout=timeout,
+        complexity=complexity,
+        resume=resume,
+    )
+
+    if not assume_yes:
+        input(f"Press Enter to stream {video_file} to {websites}   Or Ctrl C to abort.")
+
+    S.stream.startlive()
+
+
+def stream_files(
+    ini_file: Path,
+    websites: str,
+    *,
+    video_path: Path,
+    glob: str = "*",
+    media: str | None = None,
+    min_duration: float | None = None,
+    max_duration: float | None = None,
+    shuffle: bool = False,
+    loop: bool = False,
+    still_image: Path | None = None,
+    index: Path | None = None,
+    prefetch: int = 0,
+    cache: Path | None = None,
+    cache_mb: int = 4096,
+    loudnorm: bool = False,
+    resume: bool = False,
+    assume_yes: bool = False,
+    timeout: float | None = None,
+):
+    """
+    livestream a directory of media files, one after another.
+
+    The directory is indexed incrementally (only new or changed files are probed),
+    and files are selected from the index, e.g. media="audio", max_duration=300.
+    still_image is shown for audio-only files.
+
+    prefetch: read ahead this many upcoming files. Files on remote mounts are
+        copied to local directory "cache", limited to cache_mb megabytes.
+    loudnorm: normalize loudness of files, measured in parallel before streaming
+    resume: continue at the playlist item and position where streaming last stopped early
+    """
+
+    video_path = Path(video_path).expanduser()
+
+    state_fn = checkpoint.state_file(
+        "playlist", websites, video_path.resolve(), glob, media, min_duration, max_duration
+    )
+    state = checkpoint.load(state_fn) if resume else {}
+
+    if video_path.is_file():
+        flist = [video_path]
+    else:
+        L = Library(index)
+        n = L.update(video_path, glob)
+        print(
+            f"{video_path}: {n['probed']} probed, {n['unchanged']} unchanged, {n['removed']} removed"
+        )
+        flist = L.query(
+            video_path,
+            glob,
+            media=media,
+            min_duration=min_duration,
+            max_duration=max_duration,
+            shuffle=shuffle,
+        )
+        L.close()
+
+    if not flist:
+        raise FileNotFoundError(f"no media files found in {video_path} matching {glob}")
+
+    first = 0
+    if state.get("files"):
+        # same order as before, also if shuffled
+        current = state["files"][state.get("item", 0)]
+        flist = [Path(f) for f in state["files"] if Path(f).is_file()]
+        first = flist.index(Path(current)) if Path(current) in flist else 0
+        print(f"resuming playlist at item {first + 1}: {current}")
+
+    print("streaming", len(flist), "files")
+
+    if loudnorm:
+        C = load_config(ini_file)
+        loudness.measure_all(flist, get_exe(C.get("exe", "ffmpeg")))
+
+    if not assume_yes:
+        input(f"Press Enter to stream {len(flist)} files to {websites}   Or Ctrl C to abort.")
+
+    P = Prefetcher(cache, cache_mb * 2**20, prefetch) if prefetch else None
+    if P is not None:
+        P.stage(flist)
+
+    for i in itertools.count(first) if loop else range(first, len(flist)):
+        f = flist[i % len(flist)]
+        if resume:
+            checkpoint.save(state_fn, {"files": list(map(str, flist)), "item": i % len(flist)})
+        if P is not None:
+            f = P.get(f)  # before staging the next files, which must not evict it
+            nxt = [flist[(i + k) % len(flist)] for k in range(1, prefetch + 1)]
+            P.stage(nxt if loop else flist[i + 1:i + 1 + prefetch])
+
+        S = FileIn(
+            ini_file,
+            websites,
+            infn=f,
+            image=still_image,
+            yes=assume_yes,
+            timeout=timeout,
+            loudnorm=loudnorm,
+            resume=resume,
+            resume_source=flist[i % len(flist)],
+            resume_file=checkpoint.state_file(websites, flist[i % len(flist)].resolve()),
+        )
+        S.stream.startlive()
+
+    if P is not None:
+        P.close()
+
+    checkpoint.clear(state_fn)
 
 
 def stream_microphone(
@@ -1,14 +1,30 @@
 from pathlib import Path
-import os
-
-from .stream import Stream
+import logging
+import sys
+import time
+import typing as T
+
+from .stream import Stream, FPS, KEYFRAME_SEC
+from .monitor import Monitor, DropWatch
+from . import procstat
+from .procstat import ProcWatch
+from .preview import Preview
+from .replay import Replay
+from .stages import Stages
+from . import replay
+from . import resume
+from . import tracing
+from . import watchdog
+from .watchdog import SpeedWatch, apply_ladder
 from .utils import run, check_device
+from .ffmpeg import get_meta
 
-__all__ = ["FileIn", "Microphone", "SaveDisk", "Screenshare", "Camera"]
+__all__ = ["FileIn", "Microphone", "SaveDisk", "Screenshare", "Camera", "PictureInPicture"]
 
 
 class Livestream(Stream):
     def __init__(self, inifn: Path, site: str, **kwargs) -> None:
+        t0 = tracing.now()
         super().__init__(inifn, site, **kwargs)
 
         self.site = site.lower()
@@ -17,7 +33,89 @@ class Livestream(Stream):
 
         self.docheck = kwargs.get("docheck")
 
+        self.auto_kbps = not self.video_kbps
         self.video_bitrate()
+        self.video_encoder()
+
+        # encoder degradation ladder level, 0 for configured settings
+        self.degrade_level = 0
+        self.base_preset = self.preset
+        self.transitions: list[dict[str, T.Any]] = []
+        self._next_level = 0
+
+        # capture drops per run: restarts due to persistent drops append here
+        self.drops: list[dict[str, int]] = []
+
+        # called with the Monitor after each FFmpeg progress report
+        self.handlers: list[T.Callable[[Monitor], None]] = []
+        self.monitor: Monitor | None = None
+        self.stopped = False
+        # False: FFmpeg does not read keyboard, e.g. several streams in one terminal
+        self.interactive: bool = kwargs.get("interactive", True)
+
+        self.health: T.Any = None
+        if self.health_monitor:
+            from .health import Health  # NumPy is optional
+
+            # a looped background image never ends, and would always look frozen
+            self.health = Health(
+                video=bool(self.res) and not self.image,
+                audio=self.has_audio(),
+                on_event=kwargs.get("on_health"),
+            )
+
+        self.procwatch: ProcWatch | None = None
+        if self.resources:
+            if not sys.platform.startswith("linux"):
+                logging.warning("FFmpeg resource sampling needs /proc, available on Linux")
+            self.procwatch = ProcWatch(
+                interval=self.resources.get("interval", procstat.INTERVAL),
+                history=self.resources.get("history", procstat.HISTORY),
+                budget=self.resources.get("budget"),
+                on_event=kwargs.get("on_budget"),
+            )
+
+        self.preview: Preview | None = None
+        if self.preview_images and self.res:
+            P = self.preview_images if isinstance(self.preview_images, dict) else {}
+            self.preview = Preview(**P)
+
+        self.replay: Replay | None = None
+        if self.replay_buffer:
+            R = self.replay_buffer if isinstance(self.replay_buffer, dict) else {}
+            self.replay = Replay(
+                seconds=R.get("seconds", replay.SECONDS),
+                segment_sec=self.keyframe_sec or KEYFRAME_SEC,
+                dir=R.get("dir"),
+            )
+
+        # checkpoint file position, and resume from the last checkpoint
+        self.resume_file: Path | None = None
+        # file as named in the playlist, also when infn is a staged copy of it
+        self.resume_source: Path | None = None
+        if kwargs.get("resume") and self.vidsource == "file" and self.infn:
+            self.resume_source = Path(kwargs.get("resume_source") or self.infn).resolve()
+            self.resume_file = Path(
+                kwargs.get("resume_file") or resume.state_file(self.site, self.resume_source)
+            )
+            self.resume_from(resume.load(self.resume_file))
+
+        self.stages: Stages | None = None
+        if self.split_capture and self.vidsource in ("screen", "camera"):
+            P = self.split_capture if isinstance(self.split_capture, dict) else {}
+            self.stages = Stages(**P)
+        elif self.split_capture:
+            logging.warning("split_capture is only for screen and camera streams")
+
+        self.build()
+
+        tracing.record("construct", t0, site=self.site)
+
+    def build(self) -> None:
+        """
+        setup command line from current parameters.
+        Called again before a restart with changed parameters.
+        """
 
         vidIn: list[str] = self.videoIn()
         vidOut: list[str] = self.videoOut()
@@ -25,7 +123,14 @@ class Livestream(Stream):
         audIn: list[str] = self.audioIn()
         audOut: list[str] = self.audioOut()
 
+        self.capture_cmd: list[str] = []
+        if self.stages is not None:
+            self.capture_cmd = self.stages.capture_cmd(self.exe, self.loglevel, vidIn + audIn)
+            vidIn, audIn = self.stages.encode_in(self.video_queue), []
+
         buf: list[str] = self.buffer()
+        if self.replay is not None and buf[-2:] == ["-f", "flv"]:
+            buf = buf[:-2]  # FLV is one of the tee outputs
         # %% begin to setup command line
         cmd: list[str] = []
         cmd.append(self.exe)
@@ -35,34 +140,36 @@ class Livestream(Stream):
 
         #        cmd += self.timelimit  # terminate input after N seconds, IF specified
 
-        cmd += self.queue
-
         cmd += vidIn + audIn
 
-        if not self.movingimage:  # FIXME: need a different filter chain to caption moving images
-            cmd += self.F.drawtext(self.caption)
+        cmd += self.videoFilter()
 
         cmd += vidOut + audOut
         cmd += buf
 
         cmd.extend(self.timelimit)  # terminate output after N seconds, IF specified
 
-        streamid = self.streamid if hasattr(self, "streamid") else ""
-        # cannot have double quotes for Mac/Linux,
-        #    but need double quotes for Windows
-        sink: str = self.url + "/" + streamid
-        if os.name == "nt":
-            sink = '"' + sink + '"'
+        sink = self.sink = self.sink_url()
+        if self.replay is not None:
+            cmd += self.replay.tee(sink, self.maps(vidIn + audIn))
+        else:
+            cmd.append(sink)
 
-        self.sink = sink
-        cmd.append(sink)
+        if self.health is not None:
+            cmd += self.health.outputs(self.timelimit)
+        if self.preview is not None:
+            cmd += self.preview.outputs(self.timelimit)
 
         self.cmd: list[str] = cmd
-        # %% quick check command, to verify device exists
+        self.checkcmd: list[str] = self.quick_check_cmd()
+
+    def quick_check_cmd(self) -> list[str]:
+        """quick check command, to verify device exists"""
+
         # 0.1 seems OK, spurious buffer error on Windows that wasn't helped by any bigger size
         CHECKTIMEOUT = "0.1"
 
-        self.checkcmd: list[str] = (
+        return (
             [self.exe]
             + self.loglevel
             + ["-t", CHECKTIMEOUT]
@@ -72,13 +179,41 @@ class Livestream(Stream):
             + ["-f", "null", "-"]  # camera needs at output
         )
 
-    def startlive(self):
+    def maps(self, inputs: list[str]) -> list[str]:
+        """
+        explicit stream selection, needed for the tee muxer.
+        Video comes from the first input, audio from the last; a -filter_complex output
+        is selected by FFmpeg anyway.
+        """
+
+        n = inputs.count("-i")
+        m = [] if "-filter_complex" in self.videoFilter() + inputs else ["0:v?"]
+
+        return m + [f"{max(n - 1, 0)}:a?"]
+
+    def latest_preview(self) -> dict[str, T.Any] | None:
+        """latest preview image and sprite sheet paths and times, None if not enabled"""
+        return self.preview.latest() if self.preview is not None else None
+
+    def clip(self, seconds: float, outfn: Path) -> Path:
+        """MP4 of the last seconds of the stream from the replay buffer, without re-encoding"""
+
+        if self.replay is None:
+            raise ValueError("replay buffer not enabled for this stream")
+
+        return self.replay.clip(seconds, outfn, self.exe)
+
+    def startlive(self) -> int:
         """
-        start the stream(s)
+        start the stream(s). A stop() before or while starting is not lost:
+        the stream then doesn't start, or is ended.
+
+        Returns FFmpeg exit code, 0 if stopped before FFmpeg started
         """
 
         if self.docheck:
             self.check_device()
+        self.write_caption()
 
         proc = None
         # %% special cases for localhost tests
@@ -90,12 +225,201 @@ class Livestream(Stream):
         if proc is not None and proc.poll() is not None:
             # listener stopped prematurely, probably due to error
             raise RuntimeError(f"listener stopped with code {proc.poll()}")
+        if self.health is not None and self.health.closed:
+            self.health.open()  # new ports
+            self.build()
         # %% RUN STREAM
-        run(self.cmd)
+        try:
+            return self.run_monitored()
+        finally:
+            self.stopped = False  # ready to run again
+            if self.health is not None:
+                self.health.close()
+            # %% stop the listener before starting the next process, or upon final process closing.
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+
+    def stop(self) -> None:
+        """stop a stream running in another thread, without restarting it"""
+
+        self.stopped = True
+        if self.monitor is not None:
+            self.monitor.stop("stop")
+
+    @property
+    def capture(self) -> bool:
+        """live capture devices, that drop frames if their input queue fills"""
+        return self.vidsource in ("screen", "camera", "pip") or any(
+            o == "-f" and f == self.acap for o, f in zip(self.cmd, self.cmd[1:])
+        )
 
-        # %% stop the listener before starting the next process, or upon final process closing.
-        if proc is not None and proc.poll() is None:
-            proc.terminate()
+    def run_monitored(self) -> int:
+        """
+        run stream, watching FFmpeg progress with self.handlers.
+
+        Live capture restarts with doubled input thread queues while capture drops persist.
+        Drop counts of each run are recorded in self.drops.
+        """
+
+        ret = 0
+        while True:
+            handlers = list(self.handlers)
+            if self.resume_file is not None:
+                handlers.append(self._checkpoint())
+            if self.procwatch is not None:
+                handlers.append(self.procwatch)
+            if self.capture:
+                handlers.append(DropWatch(on_trip=self._grow_queue))
+            if self.capture and self.degrade and self.degrade.get("ladder"):
+                handlers.append(self._speed_watch())
+
+            stdin = self.interactive and self.stages is None
+            self.monitor = M = Monitor(self.cmd, handlers, stdin=stdin)
+            # a stop() from here on reaches this Monitor
+            if self.stopped:
+                return ret
+
+            if self.stages is not None:
+                M.input = self.stages.start(self.capture_cmd, M)
+                try:
+                    ret = M.run()
+                finally:
+                    self.stages.stop()
+            else:
+                ret = M.run()
+
+            self.drops.append(
+                {
+                    "video_queue": self.video_queue,
+                    "audio_queue": self.audio_queue,
+                    "blocking": M.blocking,
+                    "dropped": M.dropped + M.drop_frames,
+                    "decimated": self.decimated(M),
+                }
+            )
+            if self.static and M.frame is not None:
+                d = self.decimated(M)
+                logging.info(f"static content: {d} of {M.frame + d} captured frames dropped")
+
+            if self.stopped or M.stop_reason not in ("queue", "degrade"):
+                if self.resume_file is not None and ret == 0 and not self.stopped:
+                    resume.clear(self.resume_file)  # streamed to the end
+                return ret
+
+            if M.stop_reason == "degrade":
+                self.set_degrade(self._next_level)
+                continue
+
+            logging.warning(
+                f"restarting with thread_queue_size video {self.video_queue} audio {self.audio_queue}"
+            )
+            self.build()
+
+    def resume_from(self, state: dict[str, T.Any]) -> None:
+        """start at the keyframe before a checkpointed position of this file"""
+
+        assert self.infn is not None and self.resume_source is not None
+        if self.start or Path(state.get("file", "")) != self.resume_source:
+            return
+        if not state.get("offset"):
+            return
+
+        self.start = resume.keyframe_before(self.infn, state["offset"], self.probeexe)
+        logging.info(
+            f"resuming {self.infn} at {self.start:.1f} s, checkpoint {state['offset']:.1f} s"
+        )
+
+    def _checkpoint(self) -> resume.Checkpoint:
+
+        assert self.resume_file is not None and self.infn is not None
+        assert self.resume_source is not None
+
+        duration = None
+        if self.loop:
+            d = get_meta(self.infn, self.probeexe).get("format", {}).get("duration")
+            duration = float(d) if d else None
+
+        return resume.Checkpoint(self.resume_file, self.resume_source, self.start, duration)
+
+    def decimated(self, M: Monitor) -> int:
+        """duplicate frames dropped in static content mode, from captured vs. encoded frames"""
+
+        t = M.out_time
+        if not self.static or t is None or M.frame is None:
+            return 0
+
+        fps = self.out_fps or self.fps or FPS
+        return max(0, round(t * fps) - M.frame)
+
+    def _grow_queue(self, M: Monitor) -> None:
+        old = (self.video_queue, self.audio_queue)
+
+        self.queue_scale *= 2
+        self.queue_size()
+
+        if (self.video_queue, self.audio_queue) == old:
+            logging.error("capture drops persist, but input queues are at their memory limit")
+            return
+
+        M.stop("queue")
+
+    def _speed_watch(self) -> SpeedWatch:
+        assert self.degrade is not None
+
+        D = self.degrade
+        top = len(D["ladder"])
+
+        return SpeedWatch(
+            on_slow=self._step(+1) if self.degrade_level < top else None,
+            on_headroom=self._step(-1) if self.degrade_level > 0 else None,
+            threshold=D.get("threshold", watchdog.THRESHOLD),
+            window=D.get("window_sec", watchdog.WINDOW_SEC),
+            up_load=D.get("up_load", watchdog.UP_LOAD),
+            up_window=D.get("up_window_sec", watchdog.UP_WINDOW_SEC),
+        )
+
+    def _step(self, d: int) -> T.Callable[[Monitor, str], None]:
+        def step(M: Monitor, cause: str) -> None:
+            old, new = self.degrade_level, self.degrade_level + d
+
+            verb = "down" if d > 0 else "up"
+            logging.warning(f"encoder stepping {verb} from level {old} to {new}: {cause}")
+            self.transitions.append({"time": time.time(), "from": old, "to": new, "cause": cause})
+
+            self._next_level = new
+            M.stop("degrade")
+
+        return step
+
+    def set_degrade(self, level: int) -> None:
+        """
+        apply encoder degradation ladder settings up to level, rebuilding the command.
+        Level 0 is the configured preset, frame rate and resolution.
+        """
+
+        assert self.degrade is not None
+
+        s = apply_ladder(self.degrade["ladder"], level)
+        self.degrade_level = level
+
+        self.preset = s.get("preset", self.base_preset)
+        # only ever reduce frame rate and resolution
+        self.out_fps = s["fps"] if "fps" in s and (not self.fps or s["fps"] < self.fps) else None
+        self.out_height = (
+            s["height"] if "height" in s and self.res and s["height"] < int(self.res[1]) else None
+        )
+
+        if self.auto_kbps:
+            self.video_kbps = 0
+            self.video_bitrate()
+
+        logging.info(
+            f"encoder level {level}: preset {self.preset} fps {self.out_fps or self.fps} "
+            f"height {self.out_height or (self.res[1] if self.res else None)} "
+            f"video {self.video_kbps} kbps"
+        )
+
+        self.build()
 
     def check_device(self, site: str | None = None) -> bool:
         """
@@ -116,30 +440,152 @@ class Livestream(Stream):
         return check_device(checkcmd)
 
 
+class Site(Stream):
+    """
+    output settings of one site (encoder, bitrate, URL) for MultiSite.
+    Builds no command line, and has no monitors or output files of its own.
+    """
+
+    def __init__(self, inifn: Path, site: str, **kwargs) -> None:
+        super().__init__(inifn, site, **kwargs)
+
+        self.site = site.lower()
+
+        self.osparam(inifn)
+
+        self.video_bitrate()
+        self.video_encoder()
+
+        self.sink = self.sink_url()
+
+
+class MultiSite(Livestream):
+    """
+    several sites from one FFmpeg process: capture or decode once, then one encoder per
+    distinct group of output settings (codec, bitrate, keyframe interval, preset, audio).
+    Sites with identical settings share an encoder, via the tee muxer.
+    """
+
+    def __init__(self, inifn: Path, sites: list[str], **kwargs) -> None:
+
+        self.members = [Site(inifn, s, **kwargs) for s in sites]
+        # the one capture or decode feeds every encoder
+        if len({(tuple(m.res or ()), m.fps) for m in self.members}) > 1:
+            raise ValueError("sites streamed from one FFmpeg process need the same size and fps")
+
+        super().__init__(inifn, sites[0], **kwargs)
+
+        # these would have to apply to every encoder group
+        self.degrade = None
+        if self.replay is not None or self.stages is not None:
+            logging.warning("replay buffer and split capture need one process per site")
+        if self.replay is not None:
+            self.replay.close()
+        self.replay = self.stages = None
+
+    def groups(self) -> list[tuple[list[str], list[Site]]]:
+        """sites by identical encoder and output options, in order of first site"""
+
+        G: dict[tuple[str, ...], list[Site]] = {}
+        for m in self.members:
+            opts = m.videoOut() + m.audioOut() + m.buffer()
+            G.setdefault(tuple(opts), []).append(m)
+
+        return [(list(k), v) for k, v in G.items()]
+
+    def build(self) -> None:
+
+        vidIn = self.videoIn()
+        audIn = self.audioIn()
+        if self.movingimage:
+            raise ValueError("moving background images need one process per site")
+        inputs = vidIn + audIn
+
+        G = self.groups()
+
+        cmd = [self.exe] + self.loglevel + self.yes + inputs
+
+        video: list[str] = []
+        if self.res:
+            labels = [f"[v{i}]" for i in range(len(G))]
+            f = self.videoFilter()
+            if f and f[0] == "-filter_complex":
+                graph = f[1]
+            else:
+                graph = "[0:v]" + (f[1] if f else "null")
+            cmd += ["-filter_complex", f"{graph},split={len(G)}{''.join(labels)}"]
+            video = labels
+        audio = self.maps(inputs)[-1]
+
+        for i, (opts, sites) in enumerate(G):
+            cmd += (["-map", video[i]] if video else []) + ["-map", audio]
+            if len(sites) == 1:
+                cmd += opts + self.timelimit + [sites[0].sink]
+                continue
+            # FLV wants codec headers out of band; the encoder only knows if told up front
+            opts = opts[:-2] if opts[-2:] == ["-f", "flv"] else opts
+            cmd += opts + ["-flags", "+global_header"] + self.timelimit + ["-f", "tee"]
+            cmd.append("|".join(f"[f=flv:onfail=ignore]{replay.escape(m.sink)}" for m in sites))
+
+        if self.health is not None:
+            cmd += self.health.outputs(self.timelimit)
+        if self.preview is not None:
+            cmd += self.preview.outputs(self.timelimit)
+
+        self.sink = " ".join(m.sink for m in self.members)
+        self.cmd = cmd
+        self.checkcmd = self.quick_check_cmd()
+
+        logging.info(
+            f"{len(self.members)} sites, {len(G)} encoders: "
+            + "; ".join(" ".join(m.site for m in sites) for _, sites in G)
+        )
+
+
+def livestream(inifn: Path, websites: str | list[str], **kwargs) -> Livestream:
+    """
+    stream to one site, or to several sites from one FFmpeg process.
+    websites: site name, list of names, or names separated by spaces or commas
+    """
+
+    sites = websites.replace(",", " ").split() if isinstance(websites, str) else list(websites)
+    if len(sites) == 1:
+        return Livestream(inifn, sites[0], **kwargs)
+
+    return MultiSite(inifn, sites, **kwargs)
+
+
 # %% operators
 class Screenshare:
     def __init__(self, inifn: Path, websites: str, **kwargs) -> None:
 
-        self.stream = Livestream(inifn, websites, vidsource="screen", **kwargs)
+        self.stream = livestream(inifn, websites, vidsource="screen", **kwargs)
 
 
 class Camera:
     def __init__(self, inifn: Path, websites: str, **kwargs):
 
-        self.stream = Livestream(inifn, websites, vidsource="camera", **kwargs)
+        self.stream = livestream(inifn, websites, vidsource="camera", **kwargs)
+
+
+class PictureInPicture:
+    def __init__(self, inifn: Path, websites: str, **kwargs):
+        """camera inset over screen share, composited in the same FFmpeg process"""
+
+        self.stream = livestream(inifn, websites, vidsource="pip", **kwargs)
 
 
 class Microphone:
     def __init__(self, inifn: Path, websites: str, **kwargs):
 
-        self.stream = Livestream(inifn, websites, **kwargs)
+        self.stream = livestream(inifn, websites, **kwargs)
 
 
 # %% File-based inputs
 class FileIn:
     def __init__(self, inifn: Path, websites: str, **kwargs):
 
-        self.stream = Livestream(inifn, websites, vidsource="file", **kwargs)
+        self.stream = livestream(inifn, websites, vidsource="file", **kwargs)
 
 
 class SaveDisk(Stream):
@@ -177,7 +623,18 @@ class SaveDisk(Stream):
     def save(self):
 
         if self.outfn:
+            self.write_caption()
             run(self.cmd)
 
         else:
             print("specify filename to save screen capture w/ audio to disk.")
+
+
+# kinds of stream by name, as used in daemon requests and schedule timetables
+OPERATORS: dict[str, T.Any] = {
+    "file": FileIn,
+    "screen": Screenshare,
+    "camera": Camera,
+    "pip": PictureInPicture,
+    "microphone": Microphone,
+}
@@ -0,0 +1,153 @@
+"""
+content complexity of a video file, to scale its streaming bitrate
+
+Spatial (SI) and temporal (TI) information as in ITU-T P.910, computed on
+small grayscale frames sampled in consecutive pairs spread across the file.
+A static slideshow has TI near 0, while sports can have TI > 30.
+
+Frames are tiny (96x54), so plain Python is fast enough for this one-time pass.
+Scores are cached per file path, size and modification time.
+"""
+
+from pathlib import Path
+import json
+import logging
+import math
+import subprocess
+
+from .ffmpeg import get_exe, get_meta
+from .utils import cache_dir, write_atomic
+
+W = 96
+H = 54
+SAMPLES = 8  # points spread across the file, each giving a pair of consecutive frames
+
+# SI, TI at or above which content is treated as fully complex
+SI_REF = 80.0
+TI_REF = 30.0
+MIN_SCALE = 0.4  # bitrate fraction for fully static content
+
+
+def sobel_std(f: bytes) -> float:
+    """standard deviation of Sobel gradient magnitude over frame interior"""
+
+    g = []
+    for y in range(1, H - 1):
+        r0, r1, r2 = (y - 1) * W, y * W, (y + 1) * W
+        for x in range(1, W - 1):
+            tl, tc, tr = f[r0 + x - 1], f[r0 + x], f[r0 + x + 1]
+            ml, mr = f[r1 + x - 1], f[r1 + x + 1]
+            bl, bc, br = f[r2 + x - 1], f[r2 + x], f[r2 + x + 1]
+            gx = (tr + 2 * mr + br) - (tl + 2 * ml + bl)
+            gy = (bl + 2 * bc + br) - (tl + 2 * tc + tr)
+            g.append(math.hypot(gx, gy))
+
+    return std(g)
+
+
+def diff_std(a: bytes, b: bytes) -> float:
+    return std([p - q for p, q in zip(b, a)])
+
+
+def std(v: list[float] | list[int]) -> float:
+    m = sum(v) / len(v)
+    return math.sqrt(sum((x - m) ** 2 for x in v) / len(v))
+
+
+def sample_frames(fn: Path, t: float, exe: str | None = None) -> list[bytes]:
+    """two consecutive W x H grayscale frames starting at t seconds"""
+
+    cmd = [
+        exe or get_exe("ffmpeg"),
+        "-loglevel",
+        "error",
+        "-ss",
+        f"{t:.3f}",
+        "-i",
+        str(fn),
+        "-frames:v",
+        "2",
+        "-vf",
+        f"scale={W}:{H},format=gray",
+        "-f",
+        "rawvideo",
+        "-",
+    ]
+
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+
+    n = W * H
+    return [raw[i:i + n] for i in range(0, len(raw) - n + 1, n)]
+
+
+def analyze(fn: Path, exe: str | None = None, probeexe: str | None = None) -> dict[str, float]:
+    """
+    Returns
+    -------
+    {"si": mean spatial information, "ti": mean temporal information}
+    """
+
+    meta = get_meta(fn, probeexe)
+    try:
+        duration = float(meta["format"]["duration"])
+    except (KeyError, ValueError):
+        duration = 0.0
+
+    si = []
+    ti = []
+    for i in range(SAMPLES):
+        frames = sample_frames(fn, duration * (i + 0.5) / SAMPLES, exe)
+        if not frames:
+            continue
+        si.append(sobel_std(frames[0]))
+        if len(frames) > 1:
+            ti.append(diff_std(frames[0], frames[1]))
+
+    if not si:
+        raise ValueError(f"no video frames decoded from {fn}")
+
+    return {"si": sum(si) / len(si), "ti": sum(ti) / len(ti) if ti else 0.0}
+
+
+def get_complexity(
+    fn: Path, exe: str | None = None, probeexe: str | None = None
+) -> dict[str, float]:
+    """analyze() with results cached by file path, size and modification time"""
+
+    fn = Path(fn).expanduser().resolve()
+    st = fn.stat()
+    key = f"{fn}:{st.st_size}:{st.st_mtime_ns}"
+
+    cache = cache_dir() / "complexity.json"
+
+    def load() -> dict[str, dict[str, float]]:
+        try:
+            return json.loads(cache.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    if key in (C := load()):
+        return C[key]
+
+    score = analyze(fn, exe, probeexe)
+    logging.info(f"{fn} complexity: SI {score['si']:.1f} TI {score['ti']:.1f}")
+
+    # entries other streams may have added meanwhile
+    C = load() | {key: score}
+    try:
+        write_atomic(cache, json.dumps(C, indent=1))
+    except OSError as e:
+        logging.warning(f"could not cache complexity: {e}")
+
+    return score
+
+
+def bitrate_scale(si: float, ti: float) -> float:
+    """
+    fraction of the ladder bitrate that content of this complexity needs.
+    Motion dominates what x264 spends bits on, so TI is weighted over SI.
+    """
+
+    c = 0.25 * min(si / SI_REF, 1.0) + 0.75 * min(ti / TI_REF, 1.0)
+
+    return MIN_SCALE + (1 - MIN_SCALE) * c
@@ -0,0 +1,422 @@
+"""
+long-running stream server with a JSON API on localhost
+
+Configs, executable paths and FFprobe metadata stay cached in this process,
+and each distinct stream request is planned (command line built) once,
+so starting a stream is one HTTP request rather than a cold Python launch.
+
+    python -m pylivestream.daemon
+
+Only local clients are served: each request must carry the token from the
+token file in the user cache directory (written at start, readable only by this
+user) as "Authorization: Bearer <token>", a local Host and, if any, a local Origin,
+and bodies must be Content-Type application/json. This keeps web pages from driving
+the daemon by cross-site requests or DNS rebinding.
+Stream options are limited to those in OPTIONS, and clips are written to the clip
+directory only.
+
+API (JSON bodies and responses):
+
+* GET /streams               list streams
+* GET /streams/<id>          status of one stream
+* POST /streams              start a stream: {"kind": "file", "ini": "~/pylivestream.json",
+                             "websites": "youtube", "options": {"infn": "video.mp4", "loop": true}}
+                             kind: file, screen, camera, pip, microphone.
+* POST /plans                same body as POST /streams, build the plan without starting
+* DELETE /streams/<id>       stop a stream
+* POST /streams/<id>/clip    MP4 of the last seconds from the replay buffer:
+                             {"seconds": 120, "outfn": "clip.mp4"} in the clip directory
+                             for streams planned with option "replay": true
+* PUT /streams/<id>/caption  change caption while streaming: {"text": "now playing ..."}
+                             for streams planned with option "live_caption": true
+
+Errors reply {"error": "..."} with status 404 for an unknown stream or route,
+400 for a bad request (including unknown site or missing config key or input file),
+500 for other failures.
+
+From Python:
+
+    from pylivestream.daemon import request
+    request("POST", "/streams", {"kind": "screen", "ini": "pylivestream.json", "websites": "twitch"})
+"""
+
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hmac
+import itertools
+import json
+import logging
+import os
+import secrets
+import signal
+import threading
+import time
+import typing as T
+import urllib.parse
+import urllib.request
+
+from .base import Livestream, OPERATORS
+from .utils import cache_dir
+
+PORT = 8765
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+# stream options a request may set, with their types. Options naming files the stream
+# would write (caption_file, resume_file, "dir" of preview and replay) are not accepted.
+OPTIONS: dict[str, tuple[type, ...]] = {
+    "infn": (str,),
+    "image": (str,),
+    "loop": (bool,),
+    "start": (int, float),
+    "caption": (str,),
+    "live_caption": (bool,),
+    "timeout": (int, float),
+    "static": (bool,),
+    "synthetic": (bool,),
+    "loudnorm": (bool,),
+    "complexity": (bool,),
+    "health": (bool,),
+    "replay": (bool,),
+    "preview": (bool,),
+    "resume": (bool,),
+    "verbose": (bool,),
+    "yes": (bool,),
+}
+
+
+def token_file() -> Path:
+    return cache_dir() / "daemon.token"
+
+
+def new_token() -> str:
+    """token for this daemon run, saved readable only by this user"""
+
+    token = secrets.token_urlsafe(32)
+    fn = token_file()
+    fn.unlink(missing_ok=True)
+    fd = os.open(fn, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+
+    return token
+
+
+def check_options(options: T.Any) -> dict[str, T.Any]:
+    """stream options of a request, ValueError if not allowed"""
+
+    if not isinstance(options, dict):
+        raise ValueError("options must be an object")
+
+    for k, v in options.items():
+        if k not in OPTIONS:
+            raise ValueError(f"option {k} not allowed, use some of {list(OPTIONS)}")
+        if not isinstance(v, OPTIONS[k]) or (isinstance(v, bool) and bool not in OPTIONS[k]):
+            raise ValueError(f"option {k} has wrong type {type(v).__name__}")
+
+    return options
+
+
+class Managed:
+    """a stream started by the daemon"""
+
+    def __init__(self, sid: int, key: str, stream: Livestream):
+        self.id = sid
+        self.key = key
+        self.stream = stream
+        self.started = time.time()
+        self.returncode: int | None = None
+        self.error = ""
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        try:
+            self.returncode = self.stream.startlive()
+        except Exception as e:  # noqa: B902  report any failure via status
+            self.error = str(e)
+            logging.error(f"stream {self.id}: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self.thread.is_alive()
+
+    def resources(self) -> dict[str, T.Any] | None:
+        W = self.stream.procwatch
+        if W is None:
+            return None
+        return {"latest": W.latest, "over_budget": sorted(W.over), "events": W.events[-10:]}
+
+    def status(self) -> dict[str, T.Any]:
+        M = self.stream.monitor
+        return {
+            "id": self.id,
+            "plan": json.loads(self.key),
+            "running": self.running,
+            "started": self.started,
+            "pid": M.proc.pid if M is not None and M.proc is not None else None,
+            "speed": M.speed if M is not None else None,
+            "out_time": M.out_time if M is not None else None,
+            "drops": self.stream.drops,
+            "decimated": self.stream.decimated(M) if M is not None else 0,
+            "health": self.stream.health.metrics if self.stream.health is not None else None,
+            "resources": self.resources(),
+            "preview": self.stream.latest_preview(),
+            "capture_buffer": self.stream.stages.status() if self.stream.stages is not None else None,
+            "returncode": self.returncode,
+            "error": self.error,
+            "caption": self.stream.caption,
+        }
+
+
+class Daemon:
+    def __init__(self, clip_dir: Path | None = None) -> None:
+
+        self.clip_dir = Path(clip_dir or cache_dir() / "clips").expanduser().resolve()
+        self.plans: dict[str, Livestream] = {}
+        self.streams: dict[int, Managed] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def plan(self, req: dict[str, T.Any]) -> tuple[str, Livestream]:
+        """build stream command, or reuse one built for an identical request"""
+
+        kind = req.get("kind", "file")
+        if kind not in OPERATORS:
+            raise ValueError(f"unknown kind {kind}, use one of {list(OPERATORS)}")
+        options = check_options(req.get("options", {}))
+
+        key = json.dumps(
+            {
+                "kind": kind,
+                "ini": req["ini"],
+                "websites": req["websites"],
+                "options": options,
+            },
+            sort_keys=True,
+        )
+
+        with self._lock:
+            if key not in self.plans:
+                op = OPERATORS[kind](
+                    req["ini"], req["websites"], interactive=False, **options
+                )
+                self.plans[key] = op.stream
+
+            return key, self.plans[key]
+
+    def start(self, req: dict[str, T.Any]) -> dict[str, T.Any]:
+
+        key, S = self.plan(req)
+
+        with self._lock:
+            if any(m.running and m.stream is S for m in self.streams.values()):
+                raise ValueError("an identical stream is already running")
+
+            m = Managed(next(self._ids), key, S)
+            self.streams[m.id] = m
+            m.thread.start()
+
+        return m.status()
+
+    def stop(self, sid: int) -> dict[str, T.Any]:
+
+        m = self.streams[sid]
+        if m.running:  # a stop of a finished stream would be pending for its next start
+            m.stream.stop()
+        m.thread.join(timeout=10)
+
+        return m.status()
+
+    def caption(self, sid: int, text: str) -> dict[str, T.Any]:
+
+        m = self.streams[sid]
+        m.stream.set_caption(text)
+
+        return m.status()
+
+    def clip(self, sid: int, req: dict[str, T.Any]) -> dict[str, T.Any]:
+
+        m = self.streams[sid]
+
+        fn = (self.clip_dir / req["outfn"]).resolve()
+        if not fn.is_relative_to(self.clip_dir):
+            raise ValueError(f"clips are written in {self.clip_dir}")
+        self.clip_dir.mkdir(parents=True, exist_ok=True)
+
+        fn = m.stream.clip(float(req.get("seconds", 60)), fn)
+
+        return {"clip": str(fn)}
+
+    def shutdown(self) -> None:
+        for m in self.streams.values():
+            if m.running:
+                m.stream.stop()
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    daemon: Daemon
+    token: str = ""
+
+    def _allowed(self) -> bool:
+        """local, authenticated request with JSON body, else replies with an error"""
+
+        host = self.headers.get("Host", "")
+        hostname = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+        if hostname.strip("[]") not in LOCAL_HOSTS:
+            self._reply(403, {"error": f"host {host} not allowed"})
+            return False
+
+        origin = self.headers.get("Origin")
+        if origin is not None:
+            o = urllib.parse.urlsplit(origin)
+            if o.scheme not in ("http", "https") or o.hostname not in LOCAL_HOSTS:
+                self._reply(403, {"error": f"origin {origin} not allowed"})
+                return False
+
+        auth = self.headers.get("Authorization", "")
+        if not self.token or not hmac.compare_digest(auth, f"Bearer {self.token}"):
+            self._reply(401, {"error": "missing or wrong token"})
+            return False
+
+        if self.command in ("POST", "PUT"):
+            ctype = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if ctype != "application/json":
+                self._reply(415, {"error": "Content-Type must be application/json"})
+                return False
+
+        return True
+
+    def _reply(self, code: int, body: T.Any) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict[str, T.Any]:
+        n = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(n)) if n else {}
+
+    def _handle(self, fun: T.Callable[[], T.Any], code: int = 200) -> None:
+        try:
+            body = fun()
+        except (KeyError, IndexError, ValueError, TypeError, FileNotFoundError) as e:
+            # missing or bad request field, unknown site or config key, missing input file
+            self._reply(400, {"error": f"{type(e).__name__}: {e}"})
+        except Exception as e:  # noqa: B902  reply rather than drop the connection
+            logging.error(f"{self.command} {self.path}: {e}")
+            self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            self._reply(code, body)
+
+    def _handle_stream(self, sid: str, fun: T.Callable[[int], T.Any], code: int = 200) -> None:
+        """as _handle for an existing stream id, else 404"""
+
+        if not sid.isdecimal() or int(sid) not in self.daemon.streams:
+            self._reply(404, {"error": f"no stream {sid}"})
+            return
+
+        self._handle(lambda: fun(int(sid)), code)
+
+    def do_GET(self) -> None:
+        if not self._allowed():
+            return
+        D = self.daemon
+        parts = self.path.strip("/").split("/")
+        if self.path.rstrip("/") == "/streams":
+            self._handle(lambda: [m.status() for m in D.streams.values()])
+        elif len(parts) == 2 and parts[0] == "streams":
+            self._handle_stream(parts[1], lambda sid: D.streams[sid].status())
+        else:
+            self._reply(404, {"error": f"no route {self.path}"})
+
+    def do_POST(self) -> None:
+        if not self._allowed():
+            return
+        D = self.daemon
+        parts = self.path.strip("/").split("/")
+        if self.path.rstrip("/") == "/streams":
+            self._handle(lambda: D.start(self._body()), 201)
+        elif self.path.rstrip("/") == "/plans":
+            self._handle(lambda: {"cmd": D.plan(self._body())[1].cmd})
+        elif len(parts) == 3 and parts[0] == "streams" and parts[2] == "clip":
+            self._handle_stream(parts[1], lambda sid: D.clip(sid, self._body()), 201)
+        else:
+            self._reply(404, {"error": f"no route {self.path}"})
+
+    def do_PUT(self) -> None:
+        if not self._allowed():
+            return
+        D = self.daemon
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "streams" and parts[2] == "caption":
+            self._handle_stream(parts[1], lambda sid: D.caption(sid, self._body()["text"]))
+        else:
+            self._reply(404, {"error": f"no route {self.path}"})
+
+    def do_DELETE(self) -> None:
+        if not self._allowed():
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "streams":
+            self._handle_stream(parts[1], self.daemon.stop)
+        else:
+            self._reply(404, {"error": f"no route {self.path}"})
+
+    def log_message(self, fmt: str, *args: T.Any) -> None:
+        logging.info(fmt % args)
+
+
+def serve(port: int = PORT, host: str = "127.0.0.1", clip_dir: Path | None = None) -> None:
+    """run daemon until interrupted. Only listens on localhost by default."""
+
+    D = Daemon(clip_dir)
+    Handler.daemon = D
+    Handler.token = new_token()
+
+    with ThreadingHTTPServer((host, port), Handler) as httpd:
+        print(f"PyLivestream daemon on http://{host}:{httpd.server_port}")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            D.shutdown()
+
+
+def request(
+    method: str,
+    path: str,
+    body: dict[str, T.Any] | None = None,
+    port: int = PORT,
+    token: str | None = None,
+) -> T.Any:
+    """call the daemon API, by default with the token of the running daemon"""
+
+    if token is None:
+        token = token_file().read_text().strip()
+
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=data,
+        method=method,
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+    )
+    with urllib.request.urlopen(req) as r:
+        return json.loads(r.read())
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    p = argparse.ArgumentParser(description="PyLivestream daemon with JSON API on localhost")
+    p.add_argument("-p", "--port", help="TCP port on localhost", type=int, default=PORT)
+    p.add_argument("--clip-dir", help="directory for replay clips (default: user cache)")
+    P = p.parse_args()
+
+    serve(P.port, clip_dir=P.clip_dir)
@@ -0,0 +1,273 @@
+"""
+choose the video encoder by measured quality per CPU-second on this host
+
+The encoders in the local FFmpeg build are read once from "ffmpeg -encoders".
+With "video_codec": "auto" in pylivestream.json, each candidate encoder for the site
+that this FFmpeg has is benchmarked offline: a reference clip is encoded at the
+site's target bitrate, resolution and frame rate, timing CPU seconds, and the result
+is compared with the reference by SSIM and PSNR.
+The encoder with the best SSIM that still encodes with realtime headroom is used.
+
+Probe and benchmark results are cached per host and FFmpeg executable.
+
+    python -m pylivestream.encoders youtube 720 30 2500
+"""
+
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import re
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import typing as T
+
+from .ffmpeg import get_exe
+from .utils import cache_dir, write_atomic
+
+BENCH_SEC = 5.0  # seconds of reference clip
+HEADROOM = 1.5  # encode at least this much faster than realtime while benchmarking
+
+# candidates in order of preference, for sites taking HEVC or only H.264 over RTMP.
+# Hardware encoders listed here take ordinary yuv420p frames; if no device is present,
+# their benchmark fails and they are skipped.
+HEVC_SITES = ("youtube",)
+HEVC = ["libx265", "hevc_nvenc", "hevc_videotoolbox"]
+H264 = ["libx264", "h264_nvenc", "h264_videotoolbox", "h264_amf"]
+
+ENCODER_LINE = re.compile(r"^\s*V[A-Z.]{5}\s+(\S+)")
+SSIM = re.compile(r"SSIM .*All:([\d.]+)")
+PSNR = re.compile(r"PSNR .*average:([\d.]+|inf)")
+
+_lock = threading.Lock()
+
+
+def candidates(site: str) -> list[str]:
+    return (HEVC + H264) if site in HEVC_SITES else H264
+
+
+def uses_preset(codec: str) -> bool:
+    """x264 preset names like "veryfast" are only understood by the x264/x265 encoders"""
+    return codec in ("libx264", "libx265")
+
+
+def _exe_key(exe: str) -> str:
+    return f"{exe}:{os.stat(exe).st_mtime_ns}"
+
+
+def _load(name: str) -> dict[str, T.Any]:
+    try:
+        return json.loads((cache_dir() / name).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(name: str, C: dict[str, T.Any]) -> None:
+    try:
+        write_atomic(cache_dir() / name, json.dumps(C, indent=1))
+    except OSError as e:
+        logging.warning(f"could not cache {name}: {e}")
+
+
+def parse_encoders(text: str) -> list[str]:
+    """video encoder names from "ffmpeg -encoders" output"""
+
+    # the legend above the "------" line has the same layout
+    _, _, table = text.partition("------")
+
+    return [m.group(1) for line in table.splitlines() if (m := ENCODER_LINE.match(line))]
+
+
+def available(exe: str | None = None) -> list[str]:
+    """video encoders of this FFmpeg build, probed once per executable"""
+
+    exe = exe or get_exe("ffmpeg")
+    key = _exe_key(exe)
+
+    with _lock:
+        C = _load("encoders.json")
+        if key in C:
+            return C[key]
+
+    ret = subprocess.run(
+        [exe, "-hide_banner", "-encoders"], capture_output=True, text=True, errors="replace"
+    )
+    if ret.returncode != 0:
+        logging.warning(f"could not list FFmpeg encoders: {ret.stderr[-500:]}")
+        return []
+
+    names = parse_encoders(ret.stdout)
+
+    with _lock:
+        C = _load("encoders.json")
+        C[key] = names
+        _save("encoders.json", C)
+
+    return names
+
+
+def reference_input(height: int, fps: float, reference: Path | None = None) -> list[str]:
+    """FFmpeg input options for the reference clip"""
+
+    if reference:
+        return ["-t", str(BENCH_SEC), "-i", str(Path(reference).expanduser())]
+
+    width = round(height * 16 / 9 / 2) * 2
+    return ["-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={BENCH_SEC}"]
+
+
+def parse_quality(stderr: str) -> dict[str, float]:
+    """SSIM and PSNR summaries printed by the FFmpeg ssim and psnr filters"""
+
+    s = SSIM.search(stderr)
+    p = PSNR.search(stderr)
+    if not s or not p:
+        raise ValueError("no SSIM/PSNR in FFmpeg output")
+
+    return {"ssim": float(s.group(1)), "psnr": float(p.group(1))}
+
+
+def benchmark(
+    codec: str,
+    height: int,
+    fps: float,
+    kbps: int,
+    exe: str | None = None,
+    preset: str = "veryfast",
+    reference: Path | None = None,
+) -> dict[str, float]:
+    """
+    encode reference clip with codec, then compare with reference.
+
+    Returns ssim, psnr, cpu_sec (encoder user + system CPU time), and speed
+    (clip seconds per wall-clock second).
+    """
+
+    exe = exe or get_exe("ffmpeg")
+    ref = reference_input(height, fps, reference)
+    scale = f"scale=-2:{height},fps={fps},format=yuv420p"
+
+    with tempfile.TemporaryDirectory() as d:
+        enc = Path(d) / "enc.mkv"
+
+        cmd = [exe, "-hide_banner", "-nostdin", "-loglevel", "error"] + ref
+        cmd += ["-vf", scale, "-an", "-codec:v", codec]
+        if uses_preset(codec):
+            cmd += ["-preset", preset]
+        cmd += ["-b:v", f"{kbps}k", "-g", str(round(2 * fps)), "-y", str(enc)]
+
+        c0 = os.times()
+        t0 = time.monotonic()
+        ret = subprocess.run(cmd, capture_output=True, text=True, errors="replace")
+        wall = time.monotonic() - t0
+        c1 = os.times()
+        if ret.returncode != 0:
+            raise ValueError(f"{codec} benchmark encode failed: {ret.stderr[-500:]}")
+
+        cpu = (c1.children_user - c0.children_user) + (c1.children_system - c0.children_system)
+        if cpu <= 0:  # Windows does not report child CPU time
+            cpu = wall
+
+        cmd = [exe, "-hide_banner", "-nostdin", "-i", str(enc)] + ref
+        cmd += [
+            "-lavfi",
+            f"[1:v]{scale}[r];[r]split[r0][r1];[0:v]split[d0][d1];[d0][r0]ssim;[d1][r1]psnr",
+            "-f",
+            "null",
+            "-",
+        ]
+        ret = subprocess.run(cmd, capture_output=True, text=True, errors="replace")
+        if ret.returncode != 0:
+            raise ValueError(f"{codec} benchmark compare failed: {ret.stderr[-500:]}")
+
+    return parse_quality(ret.stderr) | {"cpu_sec": cpu, "speed": BENCH_SEC / wall}
+
+
+def choose(results: dict[str, dict[str, float]], headroom: float = HEADROOM) -> str | None:
+    """
+    best SSIM among encoders with realtime headroom, fewer CPU seconds breaking ties.
+    If none keep up, the fastest.
+    """
+
+    if not results:
+        return None
+
+    ok = {c: r for c, r in results.items() if r["speed"] >= headroom}
+    if ok:
+        return max(ok, key=lambda c: (round(ok[c]["ssim"], 3), -ok[c]["cpu_sec"]))
+
+    return max(results, key=lambda c: results[c]["speed"])
+
+
+def select(
+    site: str,
+    height: int,
+    fps: float,
+    kbps: int,
+    exe: str | None = None,
+    preset: str = "veryfast",
+    reference: Path | None = None,
+) -> str | None:
+    """
+    encoder for site at resolution, frame rate and bitrate on this host,
+    benchmarking candidates not yet in the cache.
+    None if no candidate is available.
+    """
+
+    exe = exe or get_exe("ffmpeg")
+    have = set(available(exe))
+    todo = [c for c in candidates(site) if c in have]
+    if len(todo) <= 1:
+        return todo[0] if todo else None
+
+    prefix = f"{socket.gethostname()}:{_exe_key(exe)}:{height}p{fps}:{kbps}k:{preset}:{reference}"
+
+    with _lock:
+        C = _load("codec_bench.json")
+
+    results: dict[str, dict[str, float]] = {}
+    for c in todo:
+        key = f"{prefix}:{c}"
+        if key not in C:
+            logging.info(f"benchmarking {c} at {height}p{fps} {kbps} kbps")
+            try:
+                C[key] = benchmark(c, height, fps, kbps, exe, preset, reference)
+            except ValueError as e:
+                logging.info(e)
+                C[key] = None  # not usable on this host, e.g. no GPU
+        if C[key] is not None:
+            results[c] = C[key]
+
+    with _lock:
+        _save("codec_bench.json", _load("codec_bench.json") | C)
+
+    for c, r in results.items():
+        logging.info(
+            f"{c}: SSIM {r['ssim']:.4f} PSNR {r['psnr']:.2f} dB "
+            f"CPU {r['cpu_sec']:.1f} s speed {r['speed']:.2f}x"
+        )
+
+    return choose(results)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    p = argparse.ArgumentParser(description="benchmark video encoders for a site on this host")
+    p.add_argument("site", help="site name, e.g. youtube")
+    p.add_argument("height", type=int, help="video height, e.g. 720")
+    p.add_argument("fps", type=float, help="frames/sec")
+    p.add_argument("kbps", type=int, help="video bitrate")
+    p.add_argument("-preset", default="veryfast", help="x264/x265 preset")
+    p.add_argument("-reference", help="reference video clip instead of synthetic test pattern")
+    P = p.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    codec = select(P.site, P.height, P.fps, P.kbps, preset=P.preset, reference=P.reference)
+    print(codec if codec else "no candidate encoder available")
@@ -1,12 +1,20 @@
 import typing as T
 import subprocess
 from time import sleep
+import logging
 import os
+import sys
 from pathlib import Path
 import shutil
 import json
 import functools
 
+from . import tracing
+
+RTMP_PORT = 1935
+LISTEN_DEADLINE = 10.0  # seconds to wait for the local listener to accept connections
+LISTEN_SLEEP = 0.5  # where the port can't be checked: 0.2 not long enough, 0.3 worked
+
 
 class Ffmpeg:
     def __init__(self):
@@ -17,9 +25,6 @@ class Ffmpeg:
 
         self.YES = ["-y"]
 
-        # default 8, increasing can help avoid warnings
-        self.QUEUE = ["-thread_queue_size", "8"]
-
         # https://trac.ffmpeg.org/wiki/StreamingGuide#The-reflag
         self.THROTTLE = "-re"
 
@@ -36,10 +41,26 @@ class Ffmpeg:
         else:
             return []
 
+    def queue(self, size: int) -> list[str]:
+        """
+        input option: packets buffered between a capture device thread and the encoder.
+        Default 8, increasing can help avoid "Thread message queue blocking" and lost frames.
+        """
+        return ["-thread_queue_size", str(size)]
+
     def drawtext(self, text: str) -> list[str]:
+        filt = self.drawtext_filter(text)
+
+        return ["-vf", filt] if filt else []
+
+    def drawtext_filter(self, text: str, textfile: Path | None = None) -> str:
+        """
+        textfile: caption is read from this file, re-read every frame,
+        so it can be changed while streaming. Text is shown literally, without % expansion.
+        """
         # fontfile=/path/to/font.ttf:
-        if not text:  # None or '' or [] etc.
-            return []
+        if not text and not textfile:  # None or '' or [] etc.
+            return ""
 
         fontcolor = "fontcolor=white"
         fontsize = "fontsize=24"
@@ -49,10 +70,14 @@ class Ffmpeg:
         x = "x=(w-text_w)/2"
         y = "y=(h-text_h)*3/4"
 
-        return [
-            "-vf",
-            f"drawtext=text='{text}':{fontcolor}:{fontsize}:{box}:{boxcolor}:{border}:{x}:{y}",
-        ]
+        style = f"{fontcolor}:{fontsize}:{box}:{boxcolor}:{border}:{x}:{y}"
+
+        if textfile:
+            # filter option values escape ":" e.g. of Windows drive letter
+            fn = Path(textfile).as_posix().replace(":", "\\:")
+            return f"drawtext=textfile='{fn}':reload=1:expansion=none:{style}"
+
+        return f"drawtext=text='{text}':{style}"
 
     def listener(self):
         """
@@ -62,11 +87,11 @@ class Ffmpeg:
         I put -timeout 5 to allow for very slow computers.
         -timeout is the delay to wait for stream input before erroring.
 
-        sleep: 0.2 not long enough. 0.3 worked, so set 0.5 for some margin.
+        Returns once the listener's RTMP port is open, or it exited, or after LISTEN_DEADLINE.
+        Where the port can't be checked (not Linux), waits LISTEN_SLEEP instead.
+        Startup time is in self.listener_sec.
         """
 
-        TIMEOUT = 0.5
-
         cmd = [get_ffplay(), "-loglevel", "error", "-timeout", "5", "-autoexit", "rtmp://localhost"]
 
         print(
@@ -75,13 +100,30 @@ class Ffmpeg:
             "\n\n Press   q   in this terminal to end stream.",
         )
 
+        if port_listening(RTMP_PORT):
+            logging.warning(f"port {RTMP_PORT} is already in use, listener may fail")
+
+        t0 = tracing.now()
         proc = subprocess.Popen(cmd)
 
         #        proc = subprocess.Popen(['ffmpeg', '-v', 'fatal', '-timeout', '5',
         #                                 '-i', 'rtmp://localhost', '-f', 'null', '-'],
         #                                stdout=subprocess.DEVNULL)
 
-        sleep(TIMEOUT)
+        if port_listening(RTMP_PORT) is None:
+            sleep(LISTEN_SLEEP)
+
+        while port_listening(RTMP_PORT) is False:
+            if proc.poll() is not None:
+                break
+            if tracing.now() - t0 > LISTEN_DEADLINE:
+                logging.warning(f"listener not ready after {LISTEN_DEADLINE} s, starting anyway")
+                break
+            sleep(0.01)
+
+        self.listener_sec = tracing.now() - t0
+        tracing.record("listener", t0)
+        logging.info(f"listener started in {self.listener_sec * 1000:.0f} ms")
 
         return proc
 
@@ -96,12 +138,37 @@ class Ffmpeg:
         return ["-filter_complex", f"movie={bg}:loop=0,setpts=N/FRAME_RATE/TB"]
 
 
+def port_listening(port: int) -> bool | None:
+    """
+    whether a local TCP socket is listening on port, or None where that can't be told.
+
+    Only Linux can tell without touching the port: binding it could take it from
+    the listener, and connecting would use up the listener's only connection.
+    """
+
+    if sys.platform != "linux":
+        return None
+
+    for fn in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            lines = Path(fn).read_text().splitlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            f = line.split()
+            if f[3] == "0A" and int(f[1].rsplit(":", 1)[1], 16) == port:  # 0A: LISTEN
+                return True
+
+    return False
+
+
 @functools.cache
 def get_exe(name: str) -> str:
 
-    for p in (os.environ.get("FFMPEG_ROOT"), None):
-        if exe := shutil.which(name, path=p):
-            return exe
+    with tracing.span("get_exe", exe=name):
+        for p in (os.environ.get("FFMPEG_ROOT"), None):
+            if exe := shutil.which(name, path=p):
+                return exe
 
     raise FileNotFoundError(
         f"""
@@ -126,6 +193,11 @@ def get_ffprobe() -> str:
 
 
 def get_meta(fn: Path, exein: str | None = None) -> dict[str, T.Any]:
+    """
+    FFprobe metadata of a file.
+    Cached in memory per file path, size and modification time.
+    """
+
     if not fn:  # audio-only
         return {}
 
@@ -136,17 +208,26 @@ def get_meta(fn: Path, exein: str | None = None) -> dict[str, T.Any]:
 
     exe = get_exe("ffprobe") if exein is None else exein
 
+    st = fn.stat()
+
+    return _probe(str(fn), st.st_size, st.st_mtime_ns, str(exe))
+
+
+@functools.lru_cache(maxsize=1024)
+def _probe(fn: str, size: int, mtime_ns: int, exe: str) -> dict[str, T.Any]:
+
     cmd = [
-        str(exe),
+        exe,
         "-loglevel",
         "error",
         "-print_format",
         "json",
         "-show_streams",
         "-show_format",
-        str(fn),
+        fn,
     ]
 
-    ret = subprocess.check_output(cmd, text=True)
+    with tracing.span("ffprobe", file=fn):
+        ret = subprocess.check_output(cmd, text=True)
     # %% decode JSON from FFprobe
     return json.loads(ret)
@@ -0,0 +1,62 @@
+import signal
+import argparse
+
+from .api import stream_files
+
+if __name__ == "__main__":
+    """
+    LIVE STREAM using FFMPEG -- all files in a directory, or a single file
+
+    The directory is indexed with FFprobe metadata, so rescans of large libraries
+    only probe new or changed files, and selections like
+    "audio under 5 minutes" come from the index.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    p = argparse.ArgumentParser(description="Livestream files of a directory, or a single file")
+    p.add_argument("path", help="directory (searched recursively) or file to stream")
+    p.add_argument("websites", help="site to stream, e.g. localhost youtube facebook twitch")
+    p.add_argument("json", help="JSON file with stream parameters such as key")
+    p.add_argument("-glob", help="file glob pattern to stream", default="*")
+    p.add_argument("-image", help="static image to display, for audio-only files")
+    p.add_argument("-shuffle", help="shuffle playback order", action="store_true")
+    p.add_argument("-loop", help="repeat playlist endlessly", action="store_true")
+    p.add_argument(
+        "--media", help="only stream audio-only or video files", choices=["audio", "video"]
+    )
+    p.add_argument("--min-duration", help="only files at least this many seconds", type=float)
+    p.add_argument("--max-duration", help="only files at most this many seconds", type=float)
+    p.add_argument("--index", help="SQLite media index file (default: user cache directory)")
+    p.add_argument("--prefetch", help="read ahead this many upcoming files", type=int, default=0)
+    p.add_argument("--cache", help="local directory for staged copies of files on remote mounts")
+    p.add_argument("--cache-mb", help="size limit of staging cache", type=int, default=4096)
+    p.add_argument("--loudnorm", help="normalize loudness of files", action="store_true")
+    p.add_argument(
+        "--resume", help="continue where streaming last stopped early", action="store_true"
+    )
+    p.add_argument("-y", "--yes", help="no confirmation dialog", action="store_true")
+    p.add_argument(
+        "-t", "--timeout", help="stop streaming each file after --timeout seconds", type=int
+    )
+    P = p.parse_args()
+
+    stream_files(
+        ini_file=P.json,
+        websites=P.websites,
+        video_path=P.path,
+        glob=P.glob,
+        media=P.media,
+        min_duration=P.min_duration,
+        max_duration=P.max_duration,
+        shuffle=P.shuffle,
+        loop=P.loop,
+        still_image=P.image,
+        index=P.index,
+        prefetch=P.prefetch,
+        cache=P.cache,
+        cache_mb=P.cache_mb,
+        loudnorm=P.loudnorm,
+        resume=P.resume,
+        assume_yes=P.yes,
+        timeout=P.timeout,
+    )
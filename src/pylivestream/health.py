@@ -0,0 +1,246 @@
+"""
+A/V health of a running stream: dead air, frozen video and black frames
+
+The same FFmpeg process that streams also writes two small extra outputs,
+read by Python over localhost TCP:
+
+* audio downmixed and resampled to 8 kHz mono 16-bit PCM
+* video at 2 fps, scaled to 64x36 grayscale
+
+NumPy computes audio RMS/peak level and video mean luma, black pixel fraction and
+frame-to-frame difference. A condition held for long enough is reported as an event,
+and again when it ends. Analysis is a few microseconds per block, and the extra FFmpeg
+filtering is small next to the encoder, so the monitor costs a few percent of a core.
+
+Requires NumPy:
+
+    pip install pylivestream[health]
+
+Events are logged, and passed to the optional on_event callback as dicts:
+{"time": epoch seconds, "event": name, "message": str}
+with event names silence, freeze, black, each followed by e.g. silence_end.
+"""
+
+import logging
+import socket
+import threading
+import time
+import typing as T
+
+import numpy as np
+
+RATE = 8000  # Hz, mono PCM for audio level
+BLOCK_SEC = 0.5  # audio analysis block
+W = 64
+H = 36
+FPS = 2.0
+
+SILENCE_DB = -50.0  # dBFS RMS, below this is dead air
+SILENCE_SEC = 10.0
+FREEZE_DIFF = 1.0  # mean absolute luma difference between frames, below this is frozen
+FREEZE_SEC = 10.0
+BLACK_LUMA = 24  # pixels at or below this are black (limited range black is 16)
+BLACK_FRACTION = 0.98
+BLACK_SEC = 5.0
+
+
+def level_db(block: np.ndarray) -> tuple[float, float]:
+    """RMS and peak level in dBFS of 16-bit PCM samples"""
+
+    x = block.astype(np.float32) / 32768
+    rms = float(np.sqrt(np.mean(x * x)))
+    peak = float(np.max(np.abs(x)))
+
+    return 20 * np.log10(max(rms, 1e-6)), 20 * np.log10(max(peak, 1e-6))
+
+
+def black_fraction(frame: np.ndarray) -> float:
+    return float(np.mean(frame <= BLACK_LUMA))
+
+
+def motion(a: np.ndarray, b: np.ndarray) -> float:
+    """mean absolute difference of two grayscale frames"""
+    return float(np.mean(np.abs(a.astype(np.int16) - b.astype(np.int16))))
+
+
+class Detector:
+    """condition that counts once it holds for hold_sec seconds of stream time"""
+
+    def __init__(self, name: str, hold_sec: float):
+        self.name = name
+        self.hold_sec = hold_sec
+
+        self.active = False
+        self.since: float | None = None
+
+    def update(self, bad: bool, t: float) -> str | None:
+        """event name on a change of state at stream time t, else None"""
+
+        if not bad:
+            self.since = None
+            if self.active:
+                self.active = False
+                return f"{self.name}_end"
+            return None
+
+        if self.since is None:
+            self.since = t
+        if not self.active and t - self.since >= self.hold_sec:
+            self.active = True
+            return self.name
+
+        return None
+
+
+class Health:
+    """
+    extra FFmpeg outputs and their analysis.
+
+    metrics: latest rms_db, peak_db, luma, black (fraction of pixels), motion
+    events: list of event dicts
+    """
+
+    def __init__(
+        self,
+        video: bool = True,
+        audio: bool = True,
+        on_event: T.Callable[[dict[str, T.Any]], None] | None = None,
+    ):
+
+        self.on_event = on_event
+
+        self.metrics: dict[str, float | None] = dict.fromkeys(
+            ("rms_db", "peak_db", "luma", "black", "motion")
+        )
+        self.events: list[dict[str, T.Any]] = []
+
+        self.silence = Detector("silence", SILENCE_SEC)
+        self.freeze = Detector("freeze", FREEZE_SEC)
+        self.black = Detector("black", BLACK_SEC)
+
+        self.kinds = [k for k, on in (("video", video), ("audio", audio)) if on]
+        self.socks: dict[str, socket.socket] = {}
+
+        self._t = {"video": 0.0, "audio": 0.0}  # stream time analyzed
+        self._last: np.ndarray | None = None
+
+        self.open()
+
+    @property
+    def closed(self) -> bool:
+        return not self.socks
+
+    def open(self) -> None:
+        """listen for the FFmpeg outputs, on new ports if closed before"""
+
+        for k in self.kinds:
+            if k in self.socks:
+                continue
+            s = socket.create_server(("127.0.0.1", 0))
+            self.socks[k] = s
+            threading.Thread(target=self._serve, args=(k, s), daemon=True).start()
+
+    def close(self) -> None:
+        for s in self.socks.values():
+            s.close()
+        self.socks = {}
+
+    def outputs(self, extra: list[str] | None = None) -> list[str]:
+        """
+        FFmpeg output options for the monitor outputs.
+        extra: options that must end these outputs along with the main one, e.g. -t
+        """
+
+        extra = extra or []
+        o: list[str] = []
+
+        if "video" in self.socks:
+            o += ["-an", "-sn", "-dn", "-vf", f"fps={FPS},scale={W}:{H},format=gray"]
+            o += ["-f", "rawvideo"] + extra + [self._url("video")]
+        if "audio" in self.socks:
+            o += ["-vn", "-sn", "-dn", "-af", f"aresample={RATE}", "-ac", "1"]
+            o += ["-codec:a", "pcm_s16le", "-f", "s16le"] + extra + [self._url("audio")]
+
+        return o
+
+    def _url(self, kind: str) -> str:
+        return f"tcp://127.0.0.1:{self.socks[kind].getsockname()[1]}"
+
+    def audio(self, block: np.ndarray) -> None:
+        """analyze a block of 16-bit PCM at RATE"""
+
+        rms, peak = level_db(block)
+        self.metrics["rms_db"] = round(rms, 1)
+        self.metrics["peak_db"] = round(peak, 1)
+
+        self._t["audio"] += block.size / RATE
+        self._event(self.silence.update(rms < SILENCE_DB, self._t["audio"]), f"{rms:.1f} dBFS")
+
+    def video(self, frame: np.ndarray) -> None:
+        """analyze a W x H grayscale frame"""
+
+        blk = black_fraction(frame)
+        self.metrics["luma"] = round(float(frame.mean()), 1)
+        self.metrics["black"] = round(blk, 3)
+
+        self._t["video"] += 1 / FPS
+        t = self._t["video"]
+
+        self._event(self.black.update(blk >= BLACK_FRACTION, t), f"{blk:.1%} black pixels")
+
+        if self._last is not None:
+            m = motion(self._last, frame)
+            self.metrics["motion"] = round(m, 2)
+            self._event(self.freeze.update(m < FREEZE_DIFF, t), f"frame difference {m:.2f}")
+        self._last = frame
+
+    def _event(self, name: str | None, message: str) -> None:
+        if name is None:
+            return
+
+        e = {"time": time.time(), "event": name, "message": message}
+        self.events.append(e)
+
+        warn = not name.endswith("_end")
+        logging.log(logging.WARNING if warn else logging.INFO, f"stream health: {name} {message}")
+
+        if self.on_event is not None:
+            self.on_event(e)
+
+    def _serve(self, kind: str, sock: socket.socket) -> None:
+        """accept each FFmpeg run's connection in turn, analyzing until it closes"""
+
+        size = W * H if kind == "video" else round(RATE * BLOCK_SEC) * 2
+        buf = bytearray(size)
+
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:  # closed
+                return
+
+            if kind == "video":
+                self._last = None  # no freeze across a restart
+            with conn:
+                while read_exact(conn, buf):
+                    if kind == "video":
+                        self.video(np.frombuffer(buf, np.uint8).reshape(H, W).copy())
+                    else:
+                        self.audio(np.frombuffer(buf, "<i2"))
+
+
+def read_exact(conn: socket.socket, buf: bytearray) -> bool:
+    """fill buf from connection, False at end of stream"""
+
+    view = memoryview(buf)
+    n = 0
+    while n < len(buf):
+        try:
+            k = conn.recv_into(view[n:])
+        except OSError:
+            return False
+        if k == 0:
+            return False
+        n += k
+
+    return True
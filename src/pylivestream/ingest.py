@@ -0,0 +1,123 @@
+"""
+choose the fastest of several ingest URLs for a site
+
+Sites like Twitch and YouTube run many regional ingest servers.
+A site in pylivestream.json may give a list of candidate "url",
+each of which is timed in parallel:
+
+* TCP connect
+* TLS handshake for rtmps://
+* RTMP handshake start: send C0+C1, wait for S0
+
+The fastest URL is cached, in memory and on disk, for "ingest_ttl" seconds (default 1 hour).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import math
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+
+from .utils import cache_dir, write_atomic
+
+TTL = 3600.0
+TIMEOUT = 3.0
+
+PORTS = {"rtmp": 1935, "rtmps": 443}
+
+_cache: dict[str, tuple[float, str]] = {}
+_lock = threading.Lock()
+
+
+def handshake(s: socket.socket) -> bool:
+    """start RTMP handshake, True if the server answered"""
+
+    # C0: version 3. C1: time, zero, 1528 random bytes
+    s.sendall(b"\x03" + bytes(8) + os.urandom(1528))
+    return bool(s.recv(1))
+
+
+def measure(url: str, timeout: float = TIMEOUT) -> float:
+    """
+    seconds to connect and start RTMP handshake with ingest server.
+    math.inf if the server did not answer within timeout.
+    """
+
+    u = urllib.parse.urlsplit(url)
+    host = u.hostname
+    if not host:
+        raise ValueError(f"no host in {url}")
+    port = u.port or PORTS.get(u.scheme, 1935)
+
+    t0 = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            if u.scheme == "rtmps":
+                with ssl.create_default_context().wrap_socket(sock, server_hostname=host) as s:
+                    answered = handshake(s)
+            else:
+                answered = handshake(sock)
+            dt = time.perf_counter() - t0
+        if not answered:
+            return math.inf
+    except OSError as e:
+        logging.info(f"ingest {url} unreachable: {e}")
+        return math.inf
+
+    return dt
+
+
+def select(urls: str | list[str], ttl: float = TTL, timeout: float = TIMEOUT) -> str:
+    """fastest of candidate ingest URLs, measured in parallel, cached for ttl seconds"""
+
+    if isinstance(urls, str):
+        return urls
+    if len(urls) == 1:
+        return urls[0]
+
+    key = "\n".join(sorted(urls))
+    now = time.time()
+
+    with _lock:
+        if key not in _cache:
+            _cache.update(_load())
+        if key in _cache and now - _cache[key][0] < ttl:
+            return _cache[key][1]
+
+    with ThreadPoolExecutor(max_workers=len(urls)) as ex:
+        rtt = list(ex.map(lambda u: measure(u, timeout), urls))
+
+    i = min(range(len(urls)), key=rtt.__getitem__)
+    if math.isinf(rtt[i]):
+        logging.error(f"no ingest server answered, using {urls[0]}")
+        return urls[0]
+
+    for u, t in zip(urls, rtt):
+        logging.info(f"ingest {u}: {t * 1000:.1f} ms")
+
+    with _lock:
+        _cache[key] = (now, urls[i])
+        _save()
+
+    return urls[i]
+
+
+def _load() -> dict[str, tuple[float, str]]:
+    try:
+        C = json.loads((cache_dir() / "ingest.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+    return {k: (t, u) for k, (t, u) in C.items()}
+
+
+def _save() -> None:
+    try:
+        write_atomic(cache_dir() / "ingest.json", json.dumps(_cache, indent=1))
+    except OSError as e:
+        logging.warning(f"could not cache ingest choice: {e}")
@@ -0,0 +1,192 @@
+"""
+SQLite index of media files for directory and glob streaming
+
+Directory trees are walked lazily, and only files that are new or whose size or
+modification time changed are probed with FFprobe.
+Filter and shuffle queries are answered from the index without probing again.
+
+    L = Library()
+    L.update("~/music", "*.ogg")
+    files = L.query("~/music", media="audio", max_duration=300, shuffle=True)
+"""
+
+from pathlib import Path
+import fnmatch
+import logging
+import os
+import sqlite3
+import subprocess
+import typing as T
+
+from .ffmpeg import get_meta
+from .utils import cache_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    ok INTEGER,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    vcodec TEXT,
+    acodec TEXT
+)
+"""
+
+BATCH = 500  # files between commits during update
+
+
+def scan(root: Path, pattern: str = "*") -> T.Iterator[os.DirEntry]:
+    """lazily yield files under root (recursively) with name matching glob pattern"""
+
+    stack = [str(Path(root).expanduser())]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif e.is_file() and fnmatch.fnmatch(e.name, pattern):
+                        yield e
+        except OSError as err:
+            logging.warning(f"cannot scan {err.filename}: {err.strerror}")
+
+
+def describe(meta: dict[str, T.Any]) -> dict[str, T.Any]:
+    """index fields from FFprobe metadata"""
+
+    d: dict[str, T.Any] = {"duration": None, "width": None, "height": None, "fps": None}
+    d["vcodec"] = d["acodec"] = None
+
+    try:
+        d["duration"] = float(meta["format"]["duration"])
+    except (KeyError, ValueError):
+        pass
+
+    for s in meta.get("streams", []):
+        if s["codec_type"] == "video" and not s.get("disposition", {}).get("attached_pic"):
+            if d["vcodec"] is None:
+                d["vcodec"] = s["codec_name"]
+                d["width"] = s.get("width")
+                d["height"] = s.get("height")
+                num, den = map(int, s.get("avg_frame_rate", "0/0").split("/"))
+                d["fps"] = num / den if den else None
+        elif s["codec_type"] == "audio" and d["acodec"] is None:
+            d["acodec"] = s["codec_name"]
+
+    return d
+
+
+class Library:
+    def __init__(self, db: Path | None = None, probeexe: str | None = None):
+
+        self.db = Path(db).expanduser() if db else cache_dir() / "library.sqlite"
+        self.probeexe = probeexe
+
+        self.con = sqlite3.connect(self.db)
+        self.con.execute(SCHEMA)
+
+    def close(self) -> None:
+        self.con.close()
+
+    def update(self, root: Path, pattern: str = "*") -> dict[str, int]:
+        """
+        incremental rescan: probe only new or changed files, drop files no longer present.
+
+        Returns counts of "probed", "unchanged", "removed" files.
+        """
+
+        root = Path(root).expanduser().resolve()
+        prefix = os.path.join(root, "")
+
+        known = {
+            p: (size, mtime)
+            for p, size, mtime in self.con.execute(
+                "SELECT path, size, mtime_ns FROM media WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+        }
+
+        n = {"probed": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+
+        for i, e in enumerate(scan(root, pattern)):
+            st = e.stat()
+            seen.add(e.path)
+            if known.get(e.path) == (st.st_size, st.st_mtime_ns):
+                n["unchanged"] += 1
+                continue
+
+            try:
+                row = describe(get_meta(Path(e.path), self.probeexe)) | {"ok": 1}
+            except (subprocess.CalledProcessError, ValueError, KeyError):
+                row = describe({}) | {"ok": 0}  # not media, don't probe again until it changes
+
+            self.con.execute(
+                "INSERT OR REPLACE INTO media VALUES "
+                "(:path, :size, :mtime_ns, :ok, :duration, :width, :height, :fps, :vcodec, :acodec)",
+                row | {"path": e.path, "size": st.st_size, "mtime_ns": st.st_mtime_ns},
+            )
+            n["probed"] += 1
+
+            if i % BATCH == BATCH - 1:
+                self.con.commit()
+
+        # only files matching this pattern were scanned
+        gone = [p for p in known if p not in seen and fnmatch.fnmatch(os.path.basename(p), pattern)]
+        self.con.executemany("DELETE FROM media WHERE path = ?", ((p,) for p in gone))
+        n["removed"] = len(gone)
+
+        self.con.commit()
+
+        return n
+
+    def query(
+        self,
+        root: Path,
+        pattern: str = "*",
+        *,
+        media: str | None = None,
+        min_duration: float | None = None,
+        max_duration: float | None = None,
+        shuffle: bool = False,
+        limit: int | None = None,
+    ) -> list[Path]:
+        """
+        media files under root from index
+
+        media: "audio" (no video stream) or "video"
+        """
+
+        root = Path(root).expanduser().resolve()
+        prefix = os.path.join(root, "")
+
+        sql = "SELECT path FROM media WHERE ok AND substr(path, 1, ?) = ?"
+        args: list[T.Any] = [len(prefix), prefix]
+
+        if media == "audio":
+            sql += " AND vcodec IS NULL AND acodec IS NOT NULL"
+        elif media == "video":
+            sql += " AND vcodec IS NOT NULL"
+        elif media is not None:
+            raise ValueError(f"media must be audio or video, not {media}")
+
+        if min_duration is not None:
+            sql += " AND duration >= ?"
+            args.append(min_duration)
+        if max_duration is not None:
+            sql += " AND duration <= ?"
+            args.append(max_duration)
+
+        sql += " ORDER BY random()" if shuffle else " ORDER BY path"
+
+        files = [
+            Path(p)
+            for (p,) in self.con.execute(sql, args)
+            if fnmatch.fnmatch(os.path.basename(p), pattern)
+        ]
+
+        return files[:limit]
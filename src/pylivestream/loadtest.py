@@ -0,0 +1,185 @@
+"""
+how many concurrent streams can this host sustain
+
+Ramps up N concurrent streams, each the real Livestream command line for a site
+(default "localhost" settings), with the network sink swapped for the null device so
+that FLV muxing still runs. Sources need no devices:
+
+* synthetic: lavfi test pattern and tone, as screen share
+* file: the bundled bunny.avi, looped
+* audio: the bundled orch.ogg with the bundled logo as still image
+
+Each source is encoded at --height and --fps: file and image sources are scaled to it.
+
+Each step runs for --duration seconds. After --warmup seconds, every stream must hold
+its encoder speed at or above 1.0x realtime without dropping frames. The largest N that
+does is reported, with CPU percent (of one core) and RSS per stream from /proc.
+
+    python -m pylivestream.loadtest ~/pylivestream.json --height 720 --fps 30 --max 16
+"""
+
+from pathlib import Path
+import argparse
+import importlib.resources
+import json
+import os
+import signal
+import statistics
+import tempfile
+import threading
+import time
+import typing as T
+
+from .base import OPERATORS
+from .monitor import Monitor
+from .procstat import ProcWatch
+
+SPEED = 0.99  # FFmpeg reports paced realtime input as about 1.0x, never more
+WARMUP = 5.0
+DURATION = 30.0
+SOURCES = ("synthetic", "file", "audio")
+
+
+def stream_cmd(
+    ini: Path, site: str, source: str, height: int, fps: float, duration: float
+) -> list[str]:
+    """command line of one test stream, writing to the null device"""
+
+    C = json.loads(Path(ini).expanduser().read_text())
+    width = round(height * 16 / 9 / 2) * 2
+    C["screencap_size"] = [width, height]
+    C["screencap_fps"] = fps
+    C["synthetic"] = source == "synthetic"
+
+    data = importlib.resources.files("pylivestream.data")
+    opts: dict[str, T.Any] = {"yes": True, "timeout": duration, "interactive": False}
+    if source == "synthetic":
+        kind = "screen"
+    elif source == "file":
+        kind = "file"
+        opts |= {"infn": data.joinpath("bunny.avi"), "loop": True}
+    elif source == "audio":
+        kind = "file"
+        opts |= {"infn": data.joinpath("orch.ogg"), "image": data.joinpath("logo.png")}
+    else:
+        raise ValueError(f"source must be one of {SOURCES}")
+
+    with tempfile.TemporaryDirectory() as d:
+        fn = Path(d) / "pylivestream.json"
+        fn.write_text(json.dumps(C))
+        L = OPERATORS[kind](fn, site, **opts).stream
+
+        if source != "synthetic":  # scaled to the same output as the synthetic source
+            L.out_height, L.out_fps = height, fps
+            if L.auto_kbps:
+                L.video_kbps = 0
+                L.video_bitrate()
+            L.build()
+
+    cmd = list(L.cmd)
+    cmd[cmd.index(L.sink)] = os.devnull
+
+    return cmd
+
+
+def run_step(cmds: list[list[str]], warmup: float = WARMUP) -> list[dict[str, float]]:
+    """run commands concurrently to completion, returning per-stream results"""
+
+    results: list[dict[str, float]] = [{} for _ in cmds]
+
+    def one(i: int, cmd: list[str]) -> None:
+        speeds: list[float] = []
+        W = ProcWatch(interval=1.0)
+
+        def record(M: Monitor) -> None:
+            if time.monotonic() - M.t0 >= warmup and M.speed is not None:
+                speeds.append(M.speed)
+
+        M = Monitor(cmd, [W, record], stdin=False)
+        ret = M.run()
+
+        S = [s for s in W.series if s["time"] - W.series[0]["time"] >= warmup] or list(W.series)
+        results[i] = {
+            "returncode": ret,
+            "speed": min(speeds) if speeds else 0.0,
+            "dropped": M.drop_frames + M.dropped,
+            "cpu_percent": statistics.fmean(s["cpu_percent"] for s in S) if S else float("nan"),
+            "rss_mb": max(s["rss"] for s in S) / 2**20 if S else float("nan"),
+        }
+
+    threads = [threading.Thread(target=one, args=(i, c)) for i, c in enumerate(cmds)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return results
+
+
+def ok(results: list[dict[str, float]], speed: float = SPEED) -> bool:
+    return all(
+        r["returncode"] == 0 and r["speed"] >= speed and not r["dropped"] for r in results
+    )
+
+
+def summary(n: int, results: list[dict[str, float]]) -> str:
+    cpu = statistics.fmean(r["cpu_percent"] for r in results)
+    rss = statistics.fmean(r["rss_mb"] for r in results)
+    speed = min(r["speed"] for r in results)
+    dropped = sum(r["dropped"] for r in results)
+
+    return (
+        f"{n:3d} streams: min speed {speed:.3f}x  dropped {dropped:.0f}  "
+        f"per stream CPU {cpu:.0f}%  RSS {rss:.0f} MB  {'ok' if ok(results) else 'FAIL'}"
+    )
+
+
+def capacity(
+    ini: Path,
+    site: str = "localhost",
+    source: str = "synthetic",
+    height: int = 720,
+    fps: float = 30,
+    max_streams: int = 16,
+    step: int = 1,
+    duration: float = DURATION,
+    warmup: float = WARMUP,
+) -> tuple[int, list[str]]:
+    """largest number of streams at or above realtime, and the report of each step"""
+
+    cmd = stream_cmd(ini, site, source, height, fps, duration)
+
+    best = 0
+    report = []
+    for n in range(step, max_streams + 1, step):
+        results = run_step([cmd] * n, warmup)
+        report.append(summary(n, results))
+        print(report[-1])
+        if not ok(results):
+            break
+        best = n
+
+    return best, report
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    p = argparse.ArgumentParser(description="find how many concurrent streams this host sustains")
+    p.add_argument("json", help="JSON file with stream parameters")
+    p.add_argument("--site", default="localhost", help="site whose encoder settings to use")
+    p.add_argument("--source", choices=SOURCES, default="synthetic")
+    p.add_argument("--height", type=int, default=720, help="video height of streams")
+    p.add_argument("--fps", type=float, default=30, help="frames/sec of streams")
+    p.add_argument("--max", type=int, default=16, help="most concurrent streams to try")
+    p.add_argument("--step", type=int, default=1, help="streams added per step")
+    p.add_argument("--duration", type=float, default=DURATION, help="seconds per step")
+    p.add_argument("--warmup", type=float, default=WARMUP, help="seconds ignored per step")
+    P = p.parse_args()
+
+    best, report = capacity(
+        P.json, P.site, P.source, P.height, P.fps, P.max, P.step, P.duration, P.warmup
+    )
+
+    print("\n".join(["", *report, ""]))
+    print(f"{best} concurrent {P.source} streams sustained at >= 1.0x realtime")
@@ -25,6 +25,14 @@ if __name__ == "__main__":
     p.add_argument("json", help="JSON file with stream parameters such as key")
     p.add_argument("-y", "--yes", help="no confirmation dialog", action="store_true")
     p.add_argument("-t", "--timeout", help="stop streaming after --timeout seconds", type=int)
+    p.add_argument(
+        "--complexity",
+        help="scale video bitrate by content complexity of infn",
+        action="store_true",
+    )
+    p.add_argument(
+        "--resume", help="continue where streaming last stopped early", action="store_true"
+    )
     P = p.parse_args()
 
     stream_file(
@@ -34,4 +42,6 @@ if __name__ == "__main__":
         timeout=P.timeout,
         loop=True,
         video_file=P.infn,
+        complexity=P.complexity,
+        resume=P.resume,
     )
@@ -0,0 +1,163 @@
+"""
+two-pass loudness normalization of files, with the measurement pass done offline
+
+The first pass runs FFmpeg loudnorm (EBU R128) in measurement mode over each file,
+in a process pool for playlists. Integrated loudness, loudness range and true peak
+are cached per file content.
+At stream time only a constant gain is applied, instead of the CPU-heavy,
+audibly pumping single-pass adaptive loudnorm.
+
+https://ffmpeg.org/ffmpeg-filters.html#loudnorm
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import hashlib
+import json
+import logging
+import math
+import re
+import subprocess
+import threading
+
+from .ffmpeg import get_exe
+from .utils import cache_dir, write_atomic
+
+TARGET_I = -16.0  # LUFS, integrated loudness
+TP_MAX = -1.5  # dBTP, true peak ceiling
+
+SAMPLE = 2**20  # bytes hashed from each end of file for content key
+
+_lock = threading.Lock()
+
+
+def content_key(fn: Path) -> str:
+    """identifies file content: size plus hash of its first and last MiB, independent of path"""
+
+    fn = Path(fn).expanduser()
+    size = fn.stat().st_size
+
+    h = hashlib.sha1(str(size).encode())
+    with fn.open("rb") as f:
+        h.update(f.read(SAMPLE))
+        if size > SAMPLE:
+            f.seek(max(SAMPLE, size - SAMPLE))
+            h.update(f.read(SAMPLE))
+
+    return h.hexdigest()
+
+
+def parse(stderr: str) -> dict[str, float]:
+    """measurement from the JSON that loudnorm prints at end of FFmpeg output"""
+
+    m = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", stderr)
+    if not m:
+        raise ValueError("no loudnorm measurement in FFmpeg output")
+
+    J = json.loads(m.group(0))
+
+    return {k: float(J[f"input_{k}"]) for k in ("i", "lra", "tp", "thresh")}
+
+
+def measure(fn: Path, exe: str | None = None) -> dict[str, float]:
+    """first pass: decode audio of file, measuring loudness. No output is written."""
+
+    cmd = [
+        exe or get_exe("ffmpeg"),
+        "-hide_banner",
+        "-nostdin",
+        "-i",
+        str(fn),
+        "-vn",
+        "-af",
+        f"loudnorm=I={TARGET_I}:TP={TP_MAX}:print_format=json",
+        "-f",
+        "null",
+        "-",
+    ]
+
+    ret = subprocess.run(cmd, capture_output=True, text=True, errors="replace")
+    if ret.returncode != 0:
+        raise ValueError(f"loudness measurement failed for {fn}: {ret.stderr[-500:]}")
+
+    return parse(ret.stderr)
+
+
+def _load() -> dict[str, dict[str, float]]:
+    try:
+        return json.loads((cache_dir() / "loudness.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def measure_all(
+    files: list[Path], exe: str | None = None, processes: int | None = None
+) -> dict[Path, dict[str, float]]:
+    """
+    loudness of each file, measuring files not yet in the cache in parallel processes.
+    Files that can't be measured, e.g. no audio, are omitted from the result.
+    """
+
+    files = [Path(f).expanduser() for f in files]
+    keys = {f: content_key(f) for f in files}
+
+    with _lock:
+        C = _load()
+
+    todo = list({keys[f]: f for f in files if keys[f] not in C}.values())
+    if todo:
+        logging.info(f"measuring loudness of {len(todo)} files")
+        new = _measure_many(todo, exe, processes)
+
+        with _lock:
+            C = _load()
+            C.update({keys[f]: m for f, m in new.items()})
+            try:
+                write_atomic(cache_dir() / "loudness.json", json.dumps(C, indent=1))
+            except OSError as e:
+                logging.warning(f"could not cache loudness: {e}")
+
+    return {f: C[keys[f]] for f in files if keys[f] in C}
+
+
+def _measure_many(
+    files: list[Path], exe: str | None, processes: int | None
+) -> dict[Path, dict[str, float]]:
+
+    if len(files) == 1 or processes == 1:
+        run = {f: (lambda f=f: measure(f, exe)) for f in files}
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as ex:
+            futures = {f: ex.submit(measure, f, exe) for f in files}
+        run = {f: fut.result for f, fut in futures.items()}
+
+    M = {}
+    for f, result in run.items():
+        try:
+            M[f] = result()
+        except ValueError as e:
+            logging.warning(e)
+
+    return M
+
+
+def get_loudness(fn: Path, exe: str | None = None) -> dict[str, float] | None:
+    """cached loudness of one file, measuring it if needed"""
+
+    return measure_all([fn], exe, processes=1).get(Path(fn).expanduser())
+
+
+def gain_db(meas: dict[str, float], target_i: float = TARGET_I, tp_max: float = TP_MAX) -> float:
+    """
+    linear gain that brings integrated loudness to target,
+    limited so that the true peak stays under tp_max.
+    """
+
+    if not math.isfinite(meas["i"]):  # silence
+        return 0.0
+
+    g = target_i - meas["i"]
+    if math.isfinite(meas["tp"]):
+        g = min(g, tp_max - meas["tp"])
+
+    return g
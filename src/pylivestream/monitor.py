@@ -0,0 +1,238 @@
+"""
+watch a running FFmpeg process
+
+FFmpeg is started with "-progress pipe:1" so that stdout carries key=value blocks
+ending with "progress=continue" (or "progress=end"), about every 0.5 second.
+Stderr is echoed to the terminal as usual, and scanned for capture warnings such as
+
+    Thread message queue blocking; consider raising the thread_queue_size option
+
+https://ffmpeg.org/ffmpeg.html#Advanced-options
+"""
+
+import collections
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+import typing as T
+
+from . import tracing
+
+PROGRESS = ["-progress", "pipe:1"]
+STOP_SEC = 10.0  # FFmpeg is killed if it doesn't exit this long after terminate
+
+# real-time capture inputs (x11grab, v4l2, pulse, dshow, avfoundation) losing data
+QUEUE_BLOCKING = re.compile(r"thread message queue blocking", re.IGNORECASE)
+FRAME_DROPPED = re.compile(r"(frame|packet)s? dropped|dropping (frame|packet)", re.IGNORECASE)
+
+
+class Monitor:
+    """
+    run an FFmpeg command, calling each handler with this Monitor after every progress block.
+
+    A handler may call stop() to end the process early, e.g. to restart with new parameters.
+    """
+
+    def __init__(
+        self,
+        cmd: list[str],
+        handlers: list[T.Callable[["Monitor"], None]] | None = None,
+        stdin: bool = True,
+        input: int | None = None,
+    ):
+        """
+        stdin: False to keep FFmpeg from reading the keyboard ("q" to quit)
+        input: file descriptor for FFmpeg stdin, e.g. a pipe read as input "pipe:0"
+        """
+
+        # -progress is a global option, so it goes right after the executable
+        self.cmd = cmd[:1] + PROGRESS + ([] if stdin else ["-nostdin"]) + cmd[1:]
+        self.stdin = stdin
+        self.input = input
+
+        self.handlers = handlers if handlers is not None else []
+
+        self.progress: dict[str, str] = {}
+        self.blocking = 0  # "Thread message queue blocking" count
+        self.dropped = 0  # "frame dropped" count from stderr
+        self.stop_reason = ""
+        self._stop = False
+
+        self.proc: subprocess.Popen | None = None
+        self.t0 = 0.0
+        self._spawn = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def speed(self) -> float | None:
+        """encoder speed relative to realtime, e.g. 1.0 for 1.0x"""
+        s = self.progress.get("speed", "").rstrip("x").strip()
+        try:
+            return float(s)
+        except ValueError:  # "N/A" at startup
+            return None
+
+    @property
+    def drop_frames(self) -> int:
+        """frames dropped by FFmpeg per progress report"""
+        try:
+            return int(self.progress.get("drop_frames", 0))
+        except ValueError:
+            return 0
+
+    @property
+    def frame(self) -> int | None:
+        """frames encoded so far"""
+        try:
+            return int(self.progress["frame"])
+        except (KeyError, ValueError):
+            return None
+
+    @property
+    def out_time(self) -> float | None:
+        """output timestamp in seconds"""
+        try:
+            return int(self.progress["out_time_us"]) / 1e6
+        except (KeyError, ValueError):
+            return None
+
+    def start(self) -> subprocess.Popen:
+
+        print("\n", " ".join(self.cmd), "\n")
+
+        self.t0 = time.monotonic()
+        self._spawn = tracing.now()
+
+        stdin = None if self.stdin else subprocess.DEVNULL
+        if self.input is not None:
+            stdin = self.input
+
+        with self._lock:
+            self.proc = subprocess.Popen(
+                " ".join(self.cmd) if sys.platform == "win32" else self.cmd,
+                shell=sys.platform == "win32",
+                stdin=stdin,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+            )
+            if self._stop:  # stop() came before the process existed
+                self.proc.terminate()
+
+        tracing.record("spawn", self._spawn)
+
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+        return self.proc
+
+    def run(self) -> int:
+        """start FFmpeg and block until it exits, returning its exit code"""
+
+        proc = self.start()
+        assert proc.stdout is not None
+
+        block: dict[str, str] = {}
+        first = True
+        try:
+            for line in proc.stdout:
+                key, _, value = line.strip().partition("=")
+                if not key:
+                    continue
+                block[key] = value
+                if key == "progress":
+                    with self._lock:
+                        self.progress = block
+                    block = {}
+                    if first and self.out_time:
+                        first = False
+                        tracing.record("first_packet", self._spawn)
+                        tracing.write()
+                    for h in self.handlers:
+                        h(self)
+        except BaseException:
+            # e.g. a handler raised: don't leave FFmpeg running
+            proc.terminate()
+            try:
+                proc.wait(timeout=STOP_SEC)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            raise
+
+        return proc.wait()
+
+    def stop(self, reason: str = "") -> None:
+        """terminate FFmpeg, noting why"""
+
+        with self._lock:
+            self.stop_reason = reason
+            self._stop = True
+            if self.proc is not None and self.proc.poll() is None:
+                self.proc.terminate()
+
+    def scan(self, line: str) -> None:
+        """count capture warnings in an FFmpeg stderr line"""
+
+        if QUEUE_BLOCKING.search(line):
+            with self._lock:
+                self.blocking += 1
+        elif FRAME_DROPPED.search(line):
+            with self._lock:
+                self.dropped += 1
+
+    def _read_stderr(self) -> None:
+        assert self.proc is not None and self.proc.stderr is not None
+
+        # universal newlines also split the "\r" separated stats line
+        for line in self.proc.stderr:
+            line = line.rstrip("\n")
+            self.scan(line)
+
+            print(line, file=sys.stderr, end="\r" if line.startswith(("frame=", "size=")) else "\n")
+
+
+class DropWatch:
+    """
+    Monitor handler: trips when drops persist, that is when at least "persist" progress
+    reports within "window" seconds each saw new queue-blocking or dropped-frame events.
+    """
+
+    def __init__(
+        self,
+        on_trip: T.Callable[[Monitor], None] | None = None,
+        persist: int = 3,
+        window: float = 10.0,
+    ):
+
+        self.on_trip = on_trip
+        self.persist = persist
+        self.window = window
+
+        self.tripped = False
+        self._last = 0
+        self._hits: collections.deque[float] = collections.deque()
+
+    def __call__(self, M: Monitor) -> None:
+
+        total = M.blocking + M.dropped + M.drop_frames
+        if total <= self._last:
+            return
+        self._last = total
+
+        now = time.monotonic()
+        self._hits.append(now)
+        while self._hits and now - self._hits[0] > self.window:
+            self._hits.popleft()
+
+        if len(self._hits) >= self.persist and not self.tripped:
+            self.tripped = True
+            logging.warning(
+                f"capture drops persist: {M.blocking} queue blocking, "
+                f"{M.dropped + M.drop_frames} dropped frames"
+            )
+            if self.on_trip is not None:
+                self.on_trip(M)
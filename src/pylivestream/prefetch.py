@@ -0,0 +1,208 @@
+"""
+read-ahead of upcoming playlist files, so a cold read from slow storage
+doesn't starve the realtime (-re) input
+
+* local disks: posix_fadvise(WILLNEED) asks the kernel to read the file into page cache
+* remote mounts (NFS, SMB, sshfs, ...): the file is copied into a local cache directory
+  (e.g. on SSD or tmpfs) bounded to max_bytes, evicting least recently used files.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import threading
+
+from .utils import cache_dir
+
+REMOTE_FS = {
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "9p",
+    "ceph",
+    "glusterfs",
+    "davfs",
+    "fuse.sshfs",
+    "fuse.rclone",
+    "fuse.s3fs",
+}
+
+
+def mount_fstype(path: Path) -> str:
+    """filesystem type of the mount holding path (Linux), else empty string"""
+
+    if sys.platform != "linux":
+        return ""
+
+    path = Path(path).resolve()
+    best = ""
+    fstype = ""
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                _, mnt, typ = line.split()[:3]
+                mnt = mnt.replace("\\040", " ")
+                if (path == Path(mnt) or Path(mnt) in path.parents) and len(mnt) > len(best):
+                    best, fstype = mnt, typ
+    except OSError:
+        pass
+
+    return fstype
+
+
+def is_remote(path: Path) -> bool:
+    return mount_fstype(path) in REMOTE_FS
+
+
+def willneed(path: Path) -> None:
+    """ask kernel to read whole file into page cache in the background"""
+
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+class Prefetcher:
+    def __init__(self, cache: Path | None = None, max_bytes: int = 2**32, ahead: int = 2):
+        """
+        cache: local directory for copies of remote files
+        max_bytes: cache size limit
+        ahead: number of upcoming items to stage
+        """
+
+        self.cache = Path(cache).expanduser() if cache else cache_dir() / "staged"
+        self.cache.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ahead = ahead
+
+        self.stats = {"hits": 0, "misses": 0, "copied_bytes": 0, "evictions": 0, "advised": 0}
+
+        self._lru: OrderedDict[str, int] = OrderedDict()  # staged file name: size
+        self._advised: set[str] = set()  # local files read ahead in place
+        # never evicted: the item being streamed (last get) and the upcoming ones (last stage)
+        self._current = ""
+        self._next: set[str] = set()
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
+        # files staged by an earlier run, oldest access first
+        for f in sorted(self.cache.iterdir(), key=lambda f: f.stat().st_atime):
+            if f.suffix == ".part":
+                f.unlink()
+            else:
+                self._lru[f.name] = f.stat().st_size
+
+    def _key(self, path: Path) -> str:
+        st = path.stat()
+        h = hashlib.sha1(f"{path.resolve()}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+        return h[:16] + path.suffix
+
+    def stage(self, upcoming: list[Path]) -> None:
+        """start staging the next "ahead" items in background, in order"""
+
+        items = []
+        for p in upcoming[:self.ahead]:
+            p = Path(p).expanduser()
+            try:
+                items.append((p, self._key(p)))
+            except OSError as e:
+                logging.warning(f"prefetch: {e}")
+
+        with self._lock:
+            self._next = {key for _, key in items}
+            for p, key in items:
+                if key in self._lru or key in self._pending or key in self._advised:
+                    continue
+                self._pending[key] = self._pool.submit(self._stage, p, key)
+
+    def get(self, path: Path) -> Path:
+        """local staged copy of path if available, else path itself"""
+
+        path = Path(path).expanduser()
+        try:
+            key = self._key(path)
+        except OSError:
+            return path
+
+        with self._lock:
+            self._current = key
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.cache / key
+
+            if key in self._advised:
+                self._advised.discard(key)  # may be dropped from page cache before next use
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+
+        return path
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        logging.info(f"prefetch {self.stats}")
+
+    def _stage(self, path: Path, key: str) -> None:
+        try:
+            size = path.stat().st_size
+            # files that can't be copied are at least read ahead in place
+            if not is_remote(path) or not self._evict(size):
+                willneed(path)
+                with self._lock:
+                    self._advised.add(key)
+                    self.stats["advised"] += 1
+                return
+
+            tmp = self.cache / (key + ".part")
+            shutil.copyfile(path, tmp)
+            tmp.replace(self.cache / key)
+
+            with self._lock:
+                self._lru[key] = size
+                self.stats["copied_bytes"] += size
+        except OSError as e:
+            logging.warning(f"prefetch {path}: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _evict(self, need: int) -> bool:
+        """
+        remove least recently used files until need bytes fit, except the current and
+        upcoming items. False, removing nothing, if need bytes can't fit.
+        """
+
+        with self._lock:
+            keep = self._next | {self._current}
+            over = sum(self._lru.values()) + need - self.max_bytes
+
+            evict = []
+            for name, size in self._lru.items():
+                if over <= 0:
+                    break
+                if name not in keep:
+                    evict.append(name)
+                    over -= size
+            if over > 0:
+                return False
+
+            for name in evict:
+                del self._lru[name]
+                (self.cache / name).unlink(missing_ok=True)
+                self.stats["evictions"] += 1
+
+        return True
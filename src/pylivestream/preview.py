@@ -0,0 +1,94 @@
+"""
+preview images of a running stream, for dashboards
+
+The stream's FFmpeg process writes two small extra outputs, replaced atomically:
+
+* a rolling still, downscaled, at about 0.5 fps
+* a sprite sheet of the last tile (e.g. 5x5) frames taken every 5 seconds
+
+The fps filter comes first, so only the sampled frames are scaled and encoded:
+the cost is a few small JPEG or WebP images per minute.
+
+Files are in "dir", by default a directory in the user cache removed at exit.
+Enable per stream by "preview" in pylivestream.json, or preview= for a stream:
+
+    "preview": {"fps": 0.5, "width": 320, "sprite_fps": 0.2, "tile": "5x5", "format": "jpg"}
+"""
+
+from pathlib import Path
+import os
+import shutil
+import typing as T
+import weakref
+
+from .utils import cache_dir
+
+FPS = 0.5
+WIDTH = 320
+SPRITE_FPS = 0.2
+SPRITE_WIDTH = 160
+TILE = "5x5"
+QUALITY = 5  # JPEG qscale 2..31, lower is better. WebP takes 0..100, higher is better
+
+
+class Preview:
+    """image and sprite files, and their FFmpeg outputs"""
+
+    def __init__(
+        self,
+        dir: Path | None = None,
+        fps: float = FPS,
+        width: int = WIDTH,
+        sprite_fps: float = SPRITE_FPS,
+        sprite_width: int = SPRITE_WIDTH,
+        tile: str = TILE,
+        format: str = "jpg",
+    ):
+
+        if dir is None:
+            dir = cache_dir() / "preview" / f"{os.getpid()}-{id(self):x}"
+            # a directory of its own choosing is removed at exit
+            weakref.finalize(self, shutil.rmtree, dir, ignore_errors=True)
+        self.dir = Path(dir).expanduser()
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        self.fps = fps
+        self.width = width
+        self.sprite_fps = sprite_fps
+        self.sprite_width = sprite_width
+        self.tile = tile
+        self.format = format
+
+        self.image = self.dir / f"preview.{format}"
+        self.sprite = self.dir / f"sprite.{format}"
+
+    def outputs(self, extra: list[str] | None = None) -> list[str]:
+        """
+        FFmpeg output options for the preview and sprite sheet.
+        extra: options that must end these outputs along with the main one, e.g. -t
+        """
+
+        extra = extra or []
+        q = ["-q:v", str(QUALITY if self.format == "jpg" else 75)]
+        # image2 writes a temporary file and renames it, so readers never see part of one
+        img = ["-update", "1", "-atomic_writing", "1", "-f", "image2"]
+
+        o = ["-an", "-sn", "-dn", "-vf", f"fps={self.fps},scale={self.width}:-2"]
+        o += q + img + extra + [str(self.image)]
+
+        sprite = f"fps={self.sprite_fps},scale={self.sprite_width}:-2,tile={self.tile}"
+        o += ["-an", "-sn", "-dn", "-vf", sprite] + q + img + extra + [str(self.sprite)]
+
+        return o
+
+    def latest(self) -> dict[str, T.Any]:
+        """paths of preview and sprite sheet, with modification time, None until written"""
+
+        ret: dict[str, T.Any] = {}
+        for k, fn in (("image", self.image), ("sprite", self.sprite)):
+            try:
+                ret[k] = {"path": str(fn), "time": fn.stat().st_mtime}
+            except FileNotFoundError:
+                ret[k] = None
+
+        return ret
@@ -0,0 +1,170 @@
+"""
+CPU, memory, I/O and context switches of a stream's FFmpeg process, from /proc (Linux)
+
+Enabled per stream by "resources" in pylivestream.json, or resources= for a stream:
+
+    "resources": {
+      "interval": 2,
+      "history": 300,
+      "budget": {"cpu_percent": 150, "rss_mb": 400, "write_kbps": 8000}
+    }
+
+Every "interval" seconds /proc/<pid>/stat, status and io are read, about 50 us.
+Bytes read and written are those of all read/write calls (rchar, wchar), so network
+output counts.
+The last "history" samples are kept in ProcWatch.series. CPU percent is of one core,
+so a process using two full cores is 200.
+A budget metric above its limit gives a budget_exceeded event, and budget_ok once it is
+back under. Events are logged and passed to the optional on_event callback as dicts:
+{"time": epoch seconds, "event": name, "metric": name, "value": float, "message": str}
+"""
+
+import collections
+import logging
+import os
+import time
+import typing as T
+
+from .monitor import Monitor
+
+INTERVAL = 2.0
+HISTORY = 300
+METRICS = ("cpu_percent", "rss_mb", "write_kbps")  # that a budget may limit
+
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def read_proc(pid: int) -> dict[str, float] | None:
+    """cumulative counters of process, None if not available"""
+
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # comm may contain spaces, fields after it are space separated
+            stat = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+
+    s = {
+        "cpu_sec": (int(stat[11]) + int(stat[12])) / CLK_TCK,  # utime + stime
+        "rss": int(status.get("VmRSS", "0 kB").split()[0]) * 1024,
+        "ctx_voluntary": int(status.get("voluntary_ctxt_switches", 0)),
+        "ctx_involuntary": int(status.get("nonvoluntary_ctxt_switches", 0)),
+        "read_bytes": 0,
+        "write_bytes": 0,
+    }
+
+    try:  # may be denied, e.g. under some container runtimes
+        with open(f"/proc/{pid}/io") as f:
+            io = dict(line.split(":", 1) for line in f if ":" in line)
+        # all read/write syscalls, including sockets and pipes. read_bytes and write_bytes
+        # count only storage I/O, which for a network stream is about nothing.
+        s["read_bytes"] = int(io["rchar"])
+        s["write_bytes"] = int(io["wchar"])
+    except (OSError, KeyError):
+        pass
+
+    return s
+
+
+class ProcWatch:
+    """
+    Monitor handler sampling the FFmpeg process every interval seconds.
+
+    series: bounded samples with time, cpu_percent, rss, read_bytes, write_bytes,
+    write_kbps, ctx_voluntary, ctx_involuntary (cumulative counters per FFmpeg run)
+    """
+
+    def __init__(
+        self,
+        interval: float = INTERVAL,
+        history: int = HISTORY,
+        budget: dict[str, float] | None = None,
+        on_event: T.Callable[[dict[str, T.Any]], None] | None = None,
+    ):
+
+        self.interval = interval
+        self.budget = budget or {}
+        if unknown := set(self.budget) - set(METRICS):
+            raise ValueError(f"unknown budget metrics {sorted(unknown)}, use some of {METRICS}")
+        self.on_event = on_event
+
+        self.series: collections.deque[dict[str, float]] = collections.deque(maxlen=history)
+        self.events: list[dict[str, T.Any]] = []
+        self.over: set[str] = set()
+
+        self._pid: int | None = None
+        self._last: tuple[float, dict[str, float]] | None = None
+
+    @property
+    def latest(self) -> dict[str, float] | None:
+        return self.series[-1] if self.series else None
+
+    def __call__(self, M: Monitor) -> None:
+
+        if M.proc is None:
+            return
+
+        now = time.monotonic()
+        if M.proc.pid != self._pid:  # restarted
+            self._pid = M.proc.pid
+            self._last = None
+        elif self._last is not None and now - self._last[0] < self.interval:
+            return
+
+        self.sample(M.proc.pid, now)
+
+    def sample(self, pid: int, now: float | None = None) -> dict[str, float] | None:
+        """read counters of pid, adding a sample with rates since the previous one"""
+
+        now = time.monotonic() if now is None else now
+        c = read_proc(pid)
+        if c is None:
+            return None
+
+        last, self._last = self._last, (now, c)
+        if last is None:  # rates need two readings
+            return None
+
+        dt = now - last[0]
+        s = c | {
+            "time": time.time(),
+            "cpu_percent": 100 * (c["cpu_sec"] - last[1]["cpu_sec"]) / dt,
+            "write_kbps": 8 * (c["write_bytes"] - last[1]["write_bytes"]) / dt / 1000,
+        }
+        self.series.append(s)
+
+        self.check(s)
+
+        return s
+
+    def check(self, s: dict[str, float]) -> None:
+        """budget events for sample"""
+
+        value = {
+            "cpu_percent": s["cpu_percent"],
+            "rss_mb": s["rss"] / 2**20,
+            "write_kbps": s["write_kbps"],
+        }
+
+        for metric, limit in self.budget.items():
+            v = value[metric]
+            if v > limit and metric not in self.over:
+                self.over.add(metric)
+                self._event("budget_exceeded", metric, v, f"{metric} {v:.1f} over {limit}")
+            elif v <= limit and metric in self.over:
+                self.over.discard(metric)
+                self._event("budget_ok", metric, v, f"{metric} {v:.1f} within {limit}")
+
+    def _event(self, name: str, metric: str, value: float, message: str) -> None:
+
+        e = {"time": time.time(), "event": name, "metric": metric, "value": value}
+        e["message"] = message
+        self.events.append(e)
+
+        level = logging.WARNING if name == "budget_exceeded" else logging.INFO
+        logging.log(level, f"FFmpeg pid {self._pid}: {name} {message}")
+
+        if self.on_event is not None:
+            self.on_event(e)
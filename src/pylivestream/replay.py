@@ -0,0 +1,137 @@
+"""
+replay buffer: the last minutes of a live stream, for instant clips
+
+The encoded stream is written twice by the FFmpeg tee muxer, to the site and to a
+ring of short MPEG-TS segments in RAM (/dev/shm where available). Segments are only
+cut at keyframes, and the segment muxer overwrites the oldest file, so memory use is
+bounded by the segment count times the segment size at the constrained bitrate.
+
+A clip is the newest whole segments covering the requested seconds, joined with the
+concat protocol and remuxed to MP4 without re-encoding, typically in tens of
+milliseconds. The clip ends at the last completed segment, up to segment_sec ago.
+
+Enable per stream by "replay" in pylivestream.json, or replay= for a stream:
+
+    "replay": {"seconds": 120, "dir": "/dev/shm"}
+"""
+
+from pathlib import Path
+import csv
+import logging
+import math
+import shutil
+import subprocess
+import tempfile
+import weakref
+
+SECONDS = 120.0  # default buffer length
+SPARE = 2  # segments beyond the buffer length: the one being written, and margin for clips
+
+RAM_DIR = Path("/dev/shm")
+
+
+def escape(value: str) -> str:
+    """escape special characters of FFmpeg option strings"""
+
+    for c in "\\'[]:|=":
+        value = value.replace(c, "\\" + c)
+    return value
+
+
+class Replay:
+    """
+    ring of encoded segments in dir, written by the stream's FFmpeg tee output.
+
+    seconds: buffer length
+    segment_sec: segment length, best a multiple of the keyframe interval
+    """
+
+    def __init__(self, seconds: float = SECONDS, segment_sec: float = 2.0, dir: Path | None = None):
+
+        self.seconds = seconds
+        self.segment_sec = segment_sec
+        self.count = math.ceil(seconds / segment_sec) + SPARE
+
+        if dir is None:
+            dir = RAM_DIR if RAM_DIR.is_dir() else Path(tempfile.gettempdir())
+        self.dir = Path(tempfile.mkdtemp(prefix="pylivestream-replay-", dir=Path(dir).expanduser()))
+
+        self.list = self.dir / "segments.csv"
+
+        self._finalize = weakref.finalize(self, shutil.rmtree, self.dir, ignore_errors=True)
+
+    def slave(self) -> str:
+        """tee muxer slave writing the segment ring"""
+
+        opts = {
+            "f": "segment",
+            "segment_format": "mpegts",
+            "segment_time": f"{self.segment_sec:g}",
+            "segment_wrap": str(self.count),
+            "segment_list": str(self.list),
+            "segment_list_type": "csv",
+            "segment_list_size": str(self.count - 1),
+        }
+        # option values are unescaped twice: splitting outputs at "|", then options at ":"
+        o = ":".join(f"{k}={escape(escape(v))}" for k, v in opts.items())
+
+        return f"[{o}]{escape(str(self.dir / 'seg%03d.ts'))}"
+
+    def tee(self, sink: str, maps: list[str]) -> list[str]:
+        """output options sending the stream to sink (FLV) and to the ring"""
+
+        o: list[str] = []
+        for m in maps:
+            o += ["-map", m]
+        # FLV wants codec headers out of band; the encoder only knows if told up front
+        o += ["-flags", "+global_header", "-f", "tee"]
+
+        return o + [f"[f=flv:onfail=abort]{escape(sink)}|{self.slave()}"]
+
+    def segments(self) -> list[tuple[Path, float]]:
+        """completed segments oldest first, with duration"""
+
+        try:
+            with self.list.open(newline="") as f:
+                rows = [r for r in csv.reader(f) if len(r) == 3]
+        except OSError:  # no segment completed yet
+            return []
+
+        return [(self.dir / r[0], float(r[2]) - float(r[1])) for r in rows]
+
+    def clip(self, seconds: float, outfn: Path, exe: str = "ffmpeg") -> Path:
+        """
+        write at least the last seconds of the stream to MP4 outfn, by stream copy,
+        rounded up to whole segments.
+        """
+
+        segs = self.segments()
+        if not segs:
+            raise ValueError("replay buffer is empty")
+
+        use: list[Path] = []
+        total = 0.0
+        for fn, dur in reversed(segs):
+            use.insert(0, fn)
+            total += dur
+            if total >= seconds:
+                break
+        if total < seconds:
+            logging.warning(f"replay buffer holds {total:.1f} s, less than {seconds} s requested")
+
+        outfn = Path(outfn).expanduser()
+        cmd = [exe, "-hide_banner", "-nostdin", "-loglevel", "error", "-y"]
+        cmd += ["-i", "concat:" + "|".join(map(str, use))]
+        cmd += ["-map", "0", "-codec", "copy", "-movflags", "+faststart", str(outfn)]
+
+        ret = subprocess.run(cmd, capture_output=True, text=True, errors="replace")
+        if ret.returncode != 0:
+            raise ValueError(f"replay clip failed: {ret.stderr[-500:]}")
+
+        logging.info(f"replay clip {outfn}: {total:.1f} s from {len(use)} segments")
+
+        return outfn
+
+    def close(self) -> None:
+        """free the ring, also done at exit"""
+        self._finalize()
@@ -0,0 +1,125 @@
+"""
+resume file streams where they stopped, after a crash or restart
+
+While a file streams with resume=True, its position from FFmpeg progress out_time is
+written every few seconds to a small JSON state file in the user cache directory.
+Started again, the stream seeks the input to the last keyframe at or before that
+position, so little content is repeated and no time goes into decoding frames that
+would be discarded. The state is removed once the file has streamed to the end.
+
+Playlists (stream_files) keep their own state: the file order and the current item,
+so a shuffled playlist also resumes at the same item and offset.
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import logging
+import subprocess
+import time
+import typing as T
+
+from .monitor import Monitor
+from .utils import cache_dir, write_atomic
+
+INTERVAL = 5.0  # seconds between checkpoints
+LOOKBACK = 20.0  # seconds before position to search for a keyframe
+
+
+def state_file(*key: T.Any) -> Path:
+    """state file for a stream identified by key, e.g. site and file path"""
+
+    h = hashlib.sha1("\n".join(map(str, key)).encode()).hexdigest()[:16]
+    d = cache_dir() / "resume"
+    d.mkdir(exist_ok=True)
+
+    return d / f"{h}.json"
+
+
+def load(fn: Path) -> dict[str, T.Any]:
+    try:
+        return json.loads(Path(fn).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save(fn: Path, state: dict[str, T.Any]) -> None:
+    try:
+        write_atomic(fn, json.dumps(state))
+    except OSError as e:
+        logging.warning(f"could not save resume state {fn}: {e}")
+
+
+def clear(fn: Path) -> None:
+    Path(fn).unlink(missing_ok=True)
+
+
+def keyframe_before(fn: Path, t: float, exe: str = "ffprobe") -> float:
+    """time of the last video keyframe at or before t seconds, t for audio-only files"""
+
+    if t <= 0:
+        return 0.0
+
+    cmd = [exe, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey"]
+    cmd += ["-read_intervals", f"{max(t - LOOKBACK, 0):.3f}%{t:.3f}"]
+    cmd += ["-show_entries", "frame=pts_time", "-of", "csv=p=0", str(fn)]
+
+    ret = subprocess.run(cmd, capture_output=True, text=True, errors="replace")
+    if ret.returncode != 0:
+        logging.warning(f"could not find keyframes of {fn}, resuming at {t:.1f} s")
+        return t
+
+    times = []
+    for line in ret.stdout.splitlines():
+        try:
+            times.append(float(line.strip().rstrip(",")))
+        except ValueError:
+            continue
+
+    if not times:  # audio-only, or no keyframe in LOOKBACK
+        return t
+
+    return max((k for k in times if k <= t), default=max(t - LOOKBACK, 0.0))
+
+
+class Checkpoint:
+    """
+    Monitor handler saving the input position to state file fn every interval seconds.
+
+    infn: input file recorded in the state, as named in the playlist
+    start: input position FFmpeg started at
+    duration: input duration, for position within looped input
+    """
+
+    def __init__(
+        self,
+        fn: Path,
+        infn: Path,
+        start: float = 0.0,
+        duration: float | None = None,
+        interval: float = INTERVAL,
+    ):
+
+        self.fn = fn
+        self.infn = infn
+        self.start = start
+        self.duration = duration
+        self.interval = interval
+
+        self._last = 0.0
+
+    def position(self, out_time: float) -> float:
+        pos = self.start + out_time
+        if self.duration:
+            pos %= self.duration
+        return pos
+
+    def __call__(self, M: Monitor) -> None:
+
+        now = time.monotonic()
+        if M.out_time is None or now - self._last < self.interval:
+            return
+        self._last = now
+
+        state = {"file": str(self.infn), "offset": self.position(M.out_time), "time": time.time()}
+        save(self.fn, state)
@@ -0,0 +1,230 @@
+"""
+run streams from a timetable, preparing each slot ahead of air time
+
+Each slot is prepared "lead_sec" seconds before its start: inputs are probed,
+the FFmpeg command line is built, and capture devices are checked.
+At the start time only FFmpeg itself has to start.
+
+    python -m pylivestream.schedule timetable.json
+
+timetable.json:
+
+    {
+      "ini": "~/pylivestream.json",
+      "lead_sec": 60,
+      "slots": [
+        {"start": "2026-10-20T18:00:00", "duration": 3600, "kind": "file",
+         "websites": "youtube", "options": {"infn": "~/show.mp4"}},
+        {"start": "2026-10-20T19:00:00", "kind": "playlist", "websites": "youtube",
+         "files": ["~/a.mp4", "~/b.mp4"]},
+        {"start": "2026-10-20T20:00:00", "duration": 1800, "kind": "screen", "websites": "twitch"}
+      ]
+    }
+
+kind: playlist, or a stream kind as in pylivestream.base.OPERATORS.
+Start times without a timezone are local time.
+"duration" (seconds) is the stream time limit, and is used to detect overlapping slots.
+When a slot starts while the previous one is still streaming, the previous one is stopped.
+
+Events are logged, and passed to the optional on_event callback as dicts:
+{"time": epoch seconds, "slot": slot name, "event": name, "message": str}
+with event names: overlap, prepared, prep_failed, skipped, started, start_late, stopped, finished.
+"""
+
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import logging
+import signal
+import subprocess
+import threading
+import time
+import typing as T
+
+from .base import Livestream, OPERATORS
+
+LEAD_SEC = 60.0
+LATE_SEC = 0.1  # start later than this is reported
+
+
+class Slot:
+    def __init__(self, entry: dict[str, T.Any], ini: Path | None = None):
+
+        self.start: float = datetime.fromisoformat(entry["start"]).timestamp()
+        self.duration: float | None = entry.get("duration")
+        self.kind: str = entry.get("kind", "file")
+        self.websites: str = entry["websites"]
+        self.ini = Path(entry.get("ini", ini or "")).expanduser()
+        self.options: dict[str, T.Any] = entry.get("options", {})
+        self.files: list[str] = entry.get("files", [])
+        self.name: str = entry.get("name", f"{self.kind}@{entry['start']}")
+
+        if self.kind != "playlist" and self.kind not in OPERATORS:
+            raise ValueError(f"{self.name}: unknown kind {self.kind}")
+
+        self.streams: list[Livestream] = []
+        self.current: Livestream | None = None
+        self.stopped = False
+
+    @property
+    def end(self) -> float | None:
+        return self.start + self.duration if self.duration else None
+
+    def prepare(self) -> None:
+        """probe inputs, build commands and check devices"""
+
+        opts = dict(self.options)
+        # a playlist is stopped by the scheduler at the end of its slot instead
+        if self.duration and self.kind != "playlist" and "timeout" not in opts:
+            opts["timeout"] = self.duration
+
+        if self.kind == "playlist":
+            self.streams = [
+                OPERATORS["file"](self.ini, self.websites, infn=f, **opts).stream for f in self.files
+            ]
+        else:
+            self.streams = [OPERATORS[self.kind](self.ini, self.websites, **opts).stream]
+
+        if self.kind in ("screen", "camera", "pip", "microphone"):
+            for s in self.streams:
+                if not s.check_device():
+                    raise ConnectionError(f"device check failed: {' '.join(s.checkcmd)}")
+
+    def run(self) -> None:
+        """stream each prepared item in turn"""
+
+        for s in self.streams:
+            if self.stopped:
+                break
+            self.current = s
+            # stop() may have come before current was set, and not reached s
+            if self.stopped:
+                break
+            s.startlive()
+
+    def stop(self) -> None:
+        self.stopped = True
+        if self.current is not None:
+            self.current.stop()
+
+
+class Scheduler:
+    def __init__(
+        self,
+        slots: list[Slot],
+        lead_sec: float = LEAD_SEC,
+        on_event: T.Callable[[dict[str, T.Any]], None] | None = None,
+    ):
+
+        self.slots = sorted(slots, key=lambda s: s.start)
+        self.lead_sec = lead_sec
+        self.on_event = on_event
+
+        self.events: list[dict[str, T.Any]] = []
+        self.onair: Slot | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, fn: Path, **kwargs) -> "Scheduler":
+
+        fn = Path(fn).expanduser()
+        C = json.loads(fn.read_text())
+
+        ini = C.get("ini")
+        slots = [Slot(e, ini) for e in C["slots"]]
+
+        return cls(slots, lead_sec=C.get("lead_sec", LEAD_SEC), **kwargs)
+
+    def event(self, slot: Slot, name: str, message: str = "") -> None:
+
+        e = {"time": time.time(), "slot": slot.name, "event": name, "message": message}
+        self.events.append(e)
+
+        warn = name in ("overlap", "prep_failed", "skipped", "start_late")
+        logging.log(logging.WARNING if warn else logging.INFO, f"{slot.name}: {name} {message}")
+
+        if self.on_event is not None:
+            self.on_event(e)
+
+    def check_overlap(self) -> None:
+        """report slots that start before the previous slot's end"""
+
+        for prev, s in zip(self.slots, self.slots[1:]):
+            if prev.end is not None and s.start < prev.end:
+                dt = prev.end - s.start
+                self.event(s, "overlap", f"starts {dt:.1f} s before {prev.name} ends")
+
+    def run(self) -> None:
+        """run all slots, blocking until the last one finishes"""
+
+        self.check_overlap()
+
+        threads = [threading.Thread(target=self._slot, args=(s,), daemon=True) for s in self.slots]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def stop(self) -> None:
+        for s in self.slots:
+            s.stop()
+
+    def _slot(self, s: Slot) -> None:
+
+        wait_until(s.start - self.lead_sec)
+
+        t0 = time.monotonic()
+        try:
+            s.prepare()
+            self.event(s, "prepared", f"in {time.monotonic() - t0:.2f} s")
+        except (OSError, ValueError, KeyError, RuntimeError, subprocess.SubprocessError) as e:
+            self.event(s, "prep_failed", str(e))
+            self.event(s, "skipped")
+            return
+
+        wait_until(s.start)
+
+        with self._lock:
+            if self.onair is not None and self.onair is not s and not self.onair.stopped:
+                self.event(self.onair, "stopped", f"for {s.name}")
+                self.onair.stop()
+            self.onair = s
+
+        late = time.time() - s.start
+        if late > LATE_SEC:
+            self.event(s, "start_late", f"by {late:.2f} s")
+        self.event(s, "started")
+
+        timer = None
+        if s.duration:
+            timer = threading.Timer(s.start + s.duration - time.time(), s.stop)
+            timer.daemon = True
+            timer.start()
+
+        try:
+            s.run()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self.event(s, "finished")
+            with self._lock:
+                if self.onair is s:
+                    self.onair = None
+
+
+def wait_until(t: float) -> None:
+    """sleep until epoch time t, waking early to finish with short sleeps for accuracy"""
+
+    while (dt := t - time.time()) > 0:
+        time.sleep(dt - 0.05 if dt > 0.1 else dt)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    p = argparse.ArgumentParser(description="run streams from a timetable")
+    p.add_argument("timetable", help="JSON timetable, see help(pylivestream.schedule)")
+    P = p.parse_args()
+
+    Scheduler.from_file(P.timetable).run()
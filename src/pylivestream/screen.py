@@ -2,14 +2,24 @@ from pathlib import Path
 import signal
 import argparse
 
-from .base import Screenshare
+from .base import Screenshare, PictureInPicture
 
 
 def stream_screen(
-    ini_file: Path, websites: str, *, assume_yes: bool = False, timeout: float | None = None
+    ini_file: Path,
+    websites: str,
+    *,
+    assume_yes: bool = False,
+    timeout: float | None = None,
+    static: bool = False,
+    pip: bool = False,
 ):
 
-    S = Screenshare(ini_file, websites, yes=assume_yes, timeout=timeout)
+    S: Screenshare | PictureInPicture
+    if pip:
+        S = PictureInPicture(ini_file, websites, yes=assume_yes, timeout=timeout)
+    else:
+        S = Screenshare(ini_file, websites, yes=assume_yes, timeout=timeout, static=static)
 
     print(" ".join(S.stream.cmd))
 
@@ -22,9 +32,24 @@ def cli():
     p.add_argument("json", help="JSON file with stream parameters such as key")
     p.add_argument("-y", "--yes", help="no confirmation dialog", action="store_true")
     p.add_argument("-t", "--timeout", help="stop streaming after --timeout seconds", type=int)
+    p.add_argument(
+        "--static",
+        help="mostly static content e.g. slides: drop duplicate frames",
+        action="store_true",
+    )
+    p.add_argument(
+        "--pip", help="camera inset over screen (picture-in-picture)", action="store_true"
+    )
     P = p.parse_args()
 
-    stream_screen(ini_file=P.json, websites=P.websites, assume_yes=P.yes, timeout=P.timeout)
+    stream_screen(
+        ini_file=P.json,
+        websites=P.websites,
+        assume_yes=P.yes,
+        timeout=P.timeout,
+        static=P.static,
+        pip=P.pip,
+    )
 
 
 if __name__ == "__main__":
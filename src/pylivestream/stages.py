@@ -0,0 +1,309 @@
+"""
+separate capture and encode FFmpeg processes, connected by a deep buffer
+
+In one FFmpeg process, a brief encoder stall (scene cut, CPU contention) backs up into
+the capture inputs, and frames x11grab, v4l2 or pulse could not deliver in time are
+lost. With "split_capture", one FFmpeg only captures, writing NUT with lightly
+compressed video (utvideo, lossless) and PCM audio to a pipe, and a second FFmpeg reads
+that pipe and encodes for the site. A stalled encoder then fills the buffer instead of
+the capture queues.
+
+The pipe buffer is enlarged with F_SETPIPE_SZ (Linux), up to /proc/sys/fs/pipe-max-size
+(1 MiB by default for unprivileged users). If the kernel grants less than "buffer_mb",
+Python relays between two pipes through a bounded in-memory buffer of the remainder.
+When the buffer is (nearly) full the capture process blocks, counted as an overflow.
+
+    "split_capture": {"buffer_mb": 256, "codec": "utvideo"}
+
+Buffer depth and overflows are in Stages.status().
+"""
+
+import collections
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import typing as T
+
+from .monitor import Monitor
+
+BUFFER_MB = 256
+CODEC = "utvideo"
+SAMPLE_SEC = 0.05  # buffer depth sampling period
+FULL = 0.9  # fraction of buffer counted as full
+CHUNK = 1 << 20  # relay read size
+
+
+def set_pipe_size(fd: int, size: int) -> int:
+    """enlarge pipe buffer toward size bytes, returning the size granted, 0 if unknown"""
+
+    if not sys.platform.startswith("linux"):
+        return 0
+
+    import fcntl
+
+    try:
+        with open("/proc/sys/fs/pipe-max-size") as f:
+            limit = int(f.read())
+    except (OSError, ValueError):
+        limit = size
+
+    for s in (size, min(size, limit)):
+        try:
+            return fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, s)
+        except OSError:  # EPERM above pipe-max-size without CAP_SYS_RESOURCE
+            continue
+
+    return 0
+
+
+def pipe_fill(fd: int) -> int | None:
+    """bytes waiting in pipe, None where not available"""
+
+    try:
+        import fcntl
+        import termios
+    except ImportError:  # Windows
+        return None
+
+    buf = bytearray(4)
+    try:
+        fcntl.ioctl(fd, termios.FIONREAD, buf)
+    except OSError:
+        return None
+
+    return int.from_bytes(buf, sys.byteorder)
+
+
+def write_all(fd: int, b: bytes) -> None:
+    view = memoryview(b)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class Stages:
+    """
+    capture process feeding the encoder through a buffer of buffer_mb.
+    """
+
+    def __init__(self, buffer_mb: float = BUFFER_MB, codec: str = CODEC):
+
+        self.buffer = int(buffer_mb * 2**20)
+        self.codec = codec
+
+        self.proc: subprocess.Popen | None = None
+        self.pipe_bytes = 0  # granted pipe buffer, per pipe
+        self.relay_bytes = 0  # in-memory buffer between the pipes
+        self.fill: int | None = 0  # bytes buffered between capture and encoder
+        self.max_fill = 0
+        self.overflows = 0
+
+        # capture: capture output read end, relay: write end of the encoder pipe,
+        # encoder: encoder stdin read end. Without relay, capture is the encoder's.
+        self._fd: dict[str, int] = {}
+        self._queue: collections.deque[bytes] = collections.deque()
+        self._queued = 0
+        self._cv = threading.Condition()
+        self._stopping = False
+        self._relays: list[threading.Thread] = []
+
+    def capture_cmd(self, exe: str, loglevel: list[str], inputs: list[str]) -> list[str]:
+        """FFmpeg command capturing inputs to NUT on stdout"""
+
+        cmd = [exe, "-nostdin"] + loglevel + inputs
+        for i in range(inputs.count("-i")):
+            cmd += ["-map", str(i)]
+        cmd += ["-codec:v", self.codec, "-codec:a", "pcm_s16le", "-f", "nut", "pipe:1"]
+
+        return cmd
+
+    def encode_in(self, queue: int) -> list[str]:
+        """encoder input options: the captured NUT stream on stdin"""
+        return ["-thread_queue_size", str(queue), "-f", "nut", "-i", "pipe:0"]
+
+    @property
+    def buffer_bytes(self) -> int:
+        return self.pipe_bytes * (2 if self.relay_bytes else 1) + self.relay_bytes
+
+    def status(self) -> dict[str, T.Any]:
+        return {
+            "buffer_bytes": self.buffer_bytes,
+            "fill": self.fill,
+            "max_fill": self.max_fill,
+            "overflows": self.overflows,
+        }
+
+    def start(self, cmd: list[str], M: Monitor) -> int:
+        """
+        start capture, returning the pipe read end for the encoder's stdin.
+        Capture warnings count toward the encoder Monitor's drops.
+        """
+
+        self.fill = self.max_fill = self.overflows = 0
+        self._stopping = False
+
+        r, w = os.pipe()
+        self.pipe_bytes = set_pipe_size(w, self.buffer)
+        self._fd = {"capture": r, "encoder": r}
+
+        self.relay_bytes = 0
+        if 0 < self.pipe_bytes and 2 * self.pipe_bytes < self.buffer:
+            r2, w2 = os.pipe()
+            set_pipe_size(w2, self.pipe_bytes)
+            self.relay_bytes = self.buffer - 2 * self.pipe_bytes
+            self._fd |= {"relay": w2, "encoder": r2}
+
+        logging.info(
+            f"capture buffer: {self.pipe_bytes // 1024} KiB pipe, "
+            f"{self.relay_bytes // 2**20} MiB relay"
+        )
+
+        print("\n", " ".join(cmd), "\n")
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=w,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        )
+        os.close(w)
+
+        threading.Thread(target=self._read_stderr, args=(M,), daemon=True).start()
+        threading.Thread(target=self._sample, daemon=True).start()
+        self._relays = []
+        if self.relay_bytes:
+            self._relays = [
+                threading.Thread(target=self._relay_in, daemon=True),
+                threading.Thread(target=self._relay_out, daemon=True),
+            ]
+            for t in self._relays:
+                t.start()
+
+        return self._fd["encoder"]
+
+    def stop(self) -> None:
+        """
+        end capture and release pipes: capture exits, then the relay threads,
+        and only then are the pipes closed, as the threads use them until they return.
+        """
+
+        with self._cv:
+            self._stopping = True  # relays discard data from here on
+            self._queue.clear()
+            self._queued = 0
+            self._cv.notify_all()
+
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+
+        # the encoder has stopped reading: drain its input, so that neither capture
+        # nor relay stays blocked writing to a full pipe
+        fd = self._fd.get("encoder")
+        try:
+            if fd is not None:
+                os.set_blocking(fd, False)
+        except OSError:  # pipes on Windows before Python 3.12
+            fd = None
+        while fd is not None and (
+            (self.proc is not None and self.proc.poll() is None)
+            or any(t.is_alive() for t in self._relays)
+        ):
+            try:
+                if os.read(fd, CHUNK):
+                    continue
+            except BlockingIOError:
+                pass
+            time.sleep(SAMPLE_SEC)
+
+        if self.proc is not None:
+            self.proc.wait()
+        for t in self._relays:
+            t.join()
+
+        with self._cv:
+            for fd in set(self._fd.values()):
+                os.close(fd)
+            self._fd = {}
+
+        if self.overflows:
+            logging.warning(f"capture buffer was full {self.overflows} times")
+
+    def _read_stderr(self, M: Monitor) -> None:
+        assert self.proc is not None and self.proc.stderr is not None
+
+        for line in self.proc.stderr:
+            M.scan(line)
+            print("capture:", line.rstrip("\n"), file=sys.stderr)
+
+    def _sample(self) -> None:
+        """track buffer depth while capture runs"""
+
+        was_full = False
+        while self.proc is not None and self.proc.poll() is None:
+            with self._cv:
+                if not self._fd:
+                    return
+                fills = [pipe_fill(fd) for fd in {self._fd["capture"], self._fd["encoder"]}]
+                queued = self._queued
+
+            if any(f is None for f in fills):
+                self.fill = None
+                return
+
+            self.fill = fill = sum(T.cast(list[int], fills)) + queued
+            self.max_fill = max(self.max_fill, fill)
+
+            full = self.buffer_bytes > 0 and fill >= FULL * self.buffer_bytes
+            if full and not was_full:
+                self.overflows += 1
+            was_full = full
+
+            time.sleep(SAMPLE_SEC)
+
+    def _relay_in(self) -> None:
+        """read capture pipe into memory, waiting while the relay buffer is full"""
+
+        r = self._fd["capture"]
+        while True:
+            try:
+                b = os.read(r, CHUNK)
+            except OSError as e:
+                logging.error(f"capture relay: {e}")
+                b = b""
+            with self._cv:
+                if self._stopping:
+                    if not b:
+                        return
+                    continue
+                self._queue.append(b)  # empty at end of stream
+                self._queued += len(b)
+                self._cv.notify_all()
+                if not b:
+                    return
+                while not self._stopping and self._queued > self.relay_bytes:
+                    self._cv.wait()
+
+    def _relay_out(self) -> None:
+        """write relay buffer to the encoder pipe, closing it at end of capture"""
+
+        while True:
+            with self._cv:
+                while not self._queue and not self._stopping:
+                    self._cv.wait()
+                if self._stopping:
+                    return
+                b = self._queue.popleft()
+                if not b:
+                    os.close(self._fd.pop("relay"))  # encoder sees end of file
+                    return
+                w = self._fd["relay"]
+            try:
+                write_all(w, b)
+            except OSError:  # encoder gone
+                return
+            with self._cv:
+                self._queued -= len(b)
+                self._cv.notify_all()
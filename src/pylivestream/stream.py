@@ -1,17 +1,30 @@
 import bisect
+import functools
+import math
 from pathlib import Path
 import logging
 import os
 import sys
 import json
+import typing as T
+import weakref
 
 from . import utils
-from .ffmpeg import Ffmpeg, get_exe
-
-# %%  Col0: vertical pixels (height). Col1: video kbps. Interpolates.
-# NOTE: Python >= 3.6 has guaranteed dict() order.
+from . import ingest
+from . import loudness
+from . import encoders
+from . import tracing
+from .complexity import get_complexity, bitrate_scale
+from .ffmpeg import Ffmpeg, get_exe, get_meta
 
 FPS: float = 30.0  # default frames/sec if not defined otherwise
+KEYFRAME_SEC: float = 2.0  # if the site does not set keyframe_sec
+
+# %% input thread queues, counted in packets. FFmpeg default is 8.
+QUEUE_MIN: int = 8
+QUEUE_SEC: float = 2.0  # seconds of capture each input queue should absorb
+QUEUE_MEM_FRACTION: float = 0.125  # at most this fraction of available memory per input
+AUDIO_PACKET: int = 1024  # samples per captured audio packet, typical of pulse, dshow
 
 
 def get_video_codec(site: str) -> str:
@@ -37,44 +50,183 @@ def get_video_codec(site: str) -> str:
     return video_codecs.get(site, video_codecs["default"])
 
 
-def get_video_bitrate(site: str, fps: float | None, horiz_res: int) -> int:
+# %% bitrate model
+FPS_TOLERANCE: float = 5.0  # e.g. up to 35 fps uses the 30 fps ladder
+STATIC_FPS: float = 20.0  # below this, use the static image ladder
+DEFAULT_CONFIG = Path(__file__).parent / "data/pylivestream.json"
+
+
+class Ladder:
+    """
+    bitrate ladder for one site and fps class.
+
+    Rungs are vertical pixels (height) vs. video kbps, as published by the site.
+    Bits per pixel are interpolated linearly in pixel count between rungs,
+    so a resolution between rungs gets the bitrate it needs rather than the next rung up.
+    Outside the rungs, bitrate is clamped to the first or last rung.
+    """
+
+    def __init__(self, rungs: dict[str, int]):
+        r = sorted((int(h), int(k)) for h, k in rungs.items())
+        if not r:
+            raise ValueError("bitrate ladder needs at least one rung")
+
+        self.heights = [h for h, _ in r]
+        self.kbps = [k for _, k in r]
+        # 16:9 pixels per frame; aspect ratio cancels out in the interpolation
+        self.bpp = [k / (h * h) for h, k in r]
+
+    def __call__(self, height: int) -> int:
+
+        if height <= self.heights[0]:
+            return self.kbps[0]
+        if height >= self.heights[-1]:
+            return self.kbps[-1]
+
+        i = bisect.bisect_left(self.heights, height)
+        if self.heights[i] == height:
+            return self.kbps[i]
+
+        p0, p1 = self.heights[i - 1] ** 2, self.heights[i] ** 2
+        p = height * height
+        bpp = self.bpp[i - 1] + (self.bpp[i] - self.bpp[i - 1]) * (p - p0) / (p1 - p0)
+
+        return round(bpp * p)
+
+
+@functools.cache
+def bitrate_model(fn: Path = DEFAULT_CONFIG) -> dict[str, dict[str, Ladder] | None]:
+    """
+    load "bitrate" model from JSON config, once per process.
+    Pieces missing from it (the whole model, "static", the "default" site, or the fps
+    ladders of a site) are taken from the config file distributed with PyLivestream.
+
+    Returns site: {fps class: Ladder}, with None for sites that use HLS.
+    fps classes are keyed like "30", also if the config writes "30.0".
+    There is always a "default" site, and each other site has at least one fps ladder.
+    """
+
+    C = json.loads(Path(fn).read_text()).get("bitrate")
+    # the distributed model itself must be complete
+    fb = None if Path(fn).resolve() == DEFAULT_CONFIG.resolve() else bitrate_model()
+    if C is None:
+        if fb is None:
+            raise KeyError(f"No bitrate model in {fn}")
+        return fb
+    fb_default = fb["default"] if fb is not None else None
+
+    if "static" in C:
+        static = Ladder(C["static"])
+    elif fb_default is not None:
+        static = fb_default["static"]
+    else:
+        raise KeyError(f"No static bitrate ladder in {fn}")
+
+    model: dict[str, dict[str, Ladder] | None] = {}
+    for site, ladders in C.get("sites", {}).items():
+        if ladders.get("hls"):
+            model[site] = None
+            continue
+
+        L = {"static": Ladder(ladders["static"]) if "static" in ladders else static}
+        for k, v in ladders.items():
+            if k in ("static", "hls"):
+                continue
+            try:
+                L[f"{float(k):g}"] = Ladder(v)
+            except ValueError as e:
+                raise ValueError(f"bitrate ladder {site} {k} in {fn}: {e}")
+        model[site] = L
+
+    def fps_ladders(L: dict[str, Ladder] | None) -> dict[str, Ladder]:
+        return {k: v for k, v in L.items() if k != "static"} if L else {}
+
+    D = model.get("default", {})
+    if D is not None and not fps_ladders(D):
+        if fb_default is None:
+            raise KeyError(f"No default site bitrate ladders in {fn}")
+        model["default"] = D = fps_ladders(fb_default) | {"static": D.get("static", static)}
+
+    for site, M in model.items():
+        if M is not None and not fps_ladders(M):
+            model[site] = fps_ladders(D or fb_default) | {"static": M["static"]}
+
+    return model
+
+
+def get_video_bitrate(
+    site: str,
+    fps: float | None,
+    horiz_res: int,
+    config: Path = DEFAULT_CONFIG,
+    scale: float = 1.0,
+) -> int:
     """
     YouTube spec: https://support.google.com/youtube/answer/2853702
     Facebook: https://www.facebook.com/business/help/162540111070395
+
+    horiz_res: vertical pixels (height) of video
+    scale: fraction of the ladder bitrate, e.g. from content complexity.
+        Not scaled below the lowest rung of the ladder.
+
+    Returns 0 for sites that use HLS.
     """
 
+    model = bitrate_model(config)
+
+    ladders = model[site] if site in model else model["default"]
+    if ladders is None:
+        return 0  # uses HLS
+
     # for static images, ignore YouTube bitrate warning as long as image looks OK on stream
-    br_static = {240: 200, 480: 400, 720: 800, 1080: 1200, 1440: 2000, 2160: 4000}
-
-    match site:
-        case "youtube":
-            br30 = {720: 4000, 1080: 10000, 1440: 15000, 2160: 30000}
-            br60 = {720: 6000, 1080: 12000, 1440: 24000, 2160: 35000}
-            return 0  # uses HLS
-        case "facebook":
-            br30 = {360: 700, 480: 1250, 720: 2500, 1080: 4500}
-            br60 = {720: 4000, 1080: 6000}
-        case "owncast":
-            return 0  # uses HLS
-        case _:
-            br30 = {360: 700, 480: 1250, 720: 2500, 1080: 4500}
-            br60 = {720: 4000, 1080: 6000}
-
-    if fps is None or fps < 20:
-        k = br_static.keys()
-        v = br_static.values()
-    elif 20 <= fps <= 35:
-        k = br30.keys()
-        v = br30.values()
+    if fps is None or fps < STATIC_FPS:
+        ladder = ladders["static"]
     else:
-        k = br60.keys()
-        v = br60.values()
+        rates = sorted(float(k) for k in ladders if k != "static")
+        rate = next((r for r in rates if fps <= r + FPS_TOLERANCE), rates[-1])
+        ladder = ladders[f"{rate:g}"]
 
-    br = list(v)[bisect.bisect_left(list(k), horiz_res)]
+    br = ladder(horiz_res)
+    if scale != 1.0:
+        br = max(ladder.kbps[0], round(br * scale))
 
     return br
 
 
+def get_queue_size(rate: float, packet_bytes: int, memory: int = 0, scale: int = 1) -> int:
+    """
+    -thread_queue_size for a live capture input.
+
+    Sized to hold QUEUE_SEC seconds of packets at "rate" packets/sec,
+    times "scale" (doubled on each restart due to drops),
+    but not more than QUEUE_MEM_FRACTION of "memory" bytes if known.
+    Rounded up to a power of two.
+    """
+
+    n = max(QUEUE_MIN, math.ceil(rate * QUEUE_SEC) * scale)
+    n = 1 << (n - 1).bit_length()
+
+    if memory > 0 and packet_bytes > 0:
+        cap = int(memory * QUEUE_MEM_FRACTION) // packet_bytes
+        while n > QUEUE_MIN and n > cap:
+            n //= 2
+
+    return n
+
+
+def load_config(fn: Path) -> T.Any:
+    """JSON config, parsed once per file modification"""
+
+    fn = Path(fn).expanduser().resolve(strict=True)
+
+    return _load_json(fn, fn.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_json(fn: Path, mtime_ns: int) -> T.Any:
+    return json.loads(fn.read_text())
+
+
 # %% top level
 class Stream:
     def __init__(self, inifn: Path, site: str, **kwargs):
@@ -93,11 +245,54 @@ class Stream:
         self.loop: bool = kwargs.get("loop", False)
 
         self.infn = Path(kwargs["infn"]).expanduser() if kwargs.get("infn") else None
+        # seconds into infn to start at
+        self.start: float = kwargs.get("start", 0.0)
         self.yes: list[str] = self.F.YES if kwargs.get("yes") else []
 
-        self.queue: list[str] = []  # self.F.QUEUE
+        # restarts due to persistent capture drops double input queues
+        self.queue_scale: int = 1
+
+        # output frame rate and height, if reduced from input
+        self.out_fps: float | None = None
+        self.out_height: int | None = None
 
         self.caption: str = kwargs.get("caption", "")
+        # caption read from this file every frame, so it can be updated while streaming
+        self.caption_file: Path | None = None
+        if kwargs.get("caption_file"):
+            self.caption_file = Path(kwargs["caption_file"]).expanduser()
+        elif kwargs.get("live_caption"):
+            self.caption_file = utils.cache_dir() / f"caption-{os.getpid()}-{id(self):x}.txt"
+            # a file of its own choosing is removed at exit
+            weakref.finalize(self, self.caption_file.unlink, missing_ok=True)
+
+        # scale file bitrate by content complexity
+        self.complexity: bool = kwargs.get("complexity", False)
+
+        # constant gain to normalize file loudness, from cached measurement
+        self.loudnorm: bool = kwargs.get("loudnorm", False)
+        self._gain: dict[Path, float | None] = {}  # per input file, measured once
+
+        # drop duplicate frames of screen capture, with variable frame rate output
+        self.static: bool = kwargs.get("static", False)
+
+        # lavfi test sources in place of capture devices, for headless benchmarks
+        self.synthetic: bool = kwargs.get("synthetic", False)
+
+        # A/V health monitor outputs, see health.py
+        self.health_monitor: bool = kwargs.get("health", False)
+
+        # FFmpeg CPU, memory and I/O sampling from /proc, see procstat.py
+        self.resources: dict[str, T.Any] | None = kwargs.get("resources")
+
+        # capture and encode in separate processes, see stages.py
+        self.split_capture: dict[str, T.Any] | bool | None = kwargs.get("split_capture")
+
+        # low rate preview images and sprite sheet, see preview.py
+        self.preview_images: dict[str, T.Any] | bool | None = kwargs.get("preview")
+
+        # ring of recent encoded segments for instant clips, see replay.py
+        self.replay_buffer: dict[str, T.Any] | bool | None = kwargs.get("replay")
 
         self.timelimit: list[str] = self.F.timelimit(kwargs.get("timeout"))
 
@@ -106,7 +301,8 @@ class Stream:
 
         fn = Path(fn).expanduser().resolve(strict=True)
 
-        C = json.loads(fn.read_text())
+        with tracing.span("load_config", file=fn):
+            C = load_config(fn)
 
         try:
             syscfg = C[sys.platform]
@@ -127,15 +323,19 @@ class Stream:
         except KeyError:
             raise KeyError(f"No config sites: {self.site} in {fn}")
 
+        self.camera_res: list[str] | None = C.get("camera_size")
+
         if self.vidsource == "camera":
             self.res: list[str] = C.get("camera_size")
             self.fps: float | None = C.get("camera_fps")
             self.movingimage = self.staticimage = False
-        elif self.vidsource == "screen":
+        elif self.vidsource in ("screen", "pip"):
             self.res = C.get("screencap_size")
             self.fps = C.get("screencap_fps")
             self.origin: list[str] = C.get("screencap_origin", [1, 1])
             self.movingimage = self.staticimage = False
+            # camera inset over screen: {"width": 320, "corner": "bottom-right", "margin": 16}
+            self.pip: dict[str, T.Any] = C.get("pip", {})
         elif self.image:  # audio-only stream + background image
             self.res = utils.get_resolution(self.image, self.probeexe)
             self.fps = utils.get_framerate(self.infn, self.probeexe)
@@ -151,12 +351,46 @@ class Stream:
 
         self.audio_rate: str = C.get("audio_rate")
 
+        # encoder degradation ladder, see watchdog.py
+        self.degrade: dict[str, T.Any] | None = C.get("degrade")
+
+        self.queue_size()
+
         # https://trac.ffmpeg.org/wiki/Encode/H.264#Preset
         self.preset: str = C.get("preset", "veryfast")
 
         if not self.timelimit:
             self.timelimit = self.F.timelimit(sitecfg.get("timelimit"))
 
+        if not self.complexity:
+            self.complexity = C.get("complexity", False)
+
+        if not self.loudnorm:
+            self.loudnorm = C.get("loudnorm", False)
+
+        if not self.health_monitor:
+            self.health_monitor = C.get("health", False)
+
+        if not self.resources:
+            self.resources = C.get("resources")
+
+        if not self.split_capture:
+            self.split_capture = C.get("split_capture")
+
+        if not self.preview_images:
+            self.preview_images = C.get("preview")
+
+        if not self.replay_buffer:
+            self.replay_buffer = C.get("replay")
+
+        if not self.synthetic:
+            self.synthetic = C.get("synthetic", False)
+
+        if not self.static:
+            self.static = C.get("static_content", False)
+        self.static = self.static and self.vidsource == "screen"
+        self.loudnorm_target: float = C.get("loudnorm_target", loudness.TARGET_I)
+
         self.camera_chan: str = syscfg.get("camera_chan")
         self.screen_chan: str = syscfg.get("screen_chan")
 
@@ -169,6 +403,8 @@ class Stream:
 
         # H.265 suggested by YouTube, but not yet by Facebook.
         self.video_codec = C.get("video_codec", get_video_codec(self.site))
+        # reference clip for "video_codec": "auto" benchmark, default synthetic test pattern
+        self.codec_reference: str | None = C.get("codec_reference")
 
         self.audio_codec = C.get("audio_codec")
         self.video_format = syscfg.get("video_format")
@@ -180,24 +416,41 @@ class Stream:
 
         self.keyframe_sec: int = sitecfg.get("keyframe_sec")
 
-        self.url: str = sitecfg.get("url")
+        # list of candidate URLs: use the fastest to connect to
+        url = sitecfg.get("url")
+        if isinstance(url, list):
+            with tracing.span("ingest_select", site=self.site):
+                url = ingest.select(url, sitecfg.get("ingest_ttl", ingest.TTL))
+        self.url: str = url
         self.streamid: str = sitecfg.get("streamid", "")
 
+    def queue_size(self) -> None:
+        """
+        size the input thread queues of live capture devices from fps, frame size and memory.
+        Raw captured frames are assumed 4 bytes/pixel (x11grab bgr0) as worst case.
+        """
+
+        memory = utils.available_memory()
+
+        fps = self.fps if self.fps else FPS
+        frame_bytes = int(self.res[0]) * int(self.res[1]) * 4 if self.res else 0
+        self.video_queue: int = get_queue_size(fps, frame_bytes, memory, self.queue_scale)
+
+        rate = int(self.audio_rate) if self.audio_rate else 48000
+        self.audio_queue: int = get_queue_size(
+            rate / AUDIO_PACKET, AUDIO_PACKET * 4, memory, self.queue_scale
+        )
+
     def videoIn(self, quick: bool = False) -> list[str]:
         """
         config video input
         """
 
-        if self.vidsource == "screen":
-            v = self.screengrab(quick)
-            if sys.platform == "darwin":
-                # not for files "option pixel_format not found"
-                v = ["-pix_fmt", self.video_format] + v
-        elif self.vidsource == "camera":
-            v = self.camera(quick)
-            if sys.platform == "darwin":
-                # not for files "option pixel_format not found"
-                v = ["-pix_fmt", self.video_format] + v
+        if self.vidsource == "pip":
+            # screen is input 0, camera input 1 of the overlay filter graph
+            v = self.capture_in("screen", quick) + self.capture_in("camera", quick)
+        elif self.vidsource in ("screen", "camera"):
+            v = self.capture_in(self.vidsource, quick)
         elif self.vidsource is None or self.vidsource == "file":
             v = self.filein(quick)
         else:
@@ -205,6 +458,104 @@ class Stream:
 
         return v
 
+    def capture_in(self, kind: str, quick: bool = False) -> list[str]:
+        """input options of a "screen" or "camera" capture device"""
+
+        if self.synthetic:
+            return self.synthetic_video(kind)
+
+        v = self.screengrab(quick) if kind == "screen" else self.camera(quick)
+        if sys.platform == "darwin":
+            # not for files "option pixel_format not found"
+            v = ["-pix_fmt", self.video_format] + v
+
+        return v
+
+    def videoFilter(self) -> list[str]:
+        """
+        simple filter chain applied to the video before encoding
+        """
+
+        vf = []
+
+        if self.static:
+            if self.out_fps:
+                vf.append(f"fps={self.out_fps}")
+            vf.append(self.decimate()[0])
+
+        if not self.movingimage:  # FIXME: need a different filter chain to caption moving images
+            if caption := self.F.drawtext_filter(self.caption, self.caption_file):
+                vf.append(caption)
+
+        if self.out_height and self.res:
+            vf.append(f"scale=-2:{self.out_height}")
+
+        if self.vidsource == "pip":
+            # one graph: camera scaled once to inset size, overlaid, then the chain above
+            return ["-filter_complex", ",".join([self.overlay()] + vf)]
+
+        return ["-vf", ",".join(vf)] if vf else []
+
+    def overlay(self) -> str:
+        """filter graph putting camera (input 1) as an inset in a corner of screen (input 0)"""
+
+        P = self.pip
+        width = P.get("width") or int(self.res[0]) // 4
+        width -= width % 2
+        margin = P.get("margin", 16)
+        corner = P.get("corner", "bottom-right")
+
+        try:
+            v, h = corner.split("-")
+            x = {"left": str(margin), "right": f"W-w-{margin}"}[h]
+            y = {"top": str(margin), "bottom": f"H-h-{margin}"}[v]
+        except (KeyError, ValueError):
+            raise ValueError(f"pip corner must be e.g. bottom-right, not {corner}")
+
+        return f"[1:v]scale={width}:-2[cam];[0:v][cam]overlay={x}:{y}"
+
+    def decimate(self) -> tuple[str, str]:
+        """
+        mpdecimate filter and -force_key_frames expression for static content.
+
+        Up to a quarter keyframe interval of duplicate frames are dropped in a row,
+        so a frame is encoded at least that often, and a keyframe is forced once
+        the next one would otherwise come later than keyframe_sec.
+        """
+
+        fps = self.out_fps or self.fps or FPS
+        K = self.keyframe_sec or KEYFRAME_SEC
+
+        drop = max(1, round(K * fps / 4) - 1)
+        gap = (drop + 1) / fps
+
+        return f"mpdecimate=max={drop}", f"expr:gte(t,n_forced*{K - gap:.3f})"
+
+    def write_caption(self) -> None:
+        """
+        initial caption file, when the stream starts. Only files in the user cache are
+        written, any other caption_file must exist, e.g. written by other software.
+        """
+
+        fn = self.caption_file
+        if fn is None:
+            return
+
+        if fn.resolve().is_relative_to(utils.cache_dir().resolve()):
+            if self.caption or not fn.is_file():
+                utils.write_atomic(fn, self.caption)
+        elif not fn.is_file():
+            raise FileNotFoundError(f"caption file {fn} not found")
+
+    def set_caption(self, text: str) -> None:
+        """change caption of running stream, shown from the next frame"""
+
+        if not self.caption_file:
+            raise ValueError("stream needs live_caption or caption_file to change its caption")
+
+        utils.write_atomic(self.caption_file, text)
+        self.caption = text
+
     def videoOut(self) -> list[str]:
         """
         configure video output
@@ -225,9 +576,12 @@ class Stream:
         if self.res is None:  # audio-only, no image or video
             return []
         # %% FFmpeg preset https://trac.ffmpeg.org/wiki/Encode/H.264#Preset
-        v += ["-preset", self.preset]
+        if encoders.uses_preset(self.video_codec):
+            v += ["-preset", self.preset]
 
         fps = self.fps if self.fps is not None else FPS
+        if self.out_fps:
+            fps = self.out_fps
         # %% variable bitrate (VBR) for video
         # units of kbps
         if self.video_kbps:
@@ -237,7 +591,10 @@ class Stream:
             v += ["-f", "hls"]
         # %% framerate
 
-        if self.image:
+        if self.static:
+            # timestamps of kept frames pass through unchanged
+            v += ["-fps_mode", "vfr", "-force_key_frames", self.decimate()[1]]
+        elif self.image or self.out_fps:
             v += ["-r", str(fps)]
 
         return v
@@ -249,6 +606,9 @@ class Stream:
         NOTE: -ac 2 NOT -ac 1 to avoid "non monotonous DTS in output stream" errors
         """
 
+        if self.synthetic and self.vidsource != "file" and self.audio_bps and self.audio_rate:
+            return ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate={self.audio_rate}"]
+
         if not (self.audio_bps and self.acap and self.audio_chan and self.audio_rate):
             return []
 
@@ -265,7 +625,8 @@ class Stream:
         elif self.acap == "null":
             a = ["-f", "lavfi", "-i", self.audio_chan]
         else:
-            a = ["-f", self.acap, "-i", self.audio_chan]
+            a = [] if quick else self.F.queue(self.audio_queue)
+            a += ["-f", self.acap, "-i", self.audio_chan]
 
         return a
 
@@ -287,8 +648,34 @@ class Stream:
         if self.audio_rate:
             o += ["-ar", str(self.audio_rate)]
 
+        if (gain := self.loudness_gain()) is not None:
+            o += ["-af", f"volume={gain:.2f}dB"]
+
         return o
 
+    def loudness_gain(self) -> float | None:
+        """loudnorm gain (dB) of the input file, None if not normalized or not measurable"""
+
+        if not (self.loudnorm and self.vidsource == "file" and self.infn):
+            return None
+
+        if self.infn not in self._gain:
+            meas = loudness.get_loudness(self.infn, self.exe)
+            self._gain[self.infn] = loudness.gain_db(meas, self.loudnorm_target) if meas else None
+
+        return self._gain[self.infn]
+
+    def has_audio(self) -> bool:
+        """whether the stream has an audio input"""
+
+        if self.vidsource == "file" or self.image:
+            if self.infn is None:
+                return False
+            meta = get_meta(self.infn, self.probeexe)
+            return any(s["codec_type"] == "audio" for s in meta.get("streams", []))
+
+        return bool(self.audioIn(quick=True))
+
     def video_bitrate(self) -> None:
         """
         get "best" video bitrate.
@@ -299,7 +686,7 @@ class Stream:
             return
 
         if self.res:
-            horiz_res: int = int(self.res[1])
+            horiz_res: int = int(self.out_height or self.res[1])
         elif self.vidsource is None or self.vidsource == "file":
             logging.info("assuming 480p input.")
             horiz_res = 480
@@ -309,7 +696,47 @@ class Stream:
                 "Try setting video_kbps in pylivestream.json file (see README.md)",
             )
 
-        self.video_kbps = get_video_bitrate(self.site, self.fps, horiz_res)
+        scale = 1.0
+        if self.complexity and self.vidsource == "file" and self.res and not self.image:
+            assert self.infn is not None
+            c = get_complexity(self.infn, self.exe, self.probeexe)
+            scale = bitrate_scale(c["si"], c["ti"])
+            logging.info(f"content complexity bitrate scale {scale:.2f}")
+
+        fps = self.out_fps or self.fps
+        self.video_kbps = get_video_bitrate(self.site, fps, horiz_res, self.json_file, scale)
+
+    def video_encoder(self) -> None:
+        """
+        check the video encoder is in this FFmpeg build, else use the next candidate for site.
+        "auto" chooses by benchmark of candidates at the stream's resolution and bitrate.
+        """
+
+        if self.res is None or not self.video_kbps:  # audio-only or HLS
+            if self.video_codec == "auto":
+                self.video_codec = get_video_codec(self.site)
+            return
+
+        if self.video_codec == "auto":
+            height = int(self.out_height or self.res[1])
+            fps = self.out_fps or self.fps or FPS
+            reference = Path(self.codec_reference) if self.codec_reference else None
+            codec = encoders.select(
+                self.site, height, fps, self.video_kbps, self.exe, self.preset, reference
+            )
+            self.video_codec = codec or get_video_codec(self.site)
+            logging.info(f"video encoder {self.video_codec} for {height}p{fps}")
+            return
+
+        have = encoders.available(self.exe)
+        if not have or self.video_codec in have:
+            return
+
+        for c in encoders.candidates(self.site):
+            if c in have:
+                logging.warning(f"{self.video_codec} not in this FFmpeg build, using {c}")
+                self.video_codec = c
+                return
 
     def screengrab(self, quick: bool = False) -> list[str]:
         """
@@ -317,7 +744,9 @@ class Stream:
         May not work for Wayland desktop.
         """
 
-        v = ["-f", self.vcap]
+        v = [] if quick else self.F.queue(self.video_queue)
+
+        v += ["-f", self.vcap]
 
         # FIXME: explict frame rate is problematic for MacOS with screenshare. Just leave it off?
         # if not quick:
@@ -342,6 +771,19 @@ class Stream:
 
         return v
 
+    def synthetic_video(self, kind: str) -> list[str]:
+        """
+        test pattern in place of "screen" or "camera" capture device,
+        at the configured size and fps, paced at realtime like a device
+        """
+
+        src = "testsrc2" if kind == "screen" else "smptehdbars"
+        fps = self.fps or FPS
+        res = self.camera_res if kind == "camera" else self.res
+        size = "x".join(map(str, res)) if res else "1280x720"
+
+        return [self.F.THROTTLE, "-f", "lavfi", "-i", f"{src}=size={size}:rate={fps}"]
+
     def camera(self, quick: bool = False) -> list[str]:
         """
         configure camera
@@ -355,7 +797,9 @@ class Stream:
             if not c:
                 c = "default"
 
-        v = ["-f", self.hcam, "-i", c]
+        v = [] if quick else self.F.queue(self.video_queue)
+
+        v += ["-f", self.hcam, "-i", c]
 
         #  '-r', str(self.fps),  # -r causes bad dropouts
 
@@ -396,10 +840,24 @@ class Stream:
                 v.extend(["-stream_loop", "-1"])  # FFmpeg >= 3
         # %% audio (for image+audio) or video
         if self.infn:
+            if self.start and not quick:
+                v.extend(["-ss", f"{self.start:.3f}"])  # input seek: from keyframe before
             v.extend(["-i", str(self.infn)])
 
         return v
 
+    def sink_url(self) -> str:
+        """output URL of site"""
+
+        streamid = self.streamid if hasattr(self, "streamid") else ""
+        # cannot have double quotes for Mac/Linux,
+        #    but need double quotes for Windows
+        sink: str = self.url + "/" + streamid
+        if os.name == "nt":
+            sink = '"' + sink + '"'
+
+        return sink
+
     def buffer(self) -> list[str]:
         """configure network buffer. Tradeoff: latency vs. robustness"""
         # constrain to single thread, default is multi-thread
@@ -1,7 +1,11 @@
 import pytest
 from pytest import approx
 from pathlib import Path
+import gc
 import importlib.resources
+import json
+import socket
+import sys
 
 import pylivestream as pls
 
@@ -32,3 +36,194 @@ def test_config_not_found(tmp_path):
 def test_config_default(tmp_path):
     S = pls.Livestream(ini, "localhost")
     assert "localhost" in S.site
+
+
+def test_queue_size():
+    assert pls.stream.get_queue_size(30, 640 * 480 * 4) == 64
+    assert pls.stream.get_queue_size(30, 640 * 480 * 4, scale=2) == 128
+    # memory limited
+    assert pls.stream.get_queue_size(30, 1920 * 1080 * 4, memory=2**30) == 16
+    assert pls.stream.get_queue_size(1, 10**9, memory=1) == 8
+
+
+@pytest.mark.parametrize(
+    "site,fps,height,kbps",
+    [
+        ("facebook", 30, 480, 1250),
+        ("facebook", 35, 720, 2500),
+        ("facebook", 60, 1080, 6000),
+        ("facebook", 30, 2160, 4500),  # clamped above top rung
+        ("facebook", 30, 144, 700),  # clamped below bottom rung
+        ("facebook", None, 2160, 4000),
+        ("twitch", 30, 360, 700),
+        ("youtube", 30, 1080, 0),
+    ],
+)
+def test_video_bitrate(site, fps, height, kbps):
+    assert pls.stream.get_video_bitrate(site, fps, height) == kbps
+
+
+def test_bitrate_model_partial(tmp_path):
+    """user model missing pieces falls back to the distributed model"""
+
+    fn = tmp_path / "pylivestream.json"
+    fn.write_text(
+        json.dumps(
+            {
+                "bitrate": {
+                    "sites": {
+                        "mysite": {"30.0": {"480": 1000, "720": 2000}},
+                        "stillsite": {"static": {"480": 300}},
+                    }
+                }
+            }
+        )
+    )
+
+    gvb = pls.stream.get_video_bitrate
+    assert gvb("mysite", 30, 720, fn) == 2000, "fps key written as 30.0"
+    assert gvb("mysite", None, 2160, fn) == 4000, "static ladder of distributed model"
+    assert gvb("stillsite", 30, 720, fn) == gvb("other", 30, 720), "default site fps ladders"
+    assert gvb("stillsite", None, 720, fn) == 300
+    assert gvb("other", 60, 1080, fn) == 6000
+
+
+def test_video_bitrate_interpolate():
+    br = pls.stream.get_video_bitrate("facebook", 30, 540)
+    assert 1250 < br < 2500
+    # bits per pixel interpolated in pixel count between the 480p and 720p rungs
+    t = (540**2 - 480**2) / (720**2 - 480**2)
+    bpp = 1250 / 480**2 + (2500 / 720**2 - 1250 / 480**2) * t
+    assert br == approx(bpp * 540**2, abs=1)
+
+
+def test_complexity_scale():
+    cx = pls.complexity
+    assert cx.bitrate_scale(0, 0) == approx(cx.MIN_SCALE)
+    assert cx.bitrate_scale(200, 100) == approx(1.0)
+
+    flat = bytes(cx.W * cx.H)
+    assert cx.sobel_std(flat) == 0
+    assert cx.diff_std(flat, flat) == 0
+    # vertical stripes have spatial detail
+    stripes = bytes((x // 4 % 2) * 255 for _ in range(cx.H) for x in range(cx.W))
+    assert cx.sobel_std(stripes) > 0
+
+    assert pls.stream.get_video_bitrate("facebook", 30, 720, scale=0.5) == 1250
+    assert pls.stream.get_video_bitrate("facebook", 30, 480, scale=0.1) == 700
+
+
+@pytest.mark.parametrize(
+    "op,src", [(pls.Screenshare, "testsrc2"), (pls.Camera, "smptehdbars"), (pls.Microphone, None)]
+)
+def test_synthetic(tmp_path, op, src):
+    C = json.loads(ini.read_text())
+    C["sites"]["localhost"]["audio_bps"] = 128000
+    cfg = tmp_path / "synthetic.json"
+    cfg.write_text(json.dumps(C))
+
+    S = op(cfg, "localhost", synthetic=True).stream
+
+    inputs = [S.cmd[i + 1] for i, o in enumerate(S.cmd) if o == "-i"]
+    if src:
+        assert inputs[0] == f"{src}=size=640x480:rate=30"
+    assert inputs[-1] == "sine=frequency=440:sample_rate=44100"
+    assert S.cmd.count("lavfi") == len(inputs)
+
+
+def test_port_listening(monkeypatch):
+    if not Path("/proc/net/tcp").is_file():
+        pytest.skip("no /proc/net/tcp")
+    monkeypatch.setattr(sys, "platform", "linux")
+
+    with socket.create_server(("127.0.0.1", 0)) as s:
+        port = s.getsockname()[1]
+        assert pls.ffmpeg.port_listening(port)
+
+    assert pls.ffmpeg.port_listening(port) is False
+
+    # elsewhere the port is left alone
+    monkeypatch.setattr(sys, "platform", "darwin")
+    assert pls.ffmpeg.port_listening(port) is None
+
+
+def test_live_caption(tmp_path):
+    fn = tmp_path / "caption.txt"
+    S = pls.Screenshare(ini, "localhost", caption="hello 50%", caption_file=fn).stream
+
+    vf = S.cmd[S.cmd.index("-vf") + 1]
+    assert f"textfile='{fn.as_posix()}':reload=1:expansion=none" in vf.replace("\\:", ":")
+    # a caption file outside the user cache is never created by the stream
+    assert not fn.exists()
+    with pytest.raises(FileNotFoundError):
+        S.write_caption()
+
+    S.set_caption("now playing: B")
+    assert fn.read_text() == "now playing: B"
+    assert [f.name for f in tmp_path.iterdir()] == [fn.name], "no temporary files left"
+    S.write_caption()
+    assert fn.read_text() == "now playing: B"
+
+    with pytest.raises(ValueError):
+        pls.Screenshare(ini, "localhost", caption="fixed").stream.set_caption("x")
+
+
+def test_live_caption_cache():
+    S = pls.Screenshare(ini, "localhost", caption="hello", live_caption=True).stream
+    fn = S.caption_file
+    assert fn is not None and fn.parent == pls.utils.cache_dir()
+    assert not fn.exists()  # written when the stream starts
+
+    S.write_caption()
+    assert fn.read_text() == "hello"
+
+    del S
+    gc.collect()
+    assert not fn.exists()
+
+
+def test_stop_pending():
+    S = pls.FileIn(ini, "facebook", infn=Path(__file__).parents[1] / "data/bunny.avi").stream
+    S.stop()
+    assert S.startlive() == 0
+    assert S.monitor is not None and S.monitor.proc is None, "FFmpeg not started"
+    assert not S.stopped, "ready to run again"
+
+
+def test_multisite():
+    S = pls.Screenshare(ini, "youtube facebook localhost", yes=True)
+    L = S.stream
+    assert isinstance(L, pls.base.MultiSite)
+
+    groups = L.groups()
+    assert sum(len(g[1]) for g in groups) == 3
+    # YouTube codec and bitrate differ, the others share one encoder
+    assert len(groups) == 2
+
+    cmd = L.cmd
+    assert cmd.count("-codec:v") == 2
+    assert any(c.endswith("split=2[v0][v1]") for c in cmd)
+    assert "localhost" in cmd[-1] and "facebook" in cmd[-1]
+
+    # per-site settings only
+    for m in L.members:
+        assert isinstance(m, pls.base.Site)
+        assert not hasattr(m, "cmd") and not hasattr(m, "health")
+
+
+def test_multisite_size(monkeypatch):
+    encoder = pls.base.Site.video_encoder
+
+    def fps60(self):
+        encoder(self)
+        if self.site == "facebook":
+            self.fps = 60
+
+    monkeypatch.setattr(pls.base.Site, "video_encoder", fps60)
+    with pytest.raises(ValueError):
+        pls.Screenshare(ini, "youtube facebook", yes=True)
+
+
+def test_single_site():
+    S = pls.Screenshare(ini, "localhost", yes=True)
+    assert not isinstance(S.stream, pls.base.MultiSite)
@@ -0,0 +1,126 @@
+from http.server import ThreadingHTTPServer
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import pylivestream.daemon as dmn
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def port(tmp_path):
+    dmn.Handler.daemon = dmn.Daemon(clip_dir=tmp_path)
+    dmn.Handler.token = TOKEN
+    with ThreadingHTTPServer(("127.0.0.1", 0), dmn.Handler) as httpd:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        yield httpd.server_port
+        httpd.shutdown()
+
+
+def raw(port, method, path, body=None, headers=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}", data=data, method=method, headers=headers or {}
+    )
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(req)
+    return e.value.code
+
+
+def test_api(port):
+    assert dmn.request("GET", "/streams", port=port, token=TOKEN) == []
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        dmn.request("GET", "/streams/3", port=port, token=TOKEN)
+    assert e.value.code == 404
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        dmn.request(
+            "POST", "/streams", {"kind": "hologram", "ini": "", "websites": ""}, port, TOKEN
+        )
+    assert e.value.code == 400
+
+
+def test_caption_not_found(port):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        dmn.request("PUT", "/streams/3/caption", {"text": "hi"}, port=port, token=TOKEN)
+    assert e.value.code == 404
+
+
+def test_errors(port, monkeypatch):
+    D = dmn.Handler.daemon
+    body = {"kind": "file", "ini": "", "websites": ""}
+
+    # missing request field
+    with pytest.raises(urllib.error.HTTPError) as e:
+        dmn.request("POST", "/plans", {"kind": "file"}, port, TOKEN)
+    assert e.value.code == 400
+
+    def fail(req):
+        raise RuntimeError("no encoder")
+
+    monkeypatch.setattr(D, "plan", fail)
+    with pytest.raises(urllib.error.HTTPError) as e:
+        dmn.request("POST", "/plans", body, port, TOKEN)
+    assert e.value.code == 500
+    assert b"no encoder" in e.value.read()
+
+    # only an unknown stream is not found
+    for method, path in (("GET", "/streams/x"), ("POST", "/streams/3/clip")):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            dmn.request(method, path, {}, port, TOKEN)
+        assert e.value.code == 404
+
+
+def test_local_only(port):
+    auth = {"Authorization": f"Bearer {TOKEN}"}
+
+    assert raw(port, "GET", "/streams") == 401
+    assert raw(port, "GET", "/streams", headers={"Authorization": "Bearer wrong"}) == 401
+    assert raw(port, "GET", "/streams", headers=auth | {"Origin": "http://evil.example"}) == 403
+    assert raw(port, "GET", "/streams", headers=auth | {"Host": "evil.example:8765"}) == 403
+    # form posts from web pages can't set a JSON content type without a CORS preflight
+    body = {"kind": "screen", "ini": "", "websites": ""}
+    assert raw(port, "POST", "/streams", body, auth | {"Content-Type": "text/plain"}) == 415
+
+    url = f"http://127.0.0.1:{port}/streams"
+    req = urllib.request.Request(url, headers=auth | {"Origin": "http://localhost:3000"})
+    with urllib.request.urlopen(req) as r:
+        assert json.loads(r.read()) == []
+
+
+def test_options(port):
+    for opts in ({"caption_file": "/etc/passwd"}, {"resume_file": "x"}, {"loop": "yes"}):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            dmn.request(
+                "POST",
+                "/plans",
+                {"kind": "file", "ini": "", "websites": "", "options": opts},
+                port,
+                TOKEN,
+            )
+        assert e.value.code == 400
+        assert b"option" in e.value.read()
+
+
+def test_clip_dir(tmp_path):
+    D = dmn.Daemon(clip_dir=tmp_path / "clips")
+    D.streams[1] = None  # type: ignore
+    with pytest.raises(ValueError):
+        D.clip(1, {"outfn": "../outside.mp4"})
+    with pytest.raises(ValueError):
+        D.clip(1, {"outfn": "/tmp/outside.mp4"})
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX file modes")
+def test_token_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    token = dmn.new_token()
+    fn = dmn.token_file()
+    assert fn.read_text() == token
+    assert fn.stat().st_mode & 0o777 == 0o600
@@ -0,0 +1,49 @@
+import pytest
+
+import pylivestream.encoders as enc
+
+ENCODERS = """Encoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10 (codec h264)
+ V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)
+ V....D libx265              libx265 H.265 / HEVC (codec hevc)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+QUALITY = """
+[Parsed_ssim_4 @ 0x55d5] SSIM Y:0.981 (17.2) U:0.990 (20.0) V:0.991 (20.5) All:0.9852 (18.3)
+[Parsed_psnr_5 @ 0x55d6] PSNR y:39.1 u:43.2 v:43.8 average:40.43 min:37.9 max:45.0
+"""
+
+
+def test_parse_encoders():
+    assert enc.parse_encoders(ENCODERS) == ["libx264", "h264_nvenc", "libx265"]
+
+
+def test_parse_quality():
+    assert enc.parse_quality(QUALITY) == {"ssim": 0.9852, "psnr": 40.43}
+
+    with pytest.raises(ValueError):
+        enc.parse_quality("")
+
+
+def test_candidates():
+    assert enc.candidates("youtube")[0] == "libx265"
+    assert "libx265" not in enc.candidates("twitch")
+    assert enc.uses_preset("libx264")
+    assert not enc.uses_preset("h264_nvenc")
+
+
+def test_choose():
+    R = {
+        "libx265": {"ssim": 0.990, "psnr": 42.0, "cpu_sec": 30.0, "speed": 0.8},
+        "libx264": {"ssim": 0.975, "psnr": 39.0, "cpu_sec": 6.0, "speed": 3.0},
+        "h264_nvenc": {"ssim": 0.975, "psnr": 39.5, "cpu_sec": 1.0, "speed": 8.0},
+    }
+
+    assert enc.choose(R) == "h264_nvenc", "same SSIM, fewer CPU seconds"
+    assert enc.choose(R, headroom=0.5) == "libx265"
+    assert enc.choose({"libx265": R["libx265"]}) == "libx265", "fastest if none keep up"
+    assert enc.choose({}) is None
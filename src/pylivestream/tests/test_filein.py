@@ -38,7 +38,24 @@ def test_audio(site):
     assert "-re" in S.stream.cmd
     assert S.stream.fps is None
 
-    assert S.stream.video_kbps == 800
+    assert S.stream.video_kbps == 494  # interpolated between 480p and 720p rungs
+
+
+def test_loudnorm_once(monkeypatch):
+    calls = []
+
+    def get_loudness(fn, exe=None):
+        calls.append(fn)
+        return {"i": -23.4, "tp": -10.0}
+
+    monkeypatch.setattr(pls.loudness, "get_loudness", get_loudness)
+
+    vid = importlib.resources.files("pylivestream.data").joinpath("bunny.avi")
+    S = pls.FileIn(ini, websites="facebook", infn=vid, loudnorm=True).stream
+    S.build()
+
+    assert "volume=7.40dB" in S.cmd
+    assert len(calls) == 1
 
 
 @pytest.mark.timeout(TIMEOUT)
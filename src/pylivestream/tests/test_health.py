@@ -0,0 +1,82 @@
+import socket
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import pylivestream.health as hl  # noqa: E402
+
+
+def test_level():
+    t = np.arange(hl.RATE) / hl.RATE
+    tone = (0.5 * 32767 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+    rms, peak = hl.level_db(tone)
+    assert rms == pytest.approx(-9.0, abs=0.1)
+    assert peak == pytest.approx(-6.0, abs=0.1)
+
+    rms, peak = hl.level_db(np.zeros(100, np.int16))
+    assert rms == peak == -120
+
+
+def test_detector():
+    D = hl.Detector("freeze", 2.0)
+
+    assert D.update(True, 0.0) is None
+    assert D.update(True, 1.5) is None
+    assert D.update(True, 2.0) == "freeze"
+    assert D.update(True, 3.0) is None
+    assert D.update(False, 3.5) == "freeze_end"
+    assert D.update(False, 4.0) is None
+
+
+def test_video_events():
+    H = hl.Health(video=False, audio=False)
+    assert H.outputs() == []
+
+    black = np.full((hl.H, hl.W), 16, np.uint8)
+    for _ in range(round(hl.BLACK_SEC * hl.FPS) + 1):
+        H.video(black)
+
+    names = [e["event"] for e in H.events]
+    assert names == ["black"]
+
+    rng = np.random.default_rng(0)
+    for _ in range(3):
+        H.video(rng.integers(0, 255, (hl.H, hl.W), np.uint8))
+
+    assert [e["event"] for e in H.events] == ["black", "black_end"]
+    assert H.metrics["motion"] > hl.FREEZE_DIFF
+
+
+def test_freeze():
+    H = hl.Health(video=False, audio=False)
+    still = np.random.default_rng(1).integers(32, 255, (hl.H, hl.W), np.uint8)
+
+    for _ in range(round(hl.FREEZE_SEC * hl.FPS) + 2):
+        H.video(still)
+
+    assert [e["event"] for e in H.events] == ["freeze"]
+
+
+def test_silence_over_tcp():
+    events = []
+    H = hl.Health(video=False, audio=True, on_event=events.append)
+
+    o = H.outputs(["-t", "30"])
+    assert o[-3:-1] == ["-t", "30"]
+    port = int(o[-1].rsplit(":", 1)[1])
+
+    with socket.create_connection(("127.0.0.1", port)) as s:
+        s.sendall(bytes(2 * round(hl.RATE * (hl.SILENCE_SEC + 1))))
+
+    for _ in range(50):
+        if events:
+            break
+        time.sleep(0.02)
+
+    H.close()
+    assert H.closed
+    assert events[0]["event"] == "silence"
+    assert H.metrics["rms_db"] == -120
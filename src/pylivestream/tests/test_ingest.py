@@ -0,0 +1,60 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import pylivestream.ingest as ingest
+
+
+def standin(delay: float) -> int:
+    """local stand-in for an RTMP ingest server that answers the handshake after delay"""
+
+    srv = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        with srv:
+            while True:
+                try:
+                    conn, _ = srv.accept()
+                except OSError:
+                    return
+                with conn:
+                    conn.recv(1537)
+                    time.sleep(delay)
+                    conn.sendall(b"\x03")
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    return srv.getsockname()[1]
+
+
+@pytest.fixture
+def no_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, "cache_dir", lambda: tmp_path)
+    monkeypatch.setattr(ingest, "_cache", {})
+
+
+def test_select(no_cache):
+    urls = [f"rtmp://127.0.0.1:{standin(d)}/app" for d in (0.3, 0.0, 0.15)]
+
+    assert ingest.measure(urls[1]) < ingest.measure(urls[0])
+
+    t0 = time.perf_counter()
+    assert ingest.select(urls) == urls[1]
+    # parallel: total less than sum of delays
+    assert time.perf_counter() - t0 < 0.4
+
+    # cached
+    t0 = time.perf_counter()
+    assert ingest.select(urls) == urls[1]
+    assert time.perf_counter() - t0 < 0.1
+
+
+def test_unreachable(no_cache):
+    with socket.create_server(("127.0.0.1", 0)) as s:
+        port = s.getsockname()[1]
+    url = f"rtmp://127.0.0.1:{port}/app"
+
+    assert ingest.measure(url, timeout=0.5) == float("inf")
+    assert ingest.select([url, url + "2"], timeout=0.5) == url
@@ -0,0 +1,71 @@
+import subprocess
+
+import pytest
+
+import pylivestream.library as lib
+
+META = {
+    ".ogg": {
+        "format": {"duration": "100.0"},
+        "streams": [{"codec_type": "audio", "codec_name": "vorbis"}],
+    },
+    ".avi": {
+        "format": {"duration": "60.0"},
+        "streams": [
+            {
+                "codec_type": "video",
+                "codec_name": "h264",
+                "width": 426,
+                "height": 240,
+                "avg_frame_rate": "24/1",
+            },
+            {"codec_type": "audio", "codec_name": "aac"},
+        ],
+    },
+}
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """stand-in for FFprobe, counting calls"""
+    calls = []
+
+    def get_meta(fn, exe=None):
+        calls.append(fn)
+        if fn.suffix not in META:
+            raise subprocess.CalledProcessError(1, "ffprobe")
+        if fn.stem == "long":
+            return META[fn.suffix] | {"format": {"duration": "400"}}
+        return META[fn.suffix]
+
+    monkeypatch.setattr(lib, "get_meta", get_meta)
+    return calls
+
+
+def test_index(tmp_path, probes):
+    db = tmp_path / "index.sqlite"
+    tmp_path = tmp_path / "media"
+    (tmp_path / "sub").mkdir(parents=True)
+    for n in ("a.ogg", "long.ogg", "b.avi", "notes.txt", "sub/c.ogg"):
+        (tmp_path / n).write_text(n)
+
+    L = lib.Library(db)
+
+    assert L.update(tmp_path) == {"probed": 5, "unchanged": 0, "removed": 0}
+    assert L.update(tmp_path) == {"probed": 0, "unchanged": 5, "removed": 0}
+    assert len(probes) == 5
+
+    (tmp_path / "a.ogg").write_text("changed")
+    (tmp_path / "sub/c.ogg").unlink()
+    assert L.update(tmp_path) == {"probed": 1, "unchanged": 3, "removed": 1}
+
+    probes.clear()
+    assert L.query(tmp_path, media="audio", max_duration=300) == [tmp_path / "a.ogg"]
+    assert L.query(tmp_path, media="video") == [tmp_path / "b.avi"]
+    assert set(L.query(tmp_path, shuffle=True)) == {
+        tmp_path / n for n in ("a.ogg", "long.ogg", "b.avi")
+    }
+    assert L.query(tmp_path, "*.avi") == [tmp_path / "b.avi"]
+    assert not probes
+
+    L.close()
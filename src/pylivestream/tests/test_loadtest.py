@@ -0,0 +1,30 @@
+from pathlib import Path
+import os
+
+import pylivestream.loadtest as lt
+
+ini = Path(__file__).parents[1] / "data/pylivestream.json"
+
+
+def test_stream_cmd():
+    cmd = lt.stream_cmd(ini, "localhost", "synthetic", 720, 30, 10)
+
+    assert cmd[-1] == os.devnull
+    assert "testsrc2=size=1280x720:rate=30" in cmd
+    assert cmd[cmd.index("-t") + 1] == "10"
+
+
+def test_ok():
+    good = {"returncode": 0, "speed": 1.0, "dropped": 0, "cpu_percent": 80.0, "rss_mb": 90.0}
+
+    assert lt.ok([good, good])
+    assert not lt.ok([good, good | {"speed": 0.93}])
+    assert not lt.ok([good | {"dropped": 4}])
+    assert "2 streams" in lt.summary(2, [good, good])
+
+
+def test_file_scaled():
+    cmd = lt.stream_cmd(ini, "localhost", "file", 720, 25, 10)
+
+    assert "scale=-2:720" in cmd[cmd.index("-vf") + 1]
+    assert cmd[cmd.index("-r") + 1] == "25"
@@ -0,0 +1,45 @@
+import shutil
+
+from pytest import approx
+
+import pylivestream.loudness as ld
+
+STDERR = """
+[Parsed_loudnorm_0 @ 0x55d]
+{
+    "input_i" : "-23.40",
+    "input_tp" : "-4.10",
+    "input_lra" : "6.20",
+    "input_thresh" : "-33.90",
+    "output_i" : "-16.10",
+    "output_tp" : "-1.50",
+    "output_lra" : "5.10",
+    "output_thresh" : "-26.60",
+    "normalization_type" : "dynamic",
+    "target_offset" : "0.10"
+}
+"""
+
+
+def test_parse():
+    assert ld.parse(STDERR) == {"i": -23.4, "lra": 6.2, "tp": -4.1, "thresh": -33.9}
+
+
+def test_gain():
+    assert ld.gain_db({"i": -23.4, "tp": -10.0}) == approx(7.4)
+    # limited by true peak
+    assert ld.gain_db({"i": -23.4, "tp": -4.1}) == approx(2.6)
+    assert ld.gain_db({"i": -12.0, "tp": -0.5}) == approx(-4.0)
+    assert ld.gain_db({"i": float("-inf"), "tp": float("-inf")}) == 0
+
+
+def test_content_key(tmp_path):
+    a = tmp_path / "a.ogg"
+    a.write_bytes(bytes(range(256)) * 10000)
+    b = tmp_path / "b.ogg"
+    shutil.copy(a, b)
+
+    assert ld.content_key(a) == ld.content_key(b)
+
+    b.write_bytes(b"x" + b.read_bytes()[1:])
+    assert ld.content_key(a) != ld.content_key(b)
@@ -27,7 +27,7 @@ def test_microphone_props(site):
     assert S.stream.fps is None
     assert S.stream.res == [720, 540]
 
-    assert S.stream.video_kbps == 800
+    assert S.stream.video_kbps == 494  # interpolated between 480p and 720p rungs
 
 
 @pytest.mark.parametrize("site", ["facebook"])
@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+import pylivestream.monitor as mon
+
+
+class FakeMonitor(mon.Monitor):
+    def __init__(self):
+        super().__init__(["ffmpeg"])
+
+
+def test_progress_fields():
+    M = FakeMonitor()
+    assert M.cmd == ["ffmpeg"] + mon.PROGRESS
+    assert M.speed is None
+
+    M.progress = {"speed": "0.98x", "drop_frames": "3", "out_time_us": "2500000"}
+    assert M.speed == 0.98
+    assert M.drop_frames == 3
+    assert M.out_time == 2.5
+
+
+def test_drop_watch():
+    trips = []
+    M = FakeMonitor()
+    W = mon.DropWatch(on_trip=trips.append, persist=3, window=100)
+
+    W(M)
+    assert not W.tripped
+
+    for i in range(1, 4):
+        M.blocking = i
+        W(M)
+
+    assert W.tripped
+    assert trips == [M]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX shell script")
+def test_handler_error(tmp_path):
+    exe = tmp_path / "ffmpeg"
+    exe.write_text("#!/bin/sh\necho progress=continue\nexec sleep 60\n")
+    exe.chmod(0o755)
+
+    def fail(M):
+        raise RuntimeError("handler bug")
+
+    M = mon.Monitor([str(exe)], [fail], stdin=False)
+    with pytest.raises(RuntimeError):
+        M.run()
+    assert M.proc is not None and M.proc.poll() is not None
@@ -0,0 +1,70 @@
+import time
+
+import pylivestream.prefetch as pf
+
+
+def wait(P):
+    while P._pending:
+        time.sleep(0.01)
+
+
+def test_local(tmp_path):
+    f = tmp_path / "a.ogg"
+    f.write_bytes(b"x" * 1000)
+
+    P = pf.Prefetcher(tmp_path / "cache", ahead=2)
+    assert P.get(f) == f
+    P.stage([f])
+    wait(P)
+    assert P.get(f) == f
+    assert P.stats["misses"] == 1
+    assert P.stats["hits"] == 1
+    assert P.stats["advised"] == 1
+    P.close()
+
+
+def test_remote_lru(tmp_path, monkeypatch):
+    monkeypatch.setattr(pf, "is_remote", lambda p: True)
+
+    files = []
+    for n in "abc":
+        files.append(tmp_path / f"{n}.mp4")
+        files[-1].write_bytes(n.encode() * 400)
+
+    P = pf.Prefetcher(tmp_path / "cache", max_bytes=1000, ahead=2)
+
+    P.stage(files)
+    wait(P)
+    a = P.get(files[0])
+    assert a.parent == tmp_path / "cache"
+    assert a.read_bytes() == files[0].read_bytes()
+
+    # c evicts b, the least recently used
+    P.stage(files[2:])
+    wait(P)
+    assert P.get(files[1]) == files[1]
+    assert P.get(files[2]).parent == tmp_path / "cache"
+    assert P.stats == {"hits": 2, "misses": 1, "copied_bytes": 1200, "evictions": 1, "advised": 0}
+    P.close()
+
+
+def test_keep_current(tmp_path, monkeypatch):
+    monkeypatch.setattr(pf, "is_remote", lambda p: True)
+
+    files = []
+    for n in "abc":
+        files.append(tmp_path / f"{n}.mp4")
+        files[-1].write_bytes(n.encode() * 400)
+
+    P = pf.Prefetcher(tmp_path / "cache", max_bytes=1000, ahead=2)
+    P.stage(files[:2])
+    wait(P)
+
+    # a is streaming and b is next: c doesn't fit without evicting one, so it isn't copied
+    assert P.get(files[0]).parent == tmp_path / "cache"
+    P.stage(files[1:])
+    wait(P)
+    assert P.get(files[1]).parent == tmp_path / "cache"
+    assert P.stats["evictions"] == 0
+    assert P.stats["advised"] == 1
+    P.close()
@@ -0,0 +1,35 @@
+from pathlib import Path
+import json
+
+import pylivestream as pls
+import pylivestream.preview as pv
+
+ini = Path(__file__).parents[1] / "data/pylivestream.json"
+
+
+def test_outputs(tmp_path):
+    P = pv.Preview(tmp_path, tile="4x3", format="webp")
+
+    o = P.outputs(["-t", "5"])
+    assert o[-1] == str(tmp_path / "sprite.webp")
+    assert o.count("-atomic_writing") == 2
+    assert o.count("-t") == 2
+    assert any(f.endswith("tile=4x3") for f in o)
+
+    assert P.latest() == {"image": None, "sprite": None}
+    P.image.write_bytes(b"RIFF")
+    assert P.latest()["image"]["path"] == str(P.image)
+
+
+def test_preview_cmd(tmp_path):
+    C = json.loads(ini.read_text())
+    C["preview"] = {"dir": str(tmp_path / "preview"), "fps": 1}
+    fn = tmp_path / "pylivestream.json"
+    fn.write_text(json.dumps(C))
+
+    S = pls.Screenshare(fn, "localhost", yes=True)
+    cmd = S.stream.cmd
+
+    assert str(tmp_path / "preview" / "preview.jpg") in cmd
+    assert cmd.index("rtmp://localhost/") < cmd.index("fps=1,scale=320:-2")
+    assert S.stream.latest_preview() is not None
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+import pylivestream.procstat as ps
+
+linux = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs /proc")
+
+
+@linux
+def test_read_proc():
+    c = ps.read_proc(os.getpid())
+    assert c is not None
+    assert c["cpu_sec"] > 0
+    assert c["rss"] > 1_000_000
+    assert c["ctx_voluntary"] + c["ctx_involuntary"] > 0
+
+    # all writes count, not just to storage: a stream writes to a socket
+    with open(os.devnull, "wb", buffering=0) as f:
+        f.write(b"x" * 100_000)
+    c2 = ps.read_proc(os.getpid())
+    assert c2 is not None
+    assert c2["write_bytes"] - c["write_bytes"] >= 100_000
+
+
+def test_read_proc_gone():
+    assert ps.read_proc(2**22 + 1) is None
+
+
+@linux
+def test_series_bounded():
+    W = ps.ProcWatch(history=3)
+    assert W.sample(os.getpid(), 0.0) is None, "first reading has no rates"
+    for i in range(1, 6):
+        s = W.sample(os.getpid(), float(i))
+        assert s is not None
+        assert s["cpu_percent"] >= 0
+
+    assert len(W.series) == 3
+    assert W.latest is W.series[-1]
+
+
+def test_budget():
+    events = []
+    W = ps.ProcWatch(budget={"cpu_percent": 150, "rss_mb": 100}, on_event=events.append)
+
+    sample = {"cpu_percent": 180.0, "rss": 50 * 2**20, "write_kbps": 0.0}
+    W.check(sample)
+    W.check(sample)
+    assert [e["event"] for e in events] == ["budget_exceeded"], "once per crossing"
+    assert events[0]["metric"] == "cpu_percent"
+    assert W.over == {"cpu_percent"}
+
+    W.check(sample | {"cpu_percent": 90.0})
+    assert events[-1]["event"] == "budget_ok"
+    assert not W.over
+
+
+def test_budget_metrics():
+    with pytest.raises(ValueError):
+        ps.ProcWatch(budget={"cpu": 100})
@@ -0,0 +1,54 @@
+from pathlib import Path
+import json
+import shutil
+
+import pytest
+
+import pylivestream
+import pylivestream.replay as rp
+
+pls = pylivestream
+ini = Path(__file__).parents[1] / "data/pylivestream.json"
+
+
+def test_ring(tmp_path):
+    R = rp.Replay(seconds=10, segment_sec=2, dir=tmp_path)
+    assert R.dir.parent == tmp_path
+    assert R.count == 7
+
+    slave = R.slave()
+    assert "segment_wrap=7" in slave
+    assert slave.endswith("seg%03d.ts")
+
+    R.close()
+    assert not R.dir.exists()
+
+
+def test_clip_segments(tmp_path):
+    R = rp.Replay(seconds=10, segment_sec=2, dir=tmp_path)
+
+    with pytest.raises(ValueError):
+        R.clip(4, tmp_path / "clip.mp4")
+
+    R.list.write_text("seg005.ts,10.0,12.0\nseg006.ts,12.0,14.1\nseg000.ts,14.1,16.0\n")
+    segs = R.segments()
+    assert [s[0].name for s in segs] == ["seg005.ts", "seg006.ts", "seg000.ts"]
+    assert segs[1][1] == pytest.approx(2.1)
+
+    R.close()
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="needs FFmpeg")
+def test_replay_cmd(tmp_path):
+    C = json.loads(ini.read_text())
+    C["replay"] = {"seconds": 30, "dir": str(tmp_path)}
+    fn = tmp_path / "pylivestream.json"
+    fn.write_text(json.dumps(C))
+
+    S = pls.Screenshare(fn, "localhost", yes=True)
+    cmd = S.stream.cmd
+
+    assert cmd[cmd.index("-f", cmd.index("-bufsize")) + 1] == "tee"
+    assert "0:v?" in cmd
+    assert S.stream.replay is not None
+    assert str(S.stream.replay.dir) in cmd[-1]
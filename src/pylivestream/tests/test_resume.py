@@ -0,0 +1,68 @@
+from pathlib import Path
+import importlib.resources
+import json
+
+import pytest
+
+import pylivestream as pls
+import pylivestream.monitor as mon
+import pylivestream.resume as rs
+
+ini = Path(__file__).parents[1] / "data/pylivestream.json"
+
+
+def test_checkpoint(tmp_path):
+    fn = tmp_path / "state.json"
+    C = rs.Checkpoint(fn, Path("video.mp4"), start=30.0, duration=100.0, interval=0)
+
+    M = mon.Monitor(["ffmpeg"])
+    M.progress = {"out_time_us": "85000000"}
+    C(M)
+
+    state = json.loads(fn.read_text())
+    assert state["file"] == "video.mp4"
+    assert state["offset"] == pytest.approx(15.0), "wraps around looped input"
+
+    rs.clear(fn)
+    assert rs.load(fn) == {}
+
+
+def test_state_file():
+    assert rs.state_file("youtube", "/a.mp4") == rs.state_file("youtube", "/a.mp4")
+    assert rs.state_file("youtube", "/a.mp4") != rs.state_file("twitch", "/a.mp4")
+
+
+def test_keyframe_start():
+    assert rs.keyframe_before(Path("nothing.mp4"), 0) == 0
+
+
+def test_resume_file(tmp_path):
+    vid = importlib.resources.files("pylivestream.data").joinpath("bunny.avi")
+    fn = tmp_path / "state.json"
+    rs.save(fn, {"file": str(vid), "offset": 3.0})
+
+    S = pls.FileIn(ini, websites="facebook", infn=vid, resume=True, resume_file=fn)
+    cmd = S.stream.cmd
+
+    start = float(cmd[cmd.index("-ss") + 1])
+    assert 0 <= start <= 3.0
+    assert cmd.index("-ss") < cmd.index("-i")
+
+
+def test_resume_staged(tmp_path):
+    """a staged copy resumes from the checkpoint of its playlist file, and only that"""
+
+    vid = importlib.resources.files("pylivestream.data").joinpath("bunny.avi")
+    staged = tmp_path / "bunny.avi"
+    staged.write_bytes(vid.read_bytes())
+    fn = tmp_path / "state.json"
+
+    for other in (staged, Path("/elsewhere/bunny.avi")):
+        rs.save(fn, {"file": str(other), "offset": 3.0})
+        S = pls.FileIn(ini, "facebook", infn=staged, resume=True, resume_file=fn, resume_source=vid)
+        assert "-ss" not in S.stream.cmd
+
+    rs.save(fn, {"file": str(Path(vid).resolve()), "offset": 3.0})
+    S = pls.FileIn(ini, "facebook", infn=staged, resume=True, resume_file=fn, resume_source=vid)
+    assert S.stream.resume_source == Path(vid).resolve()
+    assert "-ss" in S.stream.cmd
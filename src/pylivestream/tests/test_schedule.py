@@ -0,0 +1,80 @@
+from datetime import datetime
+import subprocess
+import time
+
+import pytest
+
+import pylivestream.schedule as sch
+
+
+class FakeSlot(sch.Slot):
+    def __init__(self, start: float, fail: bool = False, crash: bool = False, **kwargs):
+        entry = {"start": datetime.fromtimestamp(start).isoformat(), "websites": "localhost"}
+        super().__init__(entry | kwargs)
+        self.fail = fail
+        self.crash = crash
+        self.ran_at = 0.0
+
+    def prepare(self):
+        if self.fail:
+            raise FileNotFoundError("no such file")
+        if self.name == "timeout":
+            raise subprocess.TimeoutExpired(["ffprobe"], 10)
+
+    def run(self):
+        self.ran_at = time.time()
+        if self.crash:
+            raise RuntimeError("listener stopped")
+
+
+def test_schedule():
+    t0 = time.time() + 0.3
+    good = FakeSlot(t0, name="good", duration=10)
+    bad = FakeSlot(t0 + 1, fail=True, name="bad")
+
+    events = []
+    S = sch.Scheduler([bad, good], lead_sec=0.2, on_event=events.append)
+    S.run()
+
+    names = [(e["slot"], e["event"]) for e in events]
+    assert ("bad", "overlap") in names
+    assert ("bad", "prep_failed") in names
+    assert ("bad", "skipped") in names
+    assert ("bad", "started") not in names
+    assert names.index(("good", "prepared")) < names.index(("good", "started"))
+    assert ("good", "finished") in names
+
+    assert 0 <= good.ran_at - t0 < 0.1
+
+
+def test_slot_errors():
+    events = []
+    S = sch.Scheduler([], on_event=events.append)
+
+    S._slot(FakeSlot(time.time(), name="timeout"))
+    assert [e["event"] for e in events] == ["prep_failed", "skipped"]
+
+    crash = FakeSlot(time.time(), crash=True, name="crash", duration=10)
+    with pytest.raises(RuntimeError):
+        S._slot(crash)
+    assert events[-1]["event"] == "finished"
+    assert S.onair is None
+
+
+def test_stop_before_start():
+    """a slot stopped before its stream starts doesn't stream"""
+
+    class Stream:
+        started = False
+
+        def startlive(self):
+            self.started = True
+
+        def stop(self):
+            pass
+
+    slot = FakeSlot(time.time(), name="stop")
+    slot.streams = [Stream()]
+    slot.stop()
+    sch.Slot.run(slot)
+    assert not slot.streams[0].started
@@ -2,6 +2,7 @@ import pytest
 from pytest import approx
 from pathlib import Path
 import subprocess
+import json
 import os
 import platform
 import sys
@@ -24,6 +25,32 @@ def test_props(site):
     assert S.stream.video_kbps == 1250
 
 
+def test_static_content():
+    S = pls.Screenshare(ini, websites="facebook", static=True).stream
+
+    vf = S.cmd[S.cmd.index("-vf") + 1]
+    assert vf.startswith("mpdecimate=max=14")
+    assert S.cmd[S.cmd.index("-fps_mode") + 1] == "vfr"
+    assert "-r" not in S.cmd
+    # with a frame at least every 0.5 s, keyframes are forced within keyframe_sec
+    assert S.cmd[S.cmd.index("-force_key_frames") + 1] == "expr:gte(t,n_forced*1.500)"
+
+
+@pytest.mark.parametrize("corner,xy", [("bottom-right", "W-w-16:H-h-16"), ("top-left", "16:16")])
+def test_pip(tmp_path, corner, xy):
+    C = json.loads(ini.read_text())
+    C["pip"] = {"corner": corner}
+    cfg = tmp_path / "pip.json"
+    cfg.write_text(json.dumps(C))
+
+    S = pls.PictureInPicture(cfg, websites="facebook", caption="hi").stream
+
+    assert S.cmd.count("-i") == 2
+    assert "-vf" not in S.cmd
+    graph = S.cmd[S.cmd.index("-filter_complex") + 1]
+    assert graph.startswith(f"[1:v]scale=160:-2[cam];[0:v][cam]overlay={xy},drawtext=")
+
+
 @pytest.mark.timeout(TIMEOUT)
 @pytest.mark.skipif(CI or WSL, reason="has no GUI")
 def test_stream():
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+
+import pytest
+
+import pylivestream.monitor as mon
+import pylivestream.stages as stg
+
+linux = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="F_SETPIPE_SZ is Linux")
+
+N = 8 * 2**20  # bytes "captured"
+WRITER = [sys.executable, "-c", f"import sys; sys.stdout.buffer.write(bytes({N}))"]
+
+
+@linux
+def test_set_pipe_size():
+    r, w = os.pipe()
+    try:
+        assert stg.set_pipe_size(w, 2**20) >= 2**16
+        os.write(w, b"abc")
+        assert stg.pipe_fill(r) == 3
+    finally:
+        os.close(r)
+        os.close(w)
+
+
+@pytest.mark.parametrize("buffer_mb", [0.5, 4])
+def test_flow(buffer_mb):
+    S = stg.Stages(buffer_mb=buffer_mb)
+    M = mon.Monitor(["ffmpeg"])
+
+    fd = S.start(WRITER, M)
+    n = 0
+    while b := os.read(fd, 2**16):
+        n += len(b)
+    S.stop()
+
+    assert n == N
+    assert S.status()["max_fill"] >= 0
+
+
+def test_capture_cmd():
+    S = stg.Stages()
+    cmd = S.capture_cmd("ffmpeg", [], ["-f", "x11grab", "-i", ":0", "-f", "pulse", "-i", "default"])
+
+    assert cmd[-3:] == ["-f", "nut", "pipe:1"]
+    assert cmd.count("-map") == 2
+    assert S.encode_in(64)[-1] == "pipe:0"
+
+
+def test_relay(monkeypatch):
+    monkeypatch.setattr(stg, "set_pipe_size", lambda fd, size: 2**16)  # Linux default
+
+    S = stg.Stages(buffer_mb=2)
+    fd = S.start(WRITER, mon.Monitor(["ffmpeg"]))
+    assert S.relay_bytes == 2 * 2**20 - 2 * 2**16
+
+    n = 0
+    while b := os.read(fd, 2**16):
+        n += len(b)
+    S.stop()
+
+    assert n == N
+
+
+def test_stop_running(monkeypatch):
+    """encoder gone while capture still writes: stop must not hang or close fds in use"""
+
+    monkeypatch.setattr(stg, "set_pipe_size", lambda fd, size: 2**16)
+    forever = [sys.executable, "-c", "import sys\nwhile True: sys.stdout.buffer.write(bytes(2**16))"]
+
+    S = stg.Stages(buffer_mb=1)
+    for _ in range(2):
+        S.start(forever, mon.Monitor(["ffmpeg"]))
+        assert S.status()["max_fill"] == 0 and S.status()["overflows"] == 0, "reset per run"
+        time.sleep(0.5)
+        assert S.status()["overflows"] >= 1
+
+        S.stop()
+        assert S.proc is not None and S.proc.poll() is not None
+        assert not any(t.is_alive() for t in S._relays)
+        assert not S._fd
@@ -0,0 +1,45 @@
+import json
+import time
+
+import pylivestream.tracing as tracing
+
+
+def test_trace(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "enabled", True)
+    tracing.reset()
+
+    with tracing.span("load_config", file="x.json"):
+        time.sleep(0.01)
+    tracing.record("spawn", tracing.now())
+
+    E = tracing.events()
+    assert [e["name"] for e in E] == ["load_config", "spawn"]
+    assert E[0]["dur"] >= 0.01
+    assert E[0]["args"] == {"file": "x.json"}
+
+    lines = tracing.report().splitlines()
+    assert lines[0].split() == ["start", "ms", "dur", "ms", "phase"]
+    assert lines[1].endswith("load_config file=x.json")
+
+    fn = tmp_path / "trace.json"
+    tracing.write(str(fn))
+    C = json.loads(fn.read_text())
+    assert C["traceEvents"][0]["ph"] == "X"
+    assert C["traceEvents"][0]["dur"] >= 10000
+
+    fn = tmp_path / "trace.txt"
+    tracing.record("first_packet", tracing.now())
+    tracing.write(str(fn))
+    assert "first_packet" in fn.read_text()
+
+    tracing.reset()
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(tracing, "enabled", False)
+    tracing.reset()
+
+    with tracing.span("get_exe"):
+        pass
+
+    assert not tracing.events()
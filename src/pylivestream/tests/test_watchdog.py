@@ -0,0 +1,77 @@
+import time
+
+import pylivestream.monitor as mon
+import pylivestream.watchdog as wd
+
+
+def make_monitor(speed: str) -> mon.Monitor:
+    M = mon.Monitor(["ffmpeg"])
+    M.t0 = time.monotonic() - 100
+    M.progress = {"speed": speed}
+    return M
+
+
+def test_slow():
+    calls = []
+    W = wd.SpeedWatch(on_slow=lambda M, c: calls.append(c), window=0.05, grace=0)
+    M = make_monitor("0.80x")
+
+    W(M)
+    assert not calls
+    time.sleep(0.1)
+    W(M)
+    assert len(calls) == 1
+    assert "0.80x" in calls[0]
+
+    W(M)
+    assert len(calls) == 1, "fires once"
+
+
+def test_slow_reset():
+    calls = []
+    W = wd.SpeedWatch(on_slow=lambda M, c: calls.append(c), window=0.05, grace=0)
+
+    W(make_monitor("0.80x"))
+    time.sleep(0.1)
+    W(make_monitor("1.00x"))
+    W(make_monitor("0.80x"))
+    assert not calls, "speed recovered, window restarts"
+
+
+def test_grace():
+    calls = []
+    W = wd.SpeedWatch(on_slow=lambda M, c: calls.append(c), window=0, grace=10)
+    M = make_monitor("0.10x")
+    M.t0 = time.monotonic()
+
+    W(M)
+    W(M)
+    assert not calls
+
+
+def test_headroom():
+    calls = []
+    load = [0.9]
+    W = wd.SpeedWatch(
+        on_headroom=lambda M, c: calls.append(c), up_window=0.05, grace=0, load=lambda: load[0]
+    )
+    M = make_monitor("1.01x")
+
+    W(M)
+    time.sleep(0.1)
+    W(M)
+    assert not calls, "busy CPU"
+
+    load[0] = 0.2
+    W(M)
+    time.sleep(0.1)
+    W(M)
+    assert len(calls) == 1
+
+
+def test_apply_ladder():
+    ladder = [{"preset": "superfast"}, {"preset": "ultrafast"}, {"fps": 24}, {"height": 480}]
+
+    assert wd.apply_ladder(ladder, 0) == {}
+    assert wd.apply_ladder(ladder, 3) == {"preset": "ultrafast", "fps": 24}
+    assert wd.apply_ladder(ladder, 9) == {"preset": "ultrafast", "fps": 24, "height": 480}
@@ -0,0 +1,136 @@
+"""
+phase timing of stream startup
+
+Opt-in by environment variable, so it works with any of the command line programs:
+
+    PYLIVESTREAM_TRACE=trace.json python -m pylivestream.loopfile ...
+
+A file name ending in .json gets Chrome trace JSON (open in chrome://tracing or
+https://ui.perfetto.dev), any other name a compact text report, and "-" prints the
+report to stderr. The trace is written once the first packet has been output, and
+again at exit.
+
+Phases: load_config, get_exe, ffprobe, ingest_select, construct, check_device, listener,
+spawn (FFmpeg process start) and first_packet (from spawn until FFmpeg progress reports
+output), each with start time since Python started tracing and duration.
+"""
+
+from pathlib import Path
+import atexit
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import typing as T
+
+ENV = "PYLIVESTREAM_TRACE"
+
+_t0 = time.perf_counter()
+_events: list[dict[str, T.Any]] = []
+_written = 0  # events already written
+_lock = threading.Lock()
+
+enabled = bool(os.environ.get(ENV))
+
+
+def now() -> float:
+    return time.perf_counter()
+
+
+def record(name: str, start: float, end: float | None = None, **args: T.Any) -> None:
+    """record a phase from perf_counter start to end (default now)"""
+
+    if not enabled:
+        return
+
+    end = now() if end is None else end
+    e = {"name": name, "start": start - _t0, "dur": end - start, "tid": threading.get_ident()}
+    if args:
+        e["args"] = {k: str(v) for k, v in args.items()}
+
+    with _lock:
+        _events.append(e)
+
+
+@contextlib.contextmanager
+def span(name: str, **args: T.Any) -> T.Iterator[None]:
+    """time the enclosed block as a phase"""
+
+    t = now()
+    try:
+        yield
+    finally:
+        record(name, t, **args)
+
+
+def events() -> list[dict[str, T.Any]]:
+    with _lock:
+        return sorted(_events, key=lambda e: e["start"])
+
+
+def reset() -> None:
+    global _written
+
+    with _lock:
+        _events.clear()
+        _written = 0
+
+
+def report() -> str:
+    """compact text table of phases in start order"""
+
+    lines = [f"{'start ms':>9} {'dur ms':>9}  phase"]
+    for e in events():
+        args = " ".join(f"{k}={v}" for k, v in e.get("args", {}).items())
+        lines.append(f"{e['start'] * 1000:9.1f} {e['dur'] * 1000:9.1f}  {e['name']} {args}".rstrip())
+
+    return "\n".join(lines)
+
+
+def chrome() -> dict[str, T.Any]:
+    """Chrome trace event format, complete ("X") events in microseconds"""
+
+    pid = os.getpid()
+    return {
+        "traceEvents": [
+            {
+                "name": e["name"],
+                "ph": "X",
+                "ts": round(e["start"] * 1e6),
+                "dur": round(e["dur"] * 1e6),
+                "pid": pid,
+                "tid": e["tid"],
+                "args": e.get("args", {}),
+            }
+            for e in events()
+        ],
+        "displayTimeUnit": "ms",
+    }
+
+
+def write(fn: str | None = None) -> None:
+    """write trace to fn, default from environment variable"""
+
+    global _written
+
+    fn = fn or os.environ.get(ENV)
+    E = events()
+    if not fn or len(E) == _written:
+        return
+    _written = len(E)
+
+    if fn == "-":
+        print(report(), file=sys.stderr)
+        return
+
+    p = Path(fn).expanduser()
+    try:
+        p.write_text(json.dumps(chrome()) if p.suffix == ".json" else report() + "\n")
+    except OSError as e:
+        print(f"could not write trace {p}: {e}", file=sys.stderr)
+
+
+if enabled:
+    atexit.register(write)
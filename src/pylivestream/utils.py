@@ -1,7 +1,9 @@
 import logging
 import subprocess
 from pathlib import Path
+import os
 import sys
+import threading
 
 import importlib.resources
 
@@ -11,19 +13,24 @@ except ImportError:  # Python < 3.11
     from importlib.abc import Traversable
 
 from .ffmpeg import get_meta, get_ffplay
+from . import tracing
 
 
-def run(cmd: list[str]):
+def run(cmd: list[str]) -> int:
     """
     shell=True for Windows seems necessary to specify devices enclosed by "" quotes
+
+    Returns exit code of cmd
     """
 
     print("\n", " ".join(cmd), "\n")
 
     if sys.platform == "win32":
-        subprocess.run(" ".join(cmd), shell=True)
+        ret = subprocess.run(" ".join(cmd), shell=True)
     else:
-        subprocess.run(cmd)
+        ret = subprocess.run(cmd)
+
+    return ret.returncode
 
 
 """
@@ -42,16 +49,61 @@ Better to let users know there's a problem.
 
 
 def check_device(cmd: list[str]) -> bool:
-    try:
-        run(cmd)
-        ok = True
-    except subprocess.CalledProcessError:
+    with tracing.span("check_device"):
+        ok = run(cmd) == 0
+    if not ok:
         logging.critical(f'device not available, test command failed: \n {" ".join(cmd)}')
-        ok = False
 
     return ok
 
 
+def write_atomic(fn: Path, text: str) -> None:
+    """replace file contents at once, so a reader never sees a partly written file"""
+
+    fn = Path(fn)
+    # own temporary file per process and thread, for concurrent writers
+    tmp = fn.with_name(f"{fn.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, fn)
+
+
+def cache_dir() -> Path:
+    """per-user cache directory for PyLivestream, created if needed"""
+
+    if sys.platform == "win32":
+        root = Path(os.environ.get("LOCALAPPDATA", "~/AppData/Local"))
+    elif sys.platform == "darwin":
+        root = Path("~/Library/Caches")
+    else:
+        root = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache"))
+
+    d = root.expanduser() / "pylivestream"
+    d.mkdir(parents=True, exist_ok=True)
+
+    return d
+
+
+def available_memory() -> int:
+    """
+    physical memory available to new allocations, in bytes. 0 if unknown.
+
+    Linux MemAvailable counts reclaimable page cache, unlike free pages from sysconf.
+    """
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):  # Windows, macOS
+        return 0
+
+
 def check_display(fn: Path | None = None) -> bool:
     """see if it's possible to display something with a test file"""
 
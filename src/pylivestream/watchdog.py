@@ -0,0 +1,125 @@
+"""
+step encoder settings down when FFmpeg can't keep up with realtime, and back up when the
+host has CPU headroom again
+
+Enabled by a "degrade" section in pylivestream.json:
+
+    "degrade": {
+      "threshold": 0.95,
+      "window_sec": 10,
+      "up_load": 0.6,
+      "up_window_sec": 60,
+      "ladder": [{"preset": "superfast"}, {"preset": "ultrafast"}, {"fps": 24}, {"height": 480}]
+    }
+
+Ladder steps are cumulative: level 3 above is ultrafast at 24 fps.
+Speed is the "speed=" that FFmpeg reports; "up_load" is the 1 minute load average per CPU.
+"""
+
+import os
+import time
+import typing as T
+
+from .monitor import Monitor
+
+THRESHOLD = 0.95
+WINDOW_SEC = 10.0
+UP_LOAD = 0.6
+UP_WINDOW_SEC = 60.0
+GRACE_SEC = 5.0  # speed is unsettled right after FFmpeg starts
+
+
+def cpu_load() -> float | None:
+    """1 minute load average per CPU, None where not available (Windows)"""
+
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class SpeedWatch:
+    """
+    Monitor handler: calls on_slow when speed stays below threshold for "window" seconds,
+    or on_headroom when speed keeps up and CPU load stays below up_load for "up_window" seconds.
+    Each callback gets the Monitor and the cause as text, and fires at most once.
+    """
+
+    def __init__(
+        self,
+        on_slow: T.Callable[[Monitor, str], None] | None = None,
+        on_headroom: T.Callable[[Monitor, str], None] | None = None,
+        threshold: float = THRESHOLD,
+        window: float = WINDOW_SEC,
+        up_load: float = UP_LOAD,
+        up_window: float = UP_WINDOW_SEC,
+        grace: float = GRACE_SEC,
+        load: T.Callable[[], float | None] = cpu_load,
+    ):
+
+        self.on_slow = on_slow
+        self.on_headroom = on_headroom
+        self.threshold = threshold
+        self.window = window
+        self.up_load = up_load
+        self.up_window = up_window
+        self.grace = grace
+        self.load = load
+
+        self.tripped = False
+        self._slow_since: float | None = None
+        self._idle_since: float | None = None
+        self._min_speed = float("inf")
+
+    def __call__(self, M: Monitor) -> None:
+
+        now = time.monotonic()
+        speed = M.speed
+        if self.tripped or now - M.t0 < self.grace or speed is None:
+            return
+
+        if speed < self.threshold:
+            self._idle_since = None
+            if self._slow_since is None:
+                self._slow_since = now
+                self._min_speed = speed
+            self._min_speed = min(self._min_speed, speed)
+
+            if self.on_slow is not None and now - self._slow_since >= self.window:
+                self.tripped = True
+                self.on_slow(
+                    M,
+                    f"speed {speed:.2f}x (min {self._min_speed:.2f}x) below {self.threshold}x "
+                    f"for {now - self._slow_since:.0f} s",
+                )
+            return
+
+        self._slow_since = None
+
+        if self.on_headroom is None:
+            return
+
+        load = self.load()
+        if load is None or load >= self.up_load:
+            self._idle_since = None
+            return
+
+        if self._idle_since is None:
+            self._idle_since = now
+        elif now - self._idle_since >= self.up_window:
+            self.tripped = True
+            self.on_headroom(
+                M,
+                f"speed {speed:.2f}x, CPU load {load:.2f} below {self.up_load} "
+                f"for {now - self._idle_since:.0f} s",
+            )
+
+
+def apply_ladder(ladder: list[dict[str, T.Any]], level: int) -> dict[str, T.Any]:
+    """cumulative settings of ladder steps up to level"""
+
+    s: dict[str, T.Any] = {}
+    for step in ladder[:level]:
+        s.update(step)
+
+    return s